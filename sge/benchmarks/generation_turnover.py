@@ -0,0 +1,88 @@
+"""
+Times how long it takes to breed one generation of a POPSIZE=10000 population on the regression grammar, in
+the order of engine.breed (selection, crossover, mutation of the offspring that were already mapped, and one
+mapping of the new genotypes, which mutates the new children of crossover), with copy-on-write operators and with the copies the operators made before: a deepcopy of every
+tournament winner, a copy of every gene in crossover and a deepcopy of every individual before mutation.
+
+    python -m benchmarks.generation_turnover
+"""
+import copy
+import random
+import time
+import sge.grammar as grammar
+from sge.engine import generate_random_individual, map_individuals
+from sge.operators.mutation import mutate
+from sge.operators.recombination import crossover
+from sge.operators.selection import tournament
+
+
+POPSIZE = 10000
+ELITISM = 100
+TSIZE = 3
+PROB_CROSSOVER = 0.9
+PROB_MUTATION = 0.1
+
+
+def legacy_tournament(population, tsize=3):
+    return copy.deepcopy(tournament(population, tsize))
+
+
+def legacy_crossover(p1, p2):
+    child = crossover(p1, p2)
+    child.genotype = [gene[:] for gene in child.genotype]
+    return child
+
+
+def legacy_mutate(p, pmutation):
+    return mutate(copy.deepcopy(p), pmutation)
+
+
+def breed(population, select, recombine, variate):
+    """One generation of the engine's loop, without the evaluation."""
+    size = POPSIZE - ELITISM
+    parents = [select(population, TSIZE) for _ in range(size)]
+    recombined = [i for i in range(size) if random.random() < PROB_CROSSOVER]
+    children = [recombine(parents[i], select(population, TSIZE)) for i in recombined]
+    for i, child in zip(recombined, children):
+        parents[i] = child
+    offspring = [ni if ni.mapping_values is None else variate(ni, PROB_MUTATION) for ni in parents]
+    to_map = [ni for ni in offspring if ni.phenotype is None]
+    map_individuals(to_map, mutation=[PROB_MUTATION if ni.mapping_values is None else 0.0 for ni in to_map])
+    return population[:ELITISM] + offspring
+
+
+def make_population():
+    random.seed(0)
+    grammar.set_path("grammars/regression.txt")
+    grammar.read_grammar()
+    grammar.set_max_tree_depth(17)
+    grammar.set_min_init_tree_depth(6)
+    population = [generate_random_individual() for _ in range(POPSIZE)]
+    map_individuals(population)
+    for ind in population:
+        ind.fitness = random.random()
+    population.sort(key=lambda ind: ind.fitness)
+    return population
+
+
+def main(repeat=5):
+    population = make_population()
+    operators = [("legacy copies", legacy_tournament, legacy_crossover, legacy_mutate),
+                 ("copy-on-write", tournament, crossover, mutate)]
+    results = {}
+    for name, select, recombine, variate in operators:
+        timings = []
+        for seed in range(repeat):
+            random.seed(seed)
+            start = time.perf_counter()
+            breed(population, select, recombine, variate)
+            timings.append(time.perf_counter() - start)
+        results[name] = min(timings)
+    print("%16s %14s" % ("operators", "generation (s)"))
+    for name, seconds in results.items():
+        print("%16s %14.3f" % (name, seconds))
+    print("speedup: %.2fx" % (results["legacy copies"] / results["copy-on-write"]))
+
+
+if __name__ == "__main__":
+    main()
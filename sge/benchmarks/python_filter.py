@@ -0,0 +1,69 @@
+"""
+Compares the python emitter used by Grammar.mapping with the original character-by-character python_filter,
+on long programs of the Santa Fe ant grammar (deeply nested if/else blocks).
+
+    python -m benchmarks.python_filter
+"""
+import random
+import timeit
+from sge.grammar import Grammar
+
+
+def legacy_python_filter(txt):
+    """The python_filter shipped before the single-pass emitter, kept here as the baseline."""
+    txt = txt.replace("\\le", "<=")
+    txt = txt.replace("\\ge", ">=")
+    txt = txt.replace("\\l", "<")
+    txt = txt.replace("\\g", ">")
+    txt = txt.replace("\\eb", "|")
+    indent_level = 0
+    tmp = txt[:]
+    i = 0
+    while i < len(tmp):
+        tok = tmp[i:i+2]
+        if tok == "{:":
+            indent_level += 1
+        elif tok == ":}":
+            indent_level -= 1
+        tabstr = "\n" + "  " * indent_level
+        if tok == "{:" or tok == ":}" or tok == "\\n":
+            tmp = tmp.replace(tok, tabstr, 1)
+        i += 1
+        # Strip superfluous blank lines.
+        txt = "\n".join([line for line in tmp.split("\n") if line.strip() != ""])
+    return txt
+
+
+def legacy_mapping(grammar, genotype):
+    output = []
+    grammar._recursive_mapping(genotype, [0] * len(genotype), grammar.start_symbol_id, 0, output, grammar.rng)
+    return legacy_python_filter("".join(output))
+
+
+def long_genotype(grammar, depth, samples=20):
+    """The genotype of the longest of a few random programs grown up to depth."""
+    grammar.set_min_init_tree_depth(depth)
+    genotypes = []
+    for _ in range(samples):
+        genotype = [[] for _ in grammar.get_non_terminals()]
+        grammar.recursive_individual_creation(genotype, grammar.get_start_rule()[0], 0)
+        genotypes.append(genotype)
+    return max(genotypes, key=lambda genotype: sum(len(gene) for gene in genotype))
+
+
+def main(repeat=5):
+    random.seed(0)
+    grammar = Grammar("grammars/antgrammar.pybnf", max_depth=100)
+    print("%8s %8s %14s %14s %8s" % ("depth", "lines", "legacy (ms)", "emitter (ms)", "speedup"))
+    for depth in [4, 6, 8, 10, 12]:
+        genotype = long_genotype(grammar, depth)
+        phenotype, _ = grammar.mapping(genotype)
+        assert phenotype == legacy_mapping(grammar, genotype)
+        legacy = min(timeit.repeat(lambda: legacy_mapping(grammar, genotype), number=1, repeat=repeat))
+        emitter = min(timeit.repeat(lambda: grammar.mapping(genotype), number=1, repeat=repeat))
+        print("%8d %8d %14.3f %14.3f %7.1fx" % (depth, phenotype.count("\n") + 1, legacy * 1000, emitter * 1000,
+                                               legacy / emitter))
+
+
+if __name__ == "__main__":
+    main()
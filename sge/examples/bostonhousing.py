@@ -1,6 +1,8 @@
 import random
+import numpy as np
 from sge.parameters import params
 from sge.utilities.protected_math import _log_, _div_, _exp_, _inv_, _sqrt_, protdiv
+from sge.utilities.columns import ColumnFunctions, as_columns, squared_errors
 from numpy import cos, sin
 
 def drange(start, stop, step):
@@ -10,55 +12,61 @@ def drange(start, stop, step):
         r += step
 
 class BostonHousing():
-    def __init__(self, run=0, has_test_set=True, invalid_fitness=9999999):
+    def __init__(self, run=0, has_test_set=True, invalid_fitness=9999999, backend="python",
+                 case_errors=False):
         self.__train_set = []
         self.__test_set = None
         self.__invalid_fitness = invalid_fitness
         self.run = run
         self.has_test_set = has_test_set
+        # with case_errors, other_info also has the error in each training case, for lexicase selection (the
+        # engine turns it on when SELECTION is lexicase)
+        self.case_errors = case_errors
+        # backend="stack_vm" runs the phenotypes on the stack VM instead of compiling them
+        self.compiler = ColumnFunctions(globals(), backend)
         self.read_dataset()
         self.calculate_rrse_denominators()
 
 
     def read_dataset(self):
-        dataset = []
-        trn_ind = []
-        tst_ind = []
-        with open('resources/BostonHousing/housing.data', 'r') as dataset_file:
-            for line in dataset_file:
-                dataset.append([float(value.strip(" ")) for value in line.split(" ") if value != ""])
+        """The train and test sets as (x, y): x has one row per variable, so that x[i] is the column of variable i."""
+        dataset = np.loadtxt('resources/BostonHousing/housing.data', dtype=np.float64, ndmin=2)
 
         with open('resources/BostonHousing/housing.folds', 'r') as folds_file:
             for _ in range(self.run - 1): folds_file.readline()
             tst_ind = folds_file.readline()
             tst_ind = [int(value.strip(" ")) - 1 for value in tst_ind.split(" ") if value != ""]
-            trn_ind = filter(lambda x: x not in tst_ind, range(len(dataset)))
-        self.__train_set = [dataset[i] for i in trn_ind]
-        self.__test_set = [dataset[i] for i in tst_ind]
+        in_test = np.zeros(len(dataset), dtype=bool)
+        in_test[tst_ind] = True
+        self.__train_set = as_columns(dataset[~in_test])
+        self.__test_set = as_columns(dataset[tst_ind])
 
 
     def calculate_rrse_denominators(self):
         self.__RRSE_train_denominator = 0
         self.__RRSE_test_denominator = 0
-        train_outputs = [entry[-1] for entry in self.__train_set]
-        train_output_mean = float(sum(train_outputs)) / len(train_outputs)
-        self.__RRSE_train_denominator = sum([(i - train_output_mean)**2 for i in train_outputs])
-        if self.__test_set:
-            test_outputs = [entry[-1] for entry in self.__test_set]
-            test_output_mean = float(sum(test_outputs)) / len(test_outputs)
-            self.__RRSE_test_denominator = sum([(i - test_output_mean)**2 for i in test_outputs])
+        train_outputs = self.__train_set[1]
+        self.__RRSE_train_denominator = float(np.sum(np.square(train_outputs - train_outputs.mean())))
+        if len(self.__test_set[1]):
+            test_outputs = self.__test_set[1]
+            self.__RRSE_test_denominator = float(np.sum(np.square(test_outputs - test_outputs.mean())))
+
+
+    def get_case_errors(self, individual, dataset):
+        """The squared error in each case of dataset, or None if it cannot be computed."""
+        try:
+            function = self.compiler.function(individual)
+        except (SyntaxError, MemoryError):
+            return None
+        return squared_errors(function, dataset)
 
 
     def get_error(self, individual, dataset):
-        pred_error = 0
-        for case in dataset:
-            target = case[-1]
-            try:
-                output = eval(individual, globals(), {"x": case[:-1]})
-                pred_error += (target - output)**2
-            except (SyntaxError, ValueError, OverflowError, MemoryError, FloatingPointError):
-                return self.__invalid_fitness
-        return pred_error
+        """Sum of the squared errors over all the cases of dataset, or None if it cannot be computed."""
+        errors = self.get_case_errors(individual, dataset)
+        if errors is None:
+            return None
+        return float(np.sum(errors))
 
 
     def evaluate(self, individual):
@@ -67,19 +75,24 @@ class BostonHousing():
         if individual is None:
             return None
 
-        error = self.get_error(individual, self.__train_set)
-        error = _sqrt_( error /self.__RRSE_train_denominator)
-
-        if error is None:
+        case_errors = self.get_case_errors(individual, self.__train_set)
+        if case_errors is None:
             error = self.__invalid_fitness
-            
+            case_errors = np.full(len(self.__train_set[1]), float(self.__invalid_fitness))
+        else:
+            error = float(_sqrt_(float(np.sum(case_errors)) / self.__RRSE_train_denominator))
 
         if self.__test_set is not None:
-            test_error = 0
             test_error = self.get_error(individual, self.__test_set)
-            test_error = _sqrt_( test_error / float(self.__RRSE_test_denominator))
-
-        return error, {'generation': 0, "evals": 1, "test_error": test_error}
+            if test_error is None:
+                test_error = self.__invalid_fitness
+            else:
+                test_error = float(_sqrt_(test_error / self.__RRSE_test_denominator))
+
+        other_info = {'generation': 0, "evals": 1, "test_error": test_error}
+        if self.case_errors:
+            other_info["case_errors"] = case_errors
+        return error, other_info
 
 
 if __name__ == "__main__":
@@ -43,8 +43,18 @@ fitness = (89,)
 """
 
 
+import ast
 import copy
+import numpy as np
 from functools import partial
+from sge.utilities.cache import CodeCache, LRUCache
+
+# cells of the grid of the fast simulator
+EMPTY, FOOD, PASSED = 0, 1, 2
+
+# instructions of the controllers compiled for the fast simulator
+MOVE_FORWARD, TURN_LEFT, TURN_RIGHT, IF_FOOD_AHEAD, JUMP = range(5)
+ACTIONS = {'move_forward': MOVE_FORWARD, 'turn_left': TURN_LEFT, 'turn_right': TURN_RIGHT}
 
 def dummy():
     return
@@ -78,16 +88,100 @@ def if_then_else(condition, out1, *targs):
             out()
 
 
+def _ant_method(node):
+    """name if node is the call ant.name(), else None."""
+    if isinstance(node, ast.Call) and not node.args and not node.keywords \
+            and isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name) \
+            and node.func.value.id == 'ant':
+        return node.func.attr
+    return None
+
+
+def compile_controller(routine):
+    """
+    The routine run by runstring (e.g., a phenotype of grammars/antgrammar.pybnf) as a flat program of
+    (instruction, target) pairs: IF_FOOD_AHEAD jumps to target if there is no food ahead, JUMP always does.
+    Raises ValueError if the routine has anything besides the actions of the ant and if ant.sense_food(): blocks.
+    """
+    program = []
+
+    def emit(statements):
+        for statement in statements:
+            if isinstance(statement, ast.Expr) and _ant_method(statement.value) in ACTIONS:
+                program.append((ACTIONS[_ant_method(statement.value)], None))
+            elif isinstance(statement, ast.If) and _ant_method(statement.test) == 'sense_food':
+                branch = len(program)
+                program.append(None)
+                emit(statement.body)
+                if statement.orelse:
+                    jump = len(program)
+                    program.append(None)
+                    program[branch] = (IF_FOOD_AHEAD, len(program))
+                    emit(statement.orelse)
+                    program[jump] = (JUMP, len(program))
+                else:
+                    program[branch] = (IF_FOOD_AHEAD, len(program))
+            elif not isinstance(statement, ast.Pass):
+                raise ValueError("Unsupported statement: %s" % ast.dump(statement))
+
+    emit(ast.parse(routine).body)
+    return tuple(program)
+
+
+def simulate(program, cells, cell, direction, ahead, max_moves, stop_at):
+    """
+    Runs a compiled controller as AntSimulator.runstring runs its routine, from the given cell and direction, and
+    returns (eaten, moves, cell, direction) at the end. cells is the grid as a bytearray, row after row (it is
+    changed), and ahead[direction][cell] the cell in front of the ant.
+    """
+    size = len(program)
+    moves = eaten = 0
+    while moves < max_moves and eaten != stop_at:
+        last = moves
+        pc = 0
+        while pc < size:
+            instruction, target = program[pc]
+            pc += 1
+            if instruction == IF_FOOD_AHEAD:
+                if cells[ahead[direction][cell]] != FOOD:
+                    pc = target
+                continue
+            if instruction == JUMP:
+                pc = target
+                continue
+            moves += 1
+            if instruction == MOVE_FORWARD:
+                cell = ahead[direction][cell]
+                if cells[cell] == FOOD:
+                    eaten += 1
+                cells[cell] = PASSED
+            elif instruction == TURN_LEFT:
+                direction = (direction - 1) % 4
+            else:
+                direction = (direction + 1) % 4
+            # once out of moves, the actions do nothing, and neither does the rest of the routine
+            if moves >= max_moves:
+                break
+        # protection for circuits that don't make the ant move
+        if last == moves:
+            moves += 1
+    return eaten, moves, cell, direction
+
+
 class AntSimulator:
     direction = ["north", "east", "south", "west"]
     dir_row = [1, 0, -1, 0]
     dir_col = [0, 1, 0, -1]
 
-    def __init__(self, max_moves=400, trail="sft"):
+    def __init__(self, max_moves=400, trail="sft", backend="python"):
         self.max_moves = max_moves
         self.moves = 0
         self.eaten = 0
         self.routine = None
+        self.code_cache = CodeCache()
+        # backend="fast" runs the routines compiled by compile_controller, with the same results
+        self.backend = backend
+        self.controllers = LRUCache()
         if trail == "sft":
           self.parse_matrix(open("resources/santafe_trail.txt"))
           self.total_pieces = 89
@@ -151,14 +245,20 @@ class AntSimulator:
 
     def runstring(self,routine,callable_ = False):
         self._reset()
+        # compile the program once, instead of once per iteration of the loop
+        try:
+            program = self.code_cache.compile(routine, 'eval' if callable_ else 'exec')
+        except SyntaxError:
+            print("SYNTAX ERROR:\n"+routine)
+            exit(0)
         while self.moves < self.max_moves and self.eaten != 89:
             last = self.moves
             try:
                 if callable_:
-                    eval(routine,{'ant':self,'prog3':prog3,
+                    eval(program,{'ant':self,'prog3':prog3,
                                   'prog2':prog2, 'progN':progN, 'dummy':dummy})()
                 else:
-                    exec(routine,{'ant':self})
+                    exec(program,{'ant':self})
                 # protection for circuits that don't make the ant move
                 # loosing energy
                 if last == self.moves:
@@ -167,10 +267,32 @@ class AntSimulator:
                 print("SYNTAX ERROR:\n"+routine)
                 exit(0)
 
+    def runcompiled(self, routine):
+        """Same as runstring(routine), with the routine compiled once into a program for simulate."""
+        program = self.controllers.get(routine)
+        if program is None:
+            try:
+                program = compile_controller(routine)
+            except SyntaxError:
+                print("SYNTAX ERROR:\n"+routine)
+                exit(0)
+            self.controllers.put(routine, program)
+        # like runstring, this stops at 89 pieces of food on any trail
+        self.eaten, self.moves, cell, self.dir = simulate(program, bytearray(self.cells),
+                                                          self.row_start * self.matrix_col + self.col_start, 1,
+                                                          self.ahead, self.max_moves, 89)
+        self.row, self.col = divmod(cell, self.matrix_col)
+
     def evaluate(self, individual):
         if individual is None:
             return 1000, {'generation':0,"moves_needed" : self.max_moves, "evals" : 1, "test_error" : 0}
-        self.runstring(individual, False)
+        if self.backend == "fast":
+            try:
+                self.runcompiled(individual)
+            except ValueError:
+                self.runstring(individual, False)
+        else:
+            self.runstring(individual, False)
         return self.total_pieces-self.eaten, {'generation': 0, "moves_needed": self.moves, "evals": 1, "test_error"
         : 0}
 
@@ -195,9 +317,16 @@ class AntSimulator:
                     self.dir = 1
         self.matrix_row = len(self.matrix)
         self.matrix_col = len(self.matrix[0])
+        # the same trail for the fast simulator, whose bytearray copies of cells are cheap to restore
+        self.grid = np.array([[FOOD if cell == "food" else EMPTY for cell in row] for row in self.matrix],
+                             dtype=np.uint8)
+        self.cells = self.grid.tobytes()
+        self.ahead = [[(row + d_row) % self.matrix_row * self.matrix_col + (col + d_col) % self.matrix_col
+                       for row in range(self.matrix_row) for col in range(self.matrix_col)]
+                      for d_row, d_col in zip(self.dir_row, self.dir_col)]
 
 
 if __name__ == "__main__":
     import sge
-    eval_func = AntSimulator(650)
+    eval_func = AntSimulator(650, backend="fast")
     sge.evolutionary_algorithm(evaluation_function=eval_func, parameters_file="parameters/standard_gp_ant.yml")
\ No newline at end of file
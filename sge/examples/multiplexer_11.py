@@ -15,49 +15,48 @@
 #    License along with DEAP. If not, see <http://www.gnu.org/licenses/>.
 """
 
+from sge.utilities.bit_parallel import BitParallelEvaluator, truth_table
+
 MUX_SELECT_LINES = 3
 MUX_IN_LINES = 2 ** MUX_SELECT_LINES
 MUX_TOTAL_LINES = MUX_SELECT_LINES + MUX_IN_LINES
 
-input_names = ['s0', 's1', 's2', 'i0', 'i1', 'i2', 'i3', 'i4', 'i5', 'i6', 'i7']
-inputs = [[0] * MUX_TOTAL_LINES for i in range(2 ** MUX_TOTAL_LINES)]
-outputs = [None] * (2 ** MUX_TOTAL_LINES)
-
-for i in range(2 ** MUX_TOTAL_LINES):
-    value = i
-    divisor = 2 ** MUX_TOTAL_LINES
-    # Fill the input bits
-    for j in range(MUX_TOTAL_LINES):
-        divisor /= 2
-        if value >= divisor:
-            inputs[i][j] = 1
-            value -= divisor
-    # Determine the corresponding output
-    # The Select most valuable bit is s2
-    indexOutput = MUX_SELECT_LINES
-    for j, k in enumerate(inputs[i][:MUX_SELECT_LINES]):
-        indexOutput += k * 2 ** j
-    outputs[i] = inputs[i][indexOutput]
 
-    to_evaluate = [dict(zip(input_names, i)) for i in inputs]
+def multiplexer(select_lines):
+    """
+    (inputs, target, cases) of the multiplexer with select lines s0, s1, ... and 2 ** select_lines data lines
+    i0, i1, ...: inputs maps each line to the bitmask of its values in the cases of the truth table, and target
+    is the bitmask of the outputs.
+    """
+    in_lines = 2 ** select_lines
+    names = ['s%d' % j for j in range(select_lines)] + ['i%d' % k for k in range(in_lines)]
+    inputs = dict(zip(names, truth_table(len(names))))
+    cases = 2 ** len(names)
+    mask = (1 << cases) - 1
+    target = 0
+    for k in range(in_lines):
+        # the cases where the select lines read k (s0 is the least significant bit) output ik
+        selected = mask
+        for j in range(select_lines):
+            line = inputs['s%d' % j]
+            selected &= line if k >> j & 1 else mask ^ line
+        target |= selected & inputs['i%d' % k]
+    return inputs, target, cases
 
 
 class Multiplexer_11:
+    def __init__(self, select_lines=MUX_SELECT_LINES):
+        # e.g., select_lines=4 for the 20-multiplexer (with a grammar over s0-s3 and i0-i15)
+        self.evaluator = BitParallelEvaluator(*multiplexer(select_lines))
+
     def evaluate(self, individual):
         """
         SOLUTION = "(i0 and (not s2) and (not s1) and (not s0)) or (i1 and (not s2) and (not s1) and (s0)) or (i2 and (not s2) and (s1) and (not s0)) or (i3 and (not s2) and (s1) and (s0)) or (i4 and s2 and not(s1) and not(s0)) or (i5 and s2 and (not s1) and s0) or (i6 and s2 and s1 and (not s0)) or (i7 and s2 and s1 and s0)"
         """
-
-        error = len(inputs)
         try:
-            program = compile("res = " + individual, '<string>', 'exec')
-        except(SyntaxError, MemoryError):
-            return 1000, -1
-        for i, variables in enumerate(to_evaluate):
-            exec(program, variables)
-            res = variables['res']
-            if res == outputs[i]:
-                error -= 1
+            error = self.evaluator.errors(individual)
+        except ValueError:
+            return 1000, {}
         return (error, {})
 
 
@@ -1,37 +1,29 @@
 """
 Lots of code taken from deap
 """
-input_names = ['b0', 'b1', 'b2', 'b3', 'b4']
+from sge.utilities.bit_parallel import BitParallelEvaluator, truth_table
 
 PARITY_FANIN_M = 5
 PARITY_SIZE_M = 2**PARITY_FANIN_M
 
-inputs = [None] * PARITY_SIZE_M
-outputs = [None] * PARITY_SIZE_M
 
-for i in range(PARITY_SIZE_M):
-    inputs[i] = [None] * PARITY_FANIN_M
-    value = i
-    dividor = PARITY_SIZE_M
-    parity = 1
-    for j in range(PARITY_FANIN_M):
-        dividor /= 2
-        if value >= dividor:
-            inputs[i][j] = 1
-            parity = int(not parity)
-            value -= dividor
-        else:
-            inputs[i][j] = 0
-    outputs[i] = parity
+def even_parity(fan_in):
+    """(inputs, target, cases) of even parity over b0, b1, ...: the output is 1 if an even number of inputs is 1."""
+    columns = truth_table(fan_in)
+    cases = 2 ** fan_in
+    odd = 0
+    for column in columns:
+        odd ^= column
+    return dict(zip(['b%d' % j for j in range(fan_in)], columns)), ((1 << cases) - 1) ^ odd, cases
+
 
 class Parity5():
+    def __init__(self, fan_in=PARITY_FANIN_M):
+        # e.g., fan_in=8 for even-parity-8 (with a grammar over b0-b7)
+        self.evaluator = BitParallelEvaluator(*even_parity(fan_in))
+
     def evaluate(self, individual):
-        error = PARITY_SIZE_M
-        for i, inpt in enumerate(inputs):
-            res = eval(individual, dict(zip(input_names, inpt)))
-            if res == outputs[i]:
-                error -= 1
-        return (error, {})
+        return (self.evaluator.errors(individual), {})
 
 if __name__ == "__main__":
     import sge
@@ -1,5 +1,6 @@
 import numpy as np
 import sge
+from sge.utilities.cache import CodeCache
 
 class SimpleSymbolicRegression():
     def __init__(self, num_fitness_cases=20, invalid_fitness=9999999):
@@ -9,14 +10,11 @@ class SimpleSymbolicRegression():
         self.x_points = np.asarray([x for x in range(self.fitness_cases)])
         self.y_points = np.asarray([self.function(x) for x in self.x_points])
         self.x_evals = np.empty(self.fitness_cases)
+        self.code_cache = CodeCache()
 
     def evaluate(self, individual):
         try:
-            code = compile('result = lambda x: ' + individual, 'solution', 'exec')
-            globals_code = {}
-            locals_code = {}
-            exec(code, globals_code, locals_code)
-            func = locals_code['result']
+            func = self.code_cache.function(individual)
             self.x_evals = np.apply_along_axis(func, 0, self.x_points)
             error = np.sum(np.sqrt(np.square(self.x_evals - self.y_points)))
         except (OverflowError, ValueError) as e:
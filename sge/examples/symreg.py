@@ -1,6 +1,8 @@
 import random
+import numpy as np
 from numpy import cos, sin
 from sge.utilities.protected_math import _log_, _div_, _exp_, _inv_, _sqrt_, protdiv
+from sge.utilities.columns import ColumnFunctions, as_columns, squared_errors
 
 
 def drange(start, stop, step):
@@ -11,34 +13,38 @@ def drange(start, stop, step):
 
 
 class SymbolicRegression():
-    def __init__(self, function="quarticpolynomial", has_test_set=False, invalid_fitness=9999999):
+    def __init__(self, function="quarticpolynomial", has_test_set=False, invalid_fitness=9999999, backend="python",
+                 case_errors=False):
         self.__train_set = []
         self.__test_set = None
         self.__number_of_variables = 1
         self.__invalid_fitness = invalid_fitness
         self.partition_rng = random.Random()
+        # with case_errors, other_info also has the error in each training case, for lexicase selection (the
+        # engine turns it on when SELECTION is lexicase)
+        self.case_errors = case_errors
+        # backend="stack_vm" runs the phenotypes on the stack VM instead of compiling them
+        self.compiler = ColumnFunctions(globals(), backend)
         self.function = function
         self.has_test_set = has_test_set
         self.readpolynomial()
+        self.__train_set = as_columns(self.__train_set)
+        if self.__test_set is not None:
+            self.__test_set = as_columns(self.__test_set)
         self.calculate_rrse_denominators()
+
     def calculate_rrse_denominators(self):
         self.__RRSE_train_denominator = 0
         self.__RRSE_test_denominator = 0
-        train_outputs = [entry[-1] for entry in self.__train_set]
-        train_output_mean = float(sum(train_outputs)) / len(train_outputs)
-        self.__RRSE_train_denominator = sum([(i - train_output_mean)**2 for i in train_outputs])
-        if self.__test_set:
-            test_outputs = [entry[-1] for entry in self.__test_set]
-            test_output_mean = float(sum(test_outputs)) / len(test_outputs)
-            self.__RRSE_test_denominator = sum([(i - test_output_mean)**2 for i in test_outputs])
+        train_outputs = self.__train_set[1]
+        self.__RRSE_train_denominator = float(np.sum(np.square(train_outputs - train_outputs.mean())))
+        if self.__test_set is not None:
+            test_outputs = self.__test_set[1]
+            self.__RRSE_test_denominator = float(np.sum(np.square(test_outputs - test_outputs.mean())))
 
     def read_fit_cases(self):
-        f_in = open(self.__file_problem,'r')
-        data = f_in.readlines()
-        f_in.close()
-        fit_cases_str = [ case[:-1].split() for case in data[1:]]
-        self.__train_set = [[float(elem) for elem in case] for case in fit_cases_str]
-        self.__number_of_variables = len(self.__train_set[0]) - 1
+        self.__train_set = np.loadtxt(self.__file_problem, skiprows=1, ndmin=2)
+        self.__number_of_variables = self.__train_set.shape[1] - 1
 
     def readpolynomial(self):
         def quarticpolynomial(inp):
@@ -66,6 +72,7 @@ class SymbolicRegression():
                     l.append([xx,yy,zz])
 
             self.__train_set=l
+            self.__number_of_variables = 2
             self.training_set_size = len(self.__train_set)
             if self.has_test_set:
                 xx = list(drange(-5,5.0,.1))
@@ -73,7 +80,7 @@ class SymbolicRegression():
                 function = eval(self.function)
                 zz = map(function, xx, yy)
 
-                self.__test_set = [xx,yy,zz]
+                self.__test_set = list(zip(xx, yy, zz))
                 self.test_set_size = len(self.__test_set)
         elif self.function in ["quarticpolynomial"]:
             function = eval(self.function)
@@ -89,7 +96,7 @@ class SymbolicRegression():
                 function = eval(self.function)
                 yy = map(function, xx)
 
-                self.__test_set = [xx,yy]
+                self.__test_set = list(zip(xx, yy))
                 self.test_set_size = len(self.__test_set)
         else:
             if self.function == "keijzer6":
@@ -109,19 +116,19 @@ class SymbolicRegression():
                 elif self.function == "keijzer9":
                     xx = list(drange(0,101,.1))
                 yy = map(function,xx)
-                self.__test_set = [xx, yy]
+                self.__test_set = list(zip(xx, yy))
                 self.test_set_size = len(self.__test_set)
 
+    def get_case_errors(self, individual, dataset):
+        """The squared error in each case of dataset (as (x, y) columns), or None if it is invalid."""
+        return squared_errors(self.compiler.function(individual), dataset)
+
     def get_error(self, individual, dataset):
-        pred_error = 0
-        for fit_case in dataset:
-            case_output = fit_case[-1]
-            try:
-                result = eval(individual, globals(), {"x": fit_case[:-1]})
-                pred_error += (case_output - result)**2
-            except (OverflowError, ValueError) as e:
-                return self.__invalid_fitness
-        return pred_error
+        """Sum of the squared errors over all the cases of dataset (as (x, y) columns), or None if it is invalid."""
+        errors = self.get_case_errors(individual, dataset)
+        if errors is None:
+            return None
+        return float(np.sum(errors))
 
     def evaluate(self, individual):
         error = 0.0
@@ -129,18 +136,24 @@ class SymbolicRegression():
         if individual is None:
             return None
 
-        error = self.get_error(individual, self.__train_set)
-        error = _sqrt_( error /self.__RRSE_train_denominator)
-
-        if error is None:
+        case_errors = self.get_case_errors(individual, self.__train_set)
+        if case_errors is None:
             error = self.__invalid_fitness
+            case_errors = np.full(len(self.__train_set[1]), float(self.__invalid_fitness))
+        else:
+            error = float(_sqrt_(float(np.sum(case_errors)) / self.__RRSE_train_denominator))
 
         if self.__test_set is not None:
-            test_error = 0
             test_error = self.get_error(individual, self.__test_set)
-            test_error = _sqrt_( test_error / float(self.__RRSE_test_denominator))
+            if test_error is None:
+                test_error = self.__invalid_fitness
+            else:
+                test_error = float(_sqrt_(test_error / self.__RRSE_test_denominator))
 
-        return error, {'generation': 0, "evals": 1, "test_error": test_error}
+        other_info = {'generation': 0, "evals": 1, "test_error": test_error}
+        if self.case_errors:
+            other_info["case_errors"] = case_errors
+        return error, other_info
 
 
 if __name__ == "__main__":
@@ -1,23 +1,38 @@
+import copy
+import os
 import random
 import sys
+import numpy as np
 import sge.grammar as grammar
 import sge.logger as logger
 from datetime import datetime
-from tqdm import tqdm
+from sge.grammar import Grammar
+from sge.logger import Logger
 from sge.operators.recombination import crossover
 from sge.operators.mutation import mutate
-from sge.operators.selection import tournament
+from sge.operators.selection import tournament_indices, truncation_indices, lexicase_indices
+from sge.operators.vectorized import crossover_population, mutate_population
+from sge.utilities.cache import LRUCache
+from sge.utilities.checkpoint import save_checkpoint, load_checkpoint
+from sge.utilities.seeds import SeedStreams
+from sge.evaluation import make_evaluation
+from sge.individual import Individual, make_genotype
 from sge.parameters import (
     params,
+    DEFAULTS,
     set_parameters,
     load_parameters
 )
 
 
-def generate_random_individual():
-    genotype = [[] for key in grammar.get_non_terminals()]
-    tree_depth = grammar.recursive_individual_creation(genotype, grammar.start_rule()[0], 0)
-    return {'genotype': genotype, 'fitness': None, 'tree_depth' : tree_depth}
+# The functions below work with the module-level grammar, parameters and random state by default.
+# An Evolution passes its own instead.
+
+
+def generate_random_individual(grammar=grammar, rng=None):
+    genotype = make_genotype(len(grammar.get_non_terminals()), grammar.get_codon_typecode())
+    tree_depth = grammar.recursive_individual_creation(genotype, grammar.get_start_rule()[0], 0, rng=rng)
+    return Individual(genotype, tree_depth=tree_depth)
 
 
 def make_initial_population():
@@ -25,89 +40,286 @@ def make_initial_population():
         yield generate_random_individual()
 
 
-def map_individual(ind):
+def map_individual(ind, grammar=grammar):
     """
     Maps the genotype to phenotype and stores auxiliary info.
     """
-    mapping_values = [0 for i in ind['genotype']]
-    phen, tree_depth = grammar.mapping(ind['genotype'], mapping_values)
-    ind['phenotype'] = phen
-    ind['mapping_values'] = mapping_values
-    ind['tree_depth'] = tree_depth
+    mapping_values = [0 for i in ind.genotype]
+    phen, tree_depth = grammar.mapping(ind.genotype, mapping_values)
+    ind.phenotype = phen
+    ind.mapping_values = mapping_values
+    ind.tree_depth = tree_depth
+
+
+def map_individuals(individuals, pool=None, grammar=grammar, seeds=None, mutation=None):
+    """
+    Maps a batch of individuals with a single call to grammar.map_population.
+    If mutation is given, the genotype of individuals[i] is mutated while it is mapped, with probability mutation[i].
+    """
+    if not individuals:
+        return
+    phenotypes, depths, mapping_values = grammar.map_population([ind.genotype for ind in individuals], pool,
+                                                                seeds=seeds, mutation=mutation)
+    for ind, phen, tree_depth, values in zip(individuals, phenotypes, depths.tolist(), mapping_values.tolist()):
+        ind.phenotype = phen
+        ind.mapping_values = values
+        ind.tree_depth = tree_depth
 
 
-def evaluate(ind, eval_func):
-    mapping_values = [0 for i in ind['genotype']]
-    phen, tree_depth = grammar.mapping(ind['genotype'], mapping_values)
+def evaluate(ind, eval_func, grammar=grammar):
+    mapping_values = [0 for i in ind.genotype]
+    phen, tree_depth = grammar.mapping(ind.genotype, mapping_values)
     quality, other_info = eval_func.evaluate(phen)
-    ind['phenotype'] = phen
-    ind['fitness'] = quality
-    ind['other_info'] = other_info
-    ind['mapping_values'] = mapping_values
-    ind['tree_depth'] = tree_depth
+    ind.phenotype = phen
+    ind.fitness = quality
+    ind.other_info = other_info
+    ind.mapping_values = mapping_values
+    ind.tree_depth = tree_depth
 
 
-def setup(parameters_file_path = None):
+def evaluate_individuals(individuals, evaluation):
+    """
+    Evaluates the individuals with the strategy picked by evaluation.make_evaluation.
+    """
+    if not individuals:
+        return
+    results = evaluation.evaluate([ind.phenotype for ind in individuals])
+    for ind, (quality, other_info) in zip(individuals, results):
+        ind.fitness = quality
+        ind.other_info = other_info
+
+
+def evaluate_with_cache(to_evaluate, evaluation, fitness_cache):
+    """
+    Evaluates the individuals whose phenotype is not in the fitness cache, once per distinct phenotype,
+    and copies the fitness and other info to the remaining ones.
+    Returns the fraction of individuals that were not sent to the evaluator.
+    """
+    pending = {}
+    for ind in to_evaluate:
+        cached = fitness_cache.get(ind.phenotype)
+        if cached is not None:
+            ind.fitness = cached[0]
+            ind.other_info = copy.copy(cached[1])
+        else:
+            pending.setdefault(ind.phenotype, []).append(ind)
+    evaluate_individuals([same_phenotype[0] for same_phenotype in pending.values()], evaluation)
+    for phenotype, same_phenotype in pending.items():
+        first = same_phenotype[0]
+        fitness_cache.put(phenotype, (first.fitness, first.other_info))
+        for ind in same_phenotype[1:]:
+            ind.fitness = first.fitness
+            ind.other_info = copy.copy(first.other_info)
+    if not to_evaluate:
+        return 0.0
+    return 1.0 - len(pending) / len(to_evaluate)
+
+
+def select_parents(population, fitness, count, rng, parameters=params):
+    """Indices of count parents, drawn with the SELECTION method from the fitness array of the population."""
+    if parameters['SELECTION'] == 'tournament':
+        return tournament_indices(fitness, count, parameters['TSIZE'], rng)
+    if parameters['SELECTION'] == 'truncation':
+        return truncation_indices(fitness, count, parameters['TRUNCATION'], rng)
+    if parameters['SELECTION'] == 'lexicase':
+        try:
+            case_errors = np.array([ind.other_info['case_errors'] for ind in population], dtype=float)
+        except (KeyError, TypeError):
+            raise ValueError("Lexicase selection needs the evaluator to return the error on each case "
+                             "as other_info['case_errors']")
+        return lexicase_indices(case_errors, count, rng)
+    raise ValueError("Unknown selection method: %s" % parameters['SELECTION'])
+
+
+def breed(population, size, pool=None, fitness=None, parameters=params, grammar=grammar, rng=random):
+    """
+    Builds size offspring by selection, recombination and mutation. Mutation needs the codons that the mapping
+    reads and the depth of the tree, which the new children of recombination do not have yet: they are mutated
+    by the mapper while it maps them, and the other offspring by the mutation operators. The offspring with a new
+    genotype are then mapped in one batch, so each of them is mapped once. Offspring that were not changed keep
+    the phenotype and fitness of their parent. All the parents are drawn at once from fitness, the array with the
+    fitness of the population.
+    """
+    np_rng = np.random.default_rng(rng.getrandbits(64))
+    if fitness is None:
+        fitness = np.array([ind.fitness for ind in population], dtype=float)
+    recombined = np.flatnonzero(np_rng.random(size) < parameters['PROB_CROSSOVER']).tolist()
+    parents = [population[i] for i in select_parents(population, fitness, size, np_rng, parameters).tolist()]
+    mates = [population[i] for i in select_parents(population, fitness, len(recombined), np_rng, parameters).tolist()]
+    vectorized = parameters['OPERATORS'] == 'vectorized'
+    if vectorized:
+        children = crossover_population([parents[i] for i in recombined], mates, np_rng)
+    else:
+        children = [crossover(parents[i], mate, rng) for i, mate in zip(recombined, mates)]
+    offspring = parents
+    for i, child in zip(recombined, children):
+        offspring[i] = child
+    mapped = [i for i, ind in enumerate(offspring) if ind.mapping_values is not None]
+    if vectorized:
+        mutants = mutate_population([offspring[i] for i in mapped], parameters['PROB_MUTATION'], np_rng, grammar)
+    else:
+        mutants = [mutate(offspring[i], parameters['PROB_MUTATION'], grammar, rng) for i in mapped]
+    for i, mutant in zip(mapped, mutants):
+        offspring[i] = mutant
+    to_map = [ind for ind in offspring if ind.phenotype is None]
+    # the mutants were mutated above, and the new children of recombination are mutated while they are mapped
+    mutation = [parameters['PROB_MUTATION'] if ind.mapping_values is None else 0.0 for ind in to_map]
+    # one seed per genotype, so that the mapping does not depend on how the pool splits the batch
+    map_individuals(to_map, pool, grammar, [rng.getrandbits(64) for _ in to_map], mutation)
+    return offspring
+
+
+def configure(parameters_file_path=None):
+    """Reads the parameters from the file and the command line, and picks a seed if none was given."""
     if parameters_file_path is not None:
         load_parameters(file_name=parameters_file_path)
     set_parameters(sys.argv[1:])
     if params['SEED'] is None:
         params['SEED'] = int(datetime.now().microsecond)
+
+
+def initialize():
+    """Prepares the log directory, the random state and the module-level grammar from the current parameters."""
     logger.prepare_dumps()
     random.seed(params['SEED'])
     grammar.set_path(params['GRAMMAR'])
+    grammar.set_cache_dir(params['GRAMMAR_CACHE_DIR'])
     grammar.read_grammar()
     grammar.set_max_tree_depth(params['MAX_TREE_DEPTH'])
     grammar.set_min_init_tree_depth(params['MIN_TREE_DEPTH'])
 
 
-def evolutionary_algorithm(evaluation_function=None, parameters_file=None):
-    setup(parameters_file_path=parameters_file)
-    population = list(make_initial_population())
-    it = 0
-    while it <= params['GENERATIONS']:
-        # 1. Identify individuals that need evaluation
-        to_evaluate = [ind for ind in population if ind['fitness'] is None]
-        # 2. Map Genotypes to Phenotypes for all of them
-        for ind in to_evaluate:
-            map_individual(ind)
-        #Batch vs Single
-        if to_evaluate:
-            phenotypes = [ind['phenotype'] for ind in to_evaluate]
-            try:
-                # --- ATTEMPT BATCH EVALUATION ---
-                # Try passing the whole list of phenotypes to the evaluator
-                results = evaluation_function.evaluate(phenotypes)
-                
-                # Check if the result is valid (must be a list of same length as input)
-                if isinstance(results, (list, tuple)) and len(results) == len(to_evaluate):
-                    # Assign results from batch
-                    for ind, res in zip(to_evaluate, results):
-                        ind['fitness'] = res[0]
-                        ind['other_info'] = res[1]
+def setup(parameters_file_path = None):
+    configure(parameters_file_path)
+    initialize()
+
+
+def sort_population(population):
+    """The population sorted by fitness (best first) and the array with the sorted fitness values."""
+    fitness = np.array([ind.fitness for ind in population], dtype=float)
+    order = np.argsort(fitness, kind='stable')
+    return [population[i] for i in order.tolist()], fitness[order]
+
+
+class Evolution:
+    """
+    One run of the evolutionary algorithm. It owns its parameters (a copy of DEFAULTS updated with parameters),
+    Grammar, random state and Logger, and does not touch the module-level ones, so several runs can share
+    one process, one after the other or in concurrent threads.
+    The random numbers come from SeedStreams derived from SEED (and ISLAND, in the island model): each
+    generation has its own streams for breeding and for mapping, and each genotype gets its own seed, so a run
+    gives the same populations whatever the number of workers.
+    With CHECKPOINT_STEP > 0 the state of the run is saved every CHECKPOINT_STEP generations, and with RESUME
+    the run continues from the last checkpoint in its directory (or starts from scratch if there is none).
+    """
+    # parameters that may change when a run is resumed, since they do not change the results
+    RESUME_OVERRIDES = ('RESUME', 'GENERATIONS', 'CHECKPOINT_STEP', 'VERBOSE', 'MAPPING_WORKERS', 'WORKERS')
+
+    def __init__(self, evaluation_function, parameters=None):
+        self.evaluation_function = evaluation_function
+        self.params = dict(DEFAULTS)
+        if parameters is not None:
+            self.params.update(parameters)
+        if self.params['SEED'] is None:
+            self.params['SEED'] = int(datetime.now().microsecond)
+        self.logger = Logger(self.params)
+        self.checkpoint = None
+        if self.params['RESUME'] and os.path.exists(self.checkpoint_file()):
+            self.checkpoint = load_checkpoint(self.checkpoint_file())
+            self.params.update((key, value) for key, value in self.checkpoint['params'].items()
+                               if key not in self.RESUME_OVERRIDES)
+        self.logger.prepare_dumps()
+        self.seeds = SeedStreams(self.params['SEED'])
+        if self.params['ISLAND'] is not None:
+            self.seeds = self.seeds.spawn('island', self.params['ISLAND'])
+        self.rng = self.seeds.random('run')
+        self.grammar = Grammar(rng=self.rng)
+        self.grammar.set_path(self.params['GRAMMAR'])
+        self.grammar.set_cache_dir(self.params['GRAMMAR_CACHE_DIR'])
+        self.grammar.read_grammar()
+        self.grammar.set_max_tree_depth(self.params['MAX_TREE_DEPTH'])
+        self.grammar.set_min_init_tree_depth(self.params['MIN_TREE_DEPTH'])
+
+    def checkpoint_file(self):
+        return os.path.join(self.logger.run_directory(), 'checkpoint.pickle.zlib')
+
+    def save_checkpoint(self, generation, population, fitness_cache):
+        """Saves what is needed to continue the run at generation, with the population that is about to be evaluated."""
+        save_checkpoint(self.checkpoint_file(), {'generation': generation,
+                                                 'population': population,
+                                                 'params': self.params,
+                                                 'rng_state': self.rng.getstate(),
+                                                 'fitness_cache': fitness_cache})
+
+    def make_initial_population(self):
+        seeds = self.seeds.seeds(self.params['POPSIZE'], 'initialization')
+        return [generate_random_individual(self.grammar, random.Random(seed)) for seed in seeds]
+
+    def run(self, migrate=None):
+        """
+        Runs the evolutionary loop and returns the last population, sorted by fitness.
+        If migrate is given, it is called as migrate(generation, population) after each generation is evaluated,
+        and the individuals it returns (already evaluated) replace the worst ones of the population.
+        """
+        params = self.params
+        mapping_pool = None
+        if params['MAPPING_WORKERS'] > 1:
+            mapping_pool = self.grammar.make_mapping_pool(params['MAPPING_WORKERS'])
+        # evaluators that can give the error on each fitness case only do it when lexicase selection needs it
+        if hasattr(self.evaluation_function, 'case_errors'):
+            self.evaluation_function.case_errors = params['SELECTION'] == 'lexicase'
+        # batch or single evaluation is decided once, from what the evaluator declares
+        evaluation = make_evaluation(self.evaluation_function, params['WORKERS'])
+        fitness_cache = None
+        if params['FITNESS_CACHE_SIZE'] > 0:
+            fitness_cache = LRUCache(params['FITNESS_CACHE_SIZE'])
+        if self.checkpoint is not None:
+            population, it = self.checkpoint['population'], self.checkpoint['generation']
+            self.rng.setstate(self.checkpoint['rng_state'])
+            if fitness_cache is not None and self.checkpoint['fitness_cache'] is not None:
+                fitness_cache = self.checkpoint['fitness_cache']
+            # generations logged after the checkpoint was written are logged again
+            self.logger.rewind(it)
+        else:
+            population = self.make_initial_population()
+            it = 0
+        try:
+            while True:
+                # 1. Identify individuals that need evaluation
+                to_evaluate = [ind for ind in population if ind.fitness is None]
+                # 2. Map Genotypes to Phenotypes for all of them that are not mapped yet (i.e., the initial population)
+                to_map = [ind for ind in to_evaluate if ind.phenotype is None]
+                map_individuals(to_map, mapping_pool, self.grammar, self.seeds.seeds(len(to_map), it, 'mapping'))
+                # 3. Evaluate them, reusing the fitness of programs that were already seen
+                cache_hit_rate = None
+                if fitness_cache is None:
+                    evaluate_individuals(to_evaluate, evaluation)
                 else:
-                    # If result isn't a list or wrong length, force fallback
-                    raise ValueError("Batch evaluation returned invalid format.")
-
-            except (AttributeError, TypeError, ValueError, Exception):
-                # --- FALLBACK TO SINGLE EVALUATION ---
-                # If batch fails (e.g. function expects single item), loop manually
-                for ind in tqdm(to_evaluate):
-                    quality, other_info = evaluation_function.evaluate(ind['phenotype'])
-                    ind['fitness'] = quality
-                    ind['other_info'] = other_info
-        population.sort(key=lambda x: x['fitness'])
-        logger.evolution_progress(it, population)
-        new_population = population[:params['ELITISM']]
-        while len(new_population) < params['POPSIZE']:
-            if random.random() < params['PROB_CROSSOVER']:
-                p1 = tournament(population, params['TSIZE'])
-                p2 = tournament(population, params['TSIZE'])
-                ni = crossover(p1, p2)
-            else:
-                ni = tournament(population, params['TSIZE'])
-            ni = mutate(ni, params['PROB_MUTATION'])
-            new_population.append(ni)
-        population = new_population
-        it += 1
+                    cache_hit_rate = evaluate_with_cache(to_evaluate, evaluation, fitness_cache)
+                population, fitness = sort_population(population)
+                self.logger.evolution_progress(it, population, cache_hit_rate)
+                if it + 1 > params['GENERATIONS']:
+                    return population
+                if migrate is not None:
+                    immigrants = migrate(it, population)
+                    if immigrants:
+                        population, fitness = sort_population(population[:len(population) - len(immigrants)] +
+                                                              immigrants)
+                new_population = population[:params['ELITISM']]
+                new_population += breed(population, params['POPSIZE'] - len(new_population), mapping_pool, fitness,
+                                        params, self.grammar, self.seeds.random(it, 'breed'))
+                population = new_population
+                it += 1
+                if params['CHECKPOINT_STEP'] > 0 and it % params['CHECKPOINT_STEP'] == 0:
+                    self.save_checkpoint(it, population, fitness_cache)
+        finally:
+            if mapping_pool is not None:
+                mapping_pool.close()
+                mapping_pool.join()
+            evaluation.close()
+            self.logger.close()
 
+
+def evolutionary_algorithm(evaluation_function=None, parameters_file=None):
+    configure(parameters_file)
+    return Evolution(evaluation_function, params).run()
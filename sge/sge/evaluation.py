@@ -0,0 +1,92 @@
+"""
+Strategies used by the engine to evaluate a list of phenotypes.
+An evaluator must provide evaluate(phenotype), returning (fitness, other_info). Evaluators that can do better
+with the whole list at once also provide evaluate_batch(phenotypes), returning one (fitness, other_info) per
+phenotype, in the same order. The strategy is picked once, when the run starts (see make_evaluation).
+Evaluators that can give the error of a phenotype on each fitness case, which lexicase selection needs, have
+a case_errors attribute: the engine sets it to True for lexicase runs, and the evaluator then puts the errors
+in other_info['case_errors'] as an ndarray. Snapshots leave them out (see Individual.to_dict).
+"""
+import multiprocessing
+from tqdm import tqdm
+
+
+def is_batch_evaluator(evaluation_function):
+    return callable(getattr(evaluation_function, 'evaluate_batch', None))
+
+
+class SerialEvaluation:
+    """Evaluates the phenotypes one by one in the main process."""
+
+    def __init__(self, evaluation_function):
+        self.evaluation_function = evaluation_function
+
+    def evaluate(self, phenotypes):
+        return [self.evaluation_function.evaluate(phenotype) for phenotype in tqdm(phenotypes)]
+
+    def close(self):
+        pass
+
+
+class BatchEvaluation:
+    """Hands the full list of phenotypes to the evaluator's evaluate_batch."""
+
+    def __init__(self, evaluation_function):
+        self.evaluation_function = evaluation_function
+
+    def evaluate(self, phenotypes):
+        results = self.evaluation_function.evaluate_batch(phenotypes)
+        if len(results) != len(phenotypes):
+            raise ValueError("evaluate_batch returned %d results for %d phenotypes" % (len(results), len(phenotypes)))
+        return results
+
+    def close(self):
+        pass
+
+
+_worker_evaluator = None
+
+
+def _init_worker(evaluation_function):
+    global _worker_evaluator
+    _worker_evaluator = evaluation_function
+
+
+def _evaluate_phenotype(phenotype):
+    return _worker_evaluator.evaluate(phenotype)
+
+
+class EvaluationPool:
+    """
+    Persistent pool of processes to evaluate phenotypes in parallel.
+    The evaluator is shipped once to every worker when the pool starts, afterwards only phenotypes and
+    results go through the pipes. Results come back in the order of the phenotypes, so with a deterministic
+    evaluator a run gives the same results as the serial evaluation.
+    """
+
+    def __init__(self, evaluation_function, workers):
+        self.workers = workers
+        self.pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(evaluation_function,))
+
+    def chunksize(self, size):
+        # a few chunks per worker balances uneven evaluation times without paying one message per phenotype
+        return max(1, -(-size // (4 * self.workers)))
+
+    def evaluate(self, phenotypes):
+        return self.pool.map(_evaluate_phenotype, phenotypes, self.chunksize(len(phenotypes)))
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+
+def make_evaluation(evaluation_function, workers=1):
+    """
+    Picks how the population is evaluated: batch evaluators get every phenotype in a single call (they are
+    in charge of their own parallelism), the others are evaluated one by one, in workers processes if workers > 1.
+    """
+    if is_batch_evaluator(evaluation_function):
+        return BatchEvaluation(evaluation_function)
+    if workers > 1:
+        return EvaluationPool(evaluation_function, workers)
+    return SerialEvaluation(evaluation_function)
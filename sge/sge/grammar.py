@@ -1,6 +1,13 @@
+import os
 import re
+import pickle
 import random
+import hashlib
+import tempfile
+import multiprocessing.pool
+import numpy as np
 from sge.utilities import ordered_set
+from sge.utilities.seeds import LazyRandom
 
 
 class Grammar:
@@ -10,9 +17,19 @@ class Grammar:
     NT_PATTERN = "(<.+?>)"
     RULE_SEPARATOR = "::="
     PRODUCTION_SEPARATOR = "|"
+    # escapes and indentation tokens understood by the python emitter (see python_segments)
+    PYTHON_ESCAPES = ((r"\le", "<="), (r"\ge", ">="), (r"\l", "<"), (r"\g", ">"), (r"\eb", "|"))
+    PYTHON_TOKENS = {"{:": 1, ":}": -1, r"\n": 0, "\n": None}
+    PYTHON_TOKEN_PATTERN = re.compile(r"(\{:|:\}|\\n|\n)")
+    UNREACHABLE_DEPTH = 999999
+    # bump whenever the contents of the preprocessing cache change
+    CACHE_VERSION = 1
 
-    def __init__(self):
+    def __init__(self, grammar_path=None, max_depth=None, min_init_depth=None, rng=None):
+        # source of the random choices made when growing and mapping trees (a random.Random, or the random module)
+        self.rng = rng if rng is not None else random
         self.grammar_file = None
+        self.cache_dir = None
         self.grammar = {}
         self.productions_labels = {}
         self.non_terminals, self.terminals = set(), set()
@@ -23,10 +40,44 @@ class Grammar:
         self.max_depth = None
         self.max_init_depth = None
         self.shortest_path = {}
+        # integer-coded tables built by compile_grammar()
+        self.nt_ids = {}
+        self.terminal_symbols = []
+        self.python_terminals = []
+        self.python_grammar = False
+        self.codon_typecode = 'B'
+        self.compiled_productions = ()
+        self.reversed_productions = ()
+        self.arities = ()
+        self.shortest_path_choices = ()
+        self.start_symbol_id = None
+        if max_depth is not None:
+            self.set_max_tree_depth(max_depth)
+        if min_init_depth is not None:
+            self.set_min_init_tree_depth(min_init_depth)
+        if grammar_path is not None:
+            self.set_path(grammar_path)
+            self.read_grammar()
+
+    def __getstate__(self):
+        # the random module itself cannot be pickled: it is restored as the default on the other side
+        state = self.__dict__.copy()
+        if state['rng'] is random:
+            state['rng'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.rng is None:
+            self.rng = random
 
     def set_path(self, grammar_path):
         self.grammar_file = grammar_path
 
+    def set_cache_dir(self, cache_dir):
+        """Directory where the preprocessed grammar is cached (None disables the cache)."""
+        self.cache_dir = cache_dir
+
     def get_non_recursive_options(self):
         return self.non_recursive_options
 
@@ -47,73 +98,180 @@ class Grammar:
         if self.grammar_file is None:
             raise Exception("You need to specify the path of the grammar file")
 
-        with open(self.grammar_file, "r") as f:
-            for line in f:
-                if not line.startswith("#") and line.strip() != "":
-                    if line.find(self.PRODUCTION_SEPARATOR):
-                        left_side, productions = line.split(self.RULE_SEPARATOR)
-                        left_side = left_side.strip()
-                        if not re.search(self.NT_PATTERN, left_side):
-                            raise ValueError("Left side not a non-terminal!")
-                        self.non_terminals.add(left_side)
-                        self.ordered_non_terminals.add(left_side)
-                        # assumes that the first rule in the file is the axiom
-                        if self.start_rule is None:
-                            self.start_rule = (left_side, self.NT)
-                        temp_productions = []
-                        for production in [production.strip() for production in productions.split(self.PRODUCTION_SEPARATOR)]:
-                            temp_production = []
-                            if not re.search(self.NT_PATTERN, production):
-                                if production == "None":
-                                    production = ""
-                                self.terminals.add(production)
-                                temp_production.append((production, self.T))
-                            else:
-                                for value in re.findall("<.+?>|[^<>]*", production):
-                                    if value != "":
-                                        if re.search(self.NT_PATTERN, value) is None:
-                                            sym = (value, self.T)
-                                            self.terminals.add(value)
-                                        else:
-                                            sym = (value, self.NT)
-                                        temp_production.append(sym)
-                            temp_productions.append(temp_production)
-                        if left_side not in self.grammar:
-                            self.grammar[left_side] = temp_productions
+        with open(self.grammar_file, "rb") as f:
+            content = f.read()
+        cache_file = self.cache_file(content)
+        if cache_file is not None and self.load_cache(cache_file):
+            self.compile_grammar()
+            return
+
+        for line in content.decode("utf-8").splitlines():
+            if not line.startswith("#") and line.strip() != "":
+                if line.find(self.PRODUCTION_SEPARATOR):
+                    left_side, productions = line.split(self.RULE_SEPARATOR)
+                    left_side = left_side.strip()
+                    if not re.search(self.NT_PATTERN, left_side):
+                        raise ValueError("Left side not a non-terminal!")
+                    self.non_terminals.add(left_side)
+                    self.ordered_non_terminals.add(left_side)
+                    # assumes that the first rule in the file is the axiom
+                    if self.start_rule is None:
+                        self.start_rule = (left_side, self.NT)
+                    temp_productions = []
+                    for production in [production.strip() for production in productions.split(self.PRODUCTION_SEPARATOR)]:
+                        temp_production = []
+                        if not re.search(self.NT_PATTERN, production):
+                            if production == "None":
+                                production = ""
+                            self.terminals.add(production)
+                            temp_production.append((production, self.T))
+                        else:
+                            for value in re.findall("<.+?>|[^<>]*", production):
+                                if value != "":
+                                    if re.search(self.NT_PATTERN, value) is None:
+                                        sym = (value, self.T)
+                                        self.terminals.add(value)
+                                    else:
+                                        sym = (value, self.NT)
+                                    temp_production.append(sym)
+                        temp_productions.append(temp_production)
+                    if left_side not in self.grammar:
+                        self.grammar[left_side] = temp_productions
         # self.compute_non_recursive_options()
         self.find_shortest_path()
+        self.count_number_of_options_in_production()
+        if cache_file is not None:
+            self.save_cache(cache_file)
+        self.compile_grammar()
+
+    def cache_file(self, content):
+        """Path of the cache entry for a grammar file with the given content, keyed by its hash."""
+        if self.cache_dir is None:
+            return None
+        digest = hashlib.sha256(content).hexdigest()
+        return os.path.join(self.cache_dir, "grammar_%s_v%d.pickle" % (digest, self.CACHE_VERSION))
+
+    def load_cache(self, cache_file):
+        """
+        Loads the cache entry into this grammar, or returns False if it cannot be read. Entries written by an older
+        layout of the grammar (which fail with AttributeError, KeyError, TypeError, ...) count as missing, so the
+        grammar is rebuilt and the entry is written again.
+        """
+        try:
+            with open(cache_file, "rb") as f:
+                state = pickle.load(f)
+            fields = (state['grammar'], state['non_terminals'], state['terminals'],
+                      ordered_set.OrderedSet(state['ordered_non_terminals']), state['start_rule'],
+                      state['number_of_options_by_non_terminal'], state['shortest_path'])
+        except Exception:
+            return False
+        (self.grammar, self.non_terminals, self.terminals, self.ordered_non_terminals, self.start_rule,
+         self.number_of_options_by_non_terminal, self.shortest_path) = fields
+        return True
+
+    def save_cache(self, cache_file):
+        state = {'grammar': self.grammar,
+                 'non_terminals': self.non_terminals,
+                 'terminals': self.terminals,
+                 'ordered_non_terminals': list(self.ordered_non_terminals),
+                 'start_rule': self.start_rule,
+                 'number_of_options_by_non_terminal': self.number_of_options_by_non_terminal,
+                 'shortest_path': self.shortest_path}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # write to a temporary file first, so that concurrent runs never read a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_file)
+
+
+    def compile_grammar(self):
+        """
+        Builds the integer-coded form of the grammar used by the mapping hot path.
+        Non-terminals are identified by their position in ordered_non_terminals (i.e., the gene
+        they own), terminals are encoded as negative codes (-1 - index in terminal_symbols).
+        """
+        self.nt_ids = {nt: index for index, nt in enumerate(self.ordered_non_terminals)}
+        terminal_ids = {}
+        self.terminal_symbols = []
+        productions = []
+        for nt in self.ordered_non_terminals:
+            nt_productions = []
+            for production in self.grammar[nt]:
+                codes = []
+                for symbol, kind in production:
+                    if kind == self.NT:
+                        if symbol not in self.nt_ids:
+                            raise ValueError("Non-terminal %s is used but never defined!" % symbol)
+                        codes.append(self.nt_ids[symbol])
+                    else:
+                        if symbol not in terminal_ids:
+                            terminal_ids[symbol] = len(self.terminal_symbols)
+                            self.terminal_symbols.append(symbol)
+                        codes.append(-1 - terminal_ids[symbol])
+                nt_productions.append(tuple(codes))
+            productions.append(tuple(nt_productions))
+        self.compiled_productions = tuple(productions)
+        self.reversed_productions = tuple(tuple(production[::-1] for production in nt_productions)
+                                          for nt_productions in productions)
+        self.arities = tuple(len(nt_productions) for nt_productions in productions)
+        self.shortest_path_choices = tuple(
+            tuple(self.grammar[nt].index(rule) for rule in self.shortest_path[(nt, self.NT)][1:])
+            for nt in self.ordered_non_terminals)
+        self.start_symbol_id = self.nt_ids[self.start_rule[0]]
+        self.python_terminals = [self.python_segments(symbol) for symbol in self.terminal_symbols]
+        # smallest array typecode able to hold every codon of the grammar
+        largest_codon = max(self.arities) - 1
+        self.codon_typecode = 'B' if largest_codon < 2 ** 8 else 'H' if largest_codon < 2 ** 16 else 'I'
+        self.python_grammar = self.grammar_file is not None and self.grammar_file.endswith("pybnf")
 
     def find_shortest_path(self):
-        open_symbols = []
-        for nt in self.grammar.keys():
-            depth = self.minimum_path_calc((nt,'NT'), open_symbols)                    
-            
-    def minimum_path_calc(self, current_symbol, open_symbols):
-        if current_symbol[1] == self.T:
-            return 0
-        else:
-            open_symbols.append(current_symbol)
-            for derivation_option in self.grammar[current_symbol[0]]:
-                max_depth = 0
-                if current_symbol not in self.shortest_path:
-                    self.shortest_path[current_symbol] = [999999]
-                if bool(sum([i in open_symbols for i in derivation_option])):
+        """
+        Computes, for every non-terminal, the minimum depth of a tree rooted in it and the productions that achieve it.
+        depth(T) = 0 and depth(nt) = min over the productions of 1 + max(depth(symbol)), solved as a fixed point:
+        non-terminals are settled in increasing order of depth, and a production becomes available at depth d + 1
+        once the last of its non-terminals is settled at depth d. Each production is visited once per symbol,
+        so this is linear in the size of the grammar.
+        """
+        # for every non-terminal, the productions (head, index) in which it occurs
+        occurrences = {}
+        pending = {}
+        settled = {}
+        frontier = []
+        for nt, productions in self.grammar.items():
+            for index, production in enumerate(productions):
+                symbols = set(symbol for symbol, kind in production if kind == self.NT)
+                pending[(nt, index)] = len(symbols)
+                for symbol in symbols:
+                    occurrences.setdefault(symbol, []).append((nt, index))
+                if not symbols:
+                    frontier.append(nt)
+        depth = 1
+        while frontier:
+            next_frontier = []
+            for nt in frontier:
+                if nt in settled:
                     continue
-                if current_symbol not in derivation_option:
-                    for symbol in derivation_option:
-                        depth = self.minimum_path_calc(symbol, open_symbols)
-                        depth += 1
-                        if depth > max_depth:
-                            max_depth = depth
-                    if max_depth < self.shortest_path[current_symbol][0]:
-                        self.shortest_path[current_symbol] = [max_depth]
-                        if derivation_option not in self.shortest_path[current_symbol]:
-                            self.shortest_path[current_symbol].append(derivation_option)
-                    elif max_depth == self.shortest_path[current_symbol][0]:
-                        if derivation_option not in self.shortest_path[current_symbol]:
-                            self.shortest_path[current_symbol].append(derivation_option)
-            open_symbols.remove(current_symbol)
-            return self.shortest_path[current_symbol][0]
+                settled[nt] = depth
+                for head, index in occurrences.get(nt, []):
+                    pending[(head, index)] -= 1
+                    if pending[(head, index)] == 0 and head not in settled:
+                        next_frontier.append(head)
+            frontier = next_frontier
+            depth += 1
+
+        self.shortest_path = {}
+        for nt, productions in self.grammar.items():
+            if nt not in settled:
+                self.shortest_path[(nt, self.NT)] = [self.UNREACHABLE_DEPTH]
+                continue
+            path = [settled[nt]]
+            for production in productions:
+                production_depth = 1 + max([settled.get(symbol, self.UNREACHABLE_DEPTH) if kind == self.NT else 0
+                                            for symbol, kind in production] or [0])
+                if production_depth == settled[nt] and production not in path:
+                    path.append(production)
+            self.shortest_path[(nt, self.NT)] = path
 
     def get_shortest_path(self):
         return self.shortest_path
@@ -124,6 +282,18 @@ class Grammar:
     def get_non_terminals(self):
         return self.ordered_non_terminals
 
+    def get_arities(self):
+        return self.arities
+
+    def get_shortest_path_choices(self):
+        return self.shortest_path_choices
+
+    def get_compiled_productions(self):
+        return self.compiled_productions
+
+    def get_codon_typecode(self):
+        return self.codon_typecode
+
     def count_number_of_options_in_production(self):
         if self.number_of_options_by_non_terminal is None:
             self.number_of_options_by_non_terminal = {}
@@ -149,84 +319,280 @@ class Grammar:
                 non_recursive_elements += [options]
         return non_recursive_elements
 
-    def recursive_individual_creation(self, genome, symbol, current_depth):
+    def recursive_individual_creation(self, genome, symbol, current_depth, recursive=False, rng=None):
+        """
+        Grows a random derivation tree from symbol, appending the choices to genome.
+        The tree is built with an explicit stack (the name is kept for compatibility); recursive=True
+        uses the original recursive implementation, which produces exactly the same genome.
+        The choices are drawn from rng, or from the grammar's rng if it is None.
+        """
+        rng = rng if rng is not None else self.rng
+        if recursive:
+            return self._recursive_creation(genome, self.nt_ids[symbol], current_depth, rng)
+        return self._iterative_creation(genome, self.nt_ids[symbol], current_depth, rng)
+
+    def _iterative_creation(self, genome, nt_id, current_depth, rng):
+        reversed_productions = self.reversed_productions
+        shortest_path_choices = self.shortest_path_choices
+        arities = self.arities
+        max_init_depth = self.max_init_depth
+        max_depth = current_depth
+        codes, depths = [nt_id], [current_depth]
+        while codes:
+            code = codes.pop()
+            depth = depths.pop()
+            if code < 0:
+                continue
+            if depth > max_depth:
+                max_depth = depth
+            if depth > max_init_depth:
+                expansion_possibility = rng.choice(shortest_path_choices[code])
+            else:
+                expansion_possibility = rng.randint(0, arities[code] - 1)
+            genome[code].append(expansion_possibility)
+            production = reversed_productions[code][expansion_possibility]
+            codes.extend(production)
+            depths.extend([depth + 1] * len(production))
+        return max_depth
+
+    def _recursive_creation(self, genome, nt_id, current_depth, rng):
         if current_depth > self.max_init_depth:
-            possibilities = self.shortest_path[(symbol,'NT')][1:]
-            rule = random.choice(possibilities)
-            expansion_possibility = self.grammar[symbol].index(rule)
+            expansion_possibility = rng.choice(self.shortest_path_choices[nt_id])
         else:
-            expansion_possibility = random.randint(0, self.count_number_of_options_in_production()[symbol] - 1)
-
-        genome[self.get_non_terminals().index(symbol)].append(expansion_possibility)
-        expansion_symbols = self.grammar[symbol][expansion_possibility]
-        depths = [current_depth]
-        for sym in expansion_symbols:
-            if sym[1] != self.T:
-                depths.append(self.recursive_individual_creation(genome, sym[0], current_depth + 1))
-        return max(depths)
+            expansion_possibility = rng.randint(0, self.arities[nt_id] - 1)
+        genome[nt_id].append(expansion_possibility)
+        max_depth = current_depth
+        for code in self.compiled_productions[nt_id][expansion_possibility]:
+            if code >= 0:
+                depth = self._recursive_creation(genome, code, current_depth + 1, rng)
+                if depth > max_depth:
+                    max_depth = depth
+        return max_depth
 
-    def mapping(self, mapping_rules, positions_to_map=None, needs_python_filter=False):
+    def mapping(self, mapping_rules, positions_to_map=None, needs_python_filter=False, recursive=False, rng=None,
+                pmutation=0.0):
+        """
+        Maps the genotype mapping_rules to its phenotype and returns it with the depth of the tree.
+        Codons missing from the genes are drawn from rng (by default, the grammar's rng) and appended to them.
+        With pmutation > 0 the genotype is mutated while it is mapped: every codon that is read is changed
+        with probability pmutation before it is used, as mutation.mutate does, except that the depth limit is
+        checked at the node being expanded, since the depth of the whole tree is only known at the end.
+        """
+        rng = rng if rng is not None else self.rng
         if positions_to_map is None:
             positions_to_map = [0] * len(self.ordered_non_terminals)
         output = []
-        max_depth = self._recursive_mapping(mapping_rules, positions_to_map, self.start_rule, 0, output)
-        output = "".join(output)
-        if self.grammar_file.endswith("pybnf"):
-            output = self.python_filter(output)
+        python_output = needs_python_filter or self.python_grammar
+        if recursive:
+            max_depth = self._recursive_mapping(mapping_rules, positions_to_map, self.start_symbol_id, 0, output, rng,
+                                                pmutation, set())
+            output = "".join(output)
+            if python_output:
+                output = self.python_filter(output)
+        elif python_output:
+            # the terminals are emitted already split in text and indentation tokens
+            max_depth = self._iterative_mapping(mapping_rules, positions_to_map, output, self.python_terminals, rng,
+                                                pmutation)
+            output = self.emit_python(output)
+        else:
+            max_depth = self._iterative_mapping(mapping_rules, positions_to_map, output, self.terminal_symbols, rng,
+                                                pmutation)
+            output = "".join(output)
         return output, max_depth
 
-    def _recursive_mapping(self, mapping_rules, positions_to_map, current_sym, current_depth, output):
-        depths = [current_depth]
-        if current_sym[1] == self.T:
-            output.append(current_sym[0])
+    def map_population(self, genotypes, pool=None, needs_python_filter=False, seeds=None, mutation=None):
+        """
+        Maps a batch of genotypes in a single call.
+        Returns the list of phenotypes, an int array with the tree depths and a (len(genotypes) x #NT) int array
+        with the mapping values. As in mapping, genes that need more codons are replaced with extended copies,
+        and, if mutation is given, each genotype is mutated while it is mapped, with probability mutation[i].
+        If a pool created by make_mapping_pool is given, the batch is split in chunks across its workers.
+        The missing codons of each genotype are drawn from its own random.Random(seeds[i]), so the result does not
+        depend on the pool; without seeds, they are drawn from the grammar's rng.
+        """
+        size = len(genotypes)
+        phenotypes = [None] * size
+        depths = np.zeros(size, dtype=np.int32)
+        mapping_values = np.zeros((size, len(self.ordered_non_terminals)), dtype=np.int32)
+        if pool is not None and size > 1:
+            if seeds is None:
+                seeds = [self.rng.getrandbits(64) for _ in range(size)]
+            # about four chunks per worker of the pool
+            workers = getattr(pool, 'workers', None) or os.cpu_count() or 1
+            chunksize = max(1, -(-size // (4 * workers)))
+            if mutation is None:
+                mutation = [0.0] * size
+            chunks = [(genotypes[start:start + chunksize], seeds[start:start + chunksize],
+                       mutation[start:start + chunksize], needs_python_filter)
+                      for start in range(0, size, chunksize)]
+            index = 0
+            for results in pool.map(_map_chunk, chunks):
+                for phenotype, depth, positions, changed_genes in results:
+                    genotype = genotypes[index]
+                    for code, gene in enumerate(changed_genes):
+                        if gene is not None:
+                            genotype[code] = gene
+                    phenotypes[index], depths[index], mapping_values[index] = phenotype, depth, positions
+                    index += 1
         else:
-            current_sym_pos = self.ordered_non_terminals.index(current_sym[0])
-            choices = self.grammar[current_sym[0]]
-            size_of_gene = self.count_number_of_options_in_production()
-            if positions_to_map[current_sym_pos] >= len(mapping_rules[current_sym_pos]):
-                if current_depth > self.max_depth:
-                    # print "True"
-                    possibilities = self.shortest_path[current_sym][1:]
-                    rule = random.choice(possibilities)
-                    expansion_possibility = self.grammar[current_sym[0]].index(rule)
+            for index, genotype in enumerate(genotypes):
+                positions = [0] * len(genotype)
+                rng = None if seeds is None else LazyRandom(seeds[index])
+                pmutation = 0.0 if mutation is None else mutation[index]
+                phenotypes[index], depths[index] = self.mapping(genotype, positions, needs_python_filter, rng=rng,
+                                                                pmutation=pmutation)
+                mapping_values[index] = positions
+        return phenotypes, depths, mapping_values
+
+    def make_mapping_pool(self, processes=None):
+        """Creates a process pool whose workers hold a copy of this grammar, to be used with map_population."""
+        return MappingPool(processes, self)
+
+    def _iterative_mapping(self, mapping_rules, positions_to_map, output, terminal_symbols, rng, pmutation=0.0):
+        """
+        Explicit-stack version of _recursive_mapping. Children are pushed in reverse order, so the
+        tree is walked (and missing codons are drawn and codons are mutated) in exactly the same pre-order.
+        For every terminal reached, the entry of terminal_symbols with its index is appended to output.
+        Genes may be shared with other individuals, so a gene is copied before its first codon is changed or
+        appended.
+        """
+        reversed_productions = self.reversed_productions
+        shortest_path_choices = self.shortest_path_choices
+        arities = self.arities
+        max_tree_depth = self.max_depth
+        append = output.append
+        copied = set()
+        max_depth = 0
+        codes, depths = [self.start_symbol_id], [0]
+        while codes:
+            code = codes.pop()
+            depth = depths.pop()
+            if depth > max_depth:
+                max_depth = depth
+            if code < 0:
+                append(terminal_symbols[-1 - code])
+                continue
+            gene = mapping_rules[code]
+            position = positions_to_map[code]
+            if position >= len(gene):
+                if depth > max_tree_depth:
+                    expansion_possibility = rng.choice(shortest_path_choices[code])
                 else:
-                    expansion_possibility = random.randint(0, size_of_gene[current_sym[0]] - 1)
-                mapping_rules[current_sym_pos].append(expansion_possibility)
-            current_production = mapping_rules[current_sym_pos][positions_to_map[current_sym_pos]]
-            positions_to_map[current_sym_pos] += 1
-            next_to_expand = choices[current_production]
-            for next_sym in next_to_expand:
-                depths.append(
-                    self._recursive_mapping(mapping_rules, positions_to_map, next_sym, current_depth + 1, output))
-        return max(depths)
+                    expansion_possibility = rng.randint(0, arities[code] - 1)
+                if code not in copied:
+                    gene = mapping_rules[code] = gene[:]
+                    copied.add(code)
+                gene.append(expansion_possibility)
+            elif pmutation and arities[code] > 1 and rng.random() < pmutation:
+                new_value = self._mutated_codon(code, gene[position], depth, rng)
+                if new_value != gene[position]:
+                    if code not in copied:
+                        gene = mapping_rules[code] = gene[:]
+                        copied.add(code)
+                    gene[position] = new_value
+            positions_to_map[code] = position + 1
+            production = reversed_productions[code][gene[position]]
+            codes.extend(production)
+            depths.extend([depth + 1] * len(production))
+        return max_depth
 
-    @staticmethod
-    def python_filter(txt):
+    def _mutated_codon(self, code, current_value, depth, rng):
+        """The value that mutation draws for a codon of non-terminal code read at the given depth."""
+        if depth >= self.max_depth:
+            return rng.choice(self.shortest_path_choices[code])
+        # uniform choice among the other options, without building the list of choices
+        new_value = rng.randrange(self.arities[code] - 1)
+        if new_value >= current_value:
+            new_value += 1
+        return new_value
+
+    def _recursive_mapping(self, mapping_rules, positions_to_map, code, current_depth, output, rng, pmutation=0.0,
+                           copied=None):
+        # genes may be shared with other individuals: replace them with changed copies (see _iterative_mapping)
+        if code < 0:
+            output.append(self.terminal_symbols[-1 - code])
+            return current_depth
+        copied = copied if copied is not None else set()
+        gene = mapping_rules[code]
+        position = positions_to_map[code]
+        if position >= len(gene):
+            if current_depth > self.max_depth:
+                expansion_possibility = rng.choice(self.shortest_path_choices[code])
+            else:
+                expansion_possibility = rng.randint(0, self.arities[code] - 1)
+            if code not in copied:
+                gene = mapping_rules[code] = gene[:]
+                copied.add(code)
+            gene.append(expansion_possibility)
+        elif pmutation and self.arities[code] > 1 and rng.random() < pmutation:
+            new_value = self._mutated_codon(code, gene[position], current_depth, rng)
+            if new_value != gene[position]:
+                if code not in copied:
+                    gene = mapping_rules[code] = gene[:]
+                    copied.add(code)
+                gene[position] = new_value
+        current_production = gene[position]
+        positions_to_map[code] += 1
+        max_depth = current_depth
+        for next_code in self.compiled_productions[code][current_production]:
+            depth = self._recursive_mapping(mapping_rules, positions_to_map, next_code, current_depth + 1, output, rng,
+                                            pmutation, copied)
+            if depth > max_depth:
+                max_depth = depth
+        return max_depth
+
+    @classmethod
+    def python_filter(cls, txt):
         """ Create correct python syntax.
         We use {: and :} as special open and close brackets, because
         it's not possible to specify indentation correctly in a BNF
         grammar without this type of scheme."""
-        txt = txt.replace("\le", "<=")
-        txt = txt.replace("\ge", ">=")
-        txt = txt.replace("\l", "<")
-        txt = txt.replace("\g", ">")
-        txt = txt.replace("\eb", "|")
+        return cls.emit_python([cls.python_segments(txt)])
+
+    @classmethod
+    def python_segments(cls, txt):
+        """
+        Splits a piece of program text in the segments consumed by emit_python: strings with the escapes
+        already replaced, the integer indentation change of each {:, :} and \\n token, and None for a
+        literal line break.
+        """
+        for escape, replacement in cls.PYTHON_ESCAPES:
+            txt = txt.replace(escape, replacement)
+        segments = []
+        for index, segment in enumerate(cls.PYTHON_TOKEN_PATTERN.split(txt)):
+            if index % 2:
+                segments.append(cls.PYTHON_TOKENS[segment])
+            elif segment != "":
+                segments.append(segment)
+        return tuple(segments)
+
+    @staticmethod
+    def emit_python(terminals):
+        """
+        Builds the indented python program from a sequence of python_segments in a single pass.
+        Every indentation token starts a new line at the current indentation level, and lines with
+        only blanks are dropped.
+        """
+        lines = []
+        line = []
         indent_level = 0
-        tmp = txt[:]
-        i = 0
-        while i < len(tmp):
-            tok = tmp[i:i+2]
-            if tok == "{:":
-                indent_level += 1
-            elif tok == ":}":
-                indent_level -= 1
-            tabstr = "\n" + "  " * indent_level
-            if tok == "{:" or tok == ":}" or tok == "\\n":
-                tmp = tmp.replace(tok, tabstr, 1)
-            i += 1
-            # Strip superfluous blank lines.
-            txt = "\n".join([line for line in tmp.split("\n") if line.strip() != ""])
-        return txt
+        for segments in terminals:
+            for segment in segments:
+                if segment.__class__ is str:
+                    line.append(segment)
+                else:
+                    text = "".join(line)
+                    if text.strip() != "":
+                        lines.append(text)
+                    if segment is None:
+                        line = []
+                    else:
+                        indent_level += segment
+                        line = ["  " * indent_level]
+        text = "".join(line)
+        if text.strip() != "":
+            lines.append(text)
+        return "\n".join(lines)
 
     def get_start_rule(self):
         return self.start_rule
@@ -244,6 +610,37 @@ class Grammar:
             text += "\n"
         return text
 
+
+class MappingPool(multiprocessing.pool.Pool):
+    """A process pool for map_population, which splits the batches by its number of workers."""
+
+    def __init__(self, processes, grammar):
+        self.workers = processes or os.cpu_count() or 1
+        super().__init__(self.workers, initializer=_init_mapping_worker, initargs=(grammar,))
+
+
+_worker_grammar = None
+
+
+def _init_mapping_worker(grammar):
+    global _worker_grammar
+    _worker_grammar = grammar
+
+
+def _map_chunk(args):
+    genotypes, seeds, mutation, needs_python_filter = args
+    results = []
+    for genotype, seed, pmutation in zip(genotypes, seeds, mutation):
+        originals = list(genotype)
+        positions = [0] * len(genotype)
+        phenotype, depth = _worker_grammar.mapping(genotype, positions, needs_python_filter, rng=LazyRandom(seed),
+                                                   pmutation=pmutation)
+        # only the genes that were extended or mutated (and so replaced) are sent back
+        changed_genes = [gene if gene is not original else None for gene, original in zip(genotype, originals)]
+        results.append((phenotype, depth, positions, changed_genes))
+    return results
+
+
 # Create one instance and export its methods as module-level functions.
 # The functions share state across all uses
 # (both in the user's code and in the Python libraries), but that's fine
@@ -252,14 +649,22 @@ class Grammar:
 
 _inst = Grammar()
 set_path = _inst.set_path
+set_cache_dir = _inst.set_cache_dir
 read_grammar = _inst.read_grammar
 get_non_terminals = _inst.get_non_terminals
+get_arities = _inst.get_arities
+get_shortest_path_choices = _inst.get_shortest_path_choices
+get_compiled_productions = _inst.get_compiled_productions
+get_codon_typecode = _inst.get_codon_typecode
 count_number_of_options_in_production = _inst.count_number_of_options_in_production
 compute_non_recursive_options = _inst.compute_non_recursive_options
 list_non_recursive_productions = _inst.list_non_recursive_productions
 recursive_individual_creation = _inst.recursive_individual_creation
 mapping = _inst.mapping
+map_population = _inst.map_population
+make_mapping_pool = _inst.make_mapping_pool
 start_rule = _inst.get_start_rule
+get_start_rule = _inst.get_start_rule
 set_max_tree_depth = _inst.set_max_tree_depth
 set_min_init_tree_depth = _inst.set_min_init_tree_depth
 get_max_depth = _inst.get_max_depth
@@ -0,0 +1,82 @@
+from array import array
+
+
+class Individual:
+    """
+    An individual of the population.
+    Each gene is stored as a compact array of codons (see grammar.get_codon_typecode), and the fields live
+    in slots instead of a per-individual dict. For compatibility with code written for the dict individuals,
+    fields can also be read and written as ind['fitness'], and to_dict() gives the plain JSON-friendly form.
+    """
+    __slots__ = ('genotype', 'fitness', 'phenotype', 'mapping_values', 'tree_depth', 'other_info')
+    FIELDS = __slots__
+
+    def __init__(self, genotype, fitness=None, phenotype=None, mapping_values=None, tree_depth=None,
+                 other_info=None):
+        self.genotype = genotype
+        self.fitness = fitness
+        self.phenotype = phenotype
+        self.mapping_values = mapping_values
+        self.tree_depth = tree_depth
+        self.other_info = other_info
+
+    def clone(self):
+        """Copy of the individual that does not share any mutable state with it."""
+        return Individual([gene[:] for gene in self.genotype], self.fitness, self.phenotype,
+                          None if self.mapping_values is None else self.mapping_values[:], self.tree_depth,
+                          dict(self.other_info) if isinstance(self.other_info, dict) else self.other_info)
+
+    def shallow_clone(self):
+        """
+        Copy of the individual with its own genotype list, whose genes are shared with this individual.
+        Genes are copy-on-write: code that changes a shared gene replaces it in the genotype list with a
+        modified copy (gene[:]) instead of writing into it, so selection and variation only pay for the
+        genes they actually touch.
+        """
+        return Individual(self.genotype[:], self.fitness, self.phenotype, self.mapping_values, self.tree_depth,
+                          self.other_info)
+
+    def __copy__(self):
+        return self.clone()
+
+    def __deepcopy__(self, memo):
+        return self.clone()
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def keys(self):
+        return list(self.FIELDS)
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.FIELDS]
+
+    def to_dict(self):
+        data = dict(self.items())
+        if isinstance(self.other_info, dict) and 'case_errors' in self.other_info:
+            # the errors on each fitness case are only there for selection, and are as long as the dataset
+            data['other_info'] = {key: value for key, value in self.other_info.items() if key != 'case_errors'}
+        data['genotype'] = [list(gene) for gene in self.genotype]
+        if self.mapping_values is not None:
+            data['mapping_values'] = list(self.mapping_values)
+        return data
+
+    def __repr__(self):
+        return 'Individual(fitness=%r, tree_depth=%r, phenotype=%r)' % (self.fitness, self.tree_depth, self.phenotype)
+
+
+def make_genotype(number_of_genes, typecode):
+    return [array(typecode) for _ in range(number_of_genes)]
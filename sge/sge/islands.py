@@ -0,0 +1,80 @@
+"""
+Island model: ISLANDS populations evolve in separate processes, each with its own grammar, random state
+and logs (in <EXPERIMENT_NAME>/run_<RUN>/island_<k>). Every MIGRATION_INTERVAL generations each island sends
+its MIGRATION_SIZE best individuals through a pipe to the main process, which forwards them along the
+MIGRATION_TOPOLOGY, and the immigrants replace the worst individuals of the island that receives them.
+"""
+import multiprocessing
+import sge.engine as engine
+from sge.parameters import params
+from sge.utilities.seeds import SeedStreams
+
+
+def migrates_at(generation, parameters=params):
+    """True if there is a migration after the given generation."""
+    if parameters['ISLANDS'] < 2 or generation + 1 > parameters['GENERATIONS']:
+        return False
+    return (generation + 1) % parameters['MIGRATION_INTERVAL'] == 0
+
+
+def migration_sources(islands, topology, rng):
+    """For each island, the island whose emigrants it receives."""
+    if topology == 'ring':
+        return [(island - 1) % islands for island in range(islands)]
+    if topology == 'random':
+        return [rng.choice([other for other in range(islands) if other != island]) for island in range(islands)]
+    raise ValueError("Unknown migration topology: %s" % topology)
+
+
+def _run_island(island, connection, evaluation_function, parameters):
+    # the island draws its random numbers from SeedStreams(SEED).spawn('island', island) (see engine.Evolution)
+    parameters = dict(parameters, ISLAND=island)
+
+    def migrate(generation, population):
+        if not migrates_at(generation, parameters):
+            return []
+        connection.send(population[:parameters['MIGRATION_SIZE']])
+        return connection.recv()
+
+    engine.Evolution(evaluation_function, parameters).run(migrate)
+    connection.close()
+
+
+def island_model(evaluation_function=None, parameters_file=None):
+    engine.configure(parameters_file)
+    if params['RESUME']:
+        raise ValueError("The island model cannot resume runs from checkpoints")
+    islands = params['ISLANDS']
+    rng = SeedStreams(params['SEED']).random('migration')
+    connections, processes = [], []
+    for island in range(islands):
+        hub_end, island_end = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_run_island, args=(island, island_end, evaluation_function,
+                                                                    dict(params)))
+        process.start()
+        island_end.close()
+        connections.append(hub_end)
+        processes.append(process)
+    try:
+        generation = 0
+        while generation <= params['GENERATIONS']:
+            if migrates_at(generation):
+                emigrants = []
+                for island, connection in enumerate(connections):
+                    try:
+                        emigrants.append(connection.recv())
+                    except EOFError:
+                        raise RuntimeError("Island %d stopped before generation %d" % (island, generation))
+                sources = migration_sources(islands, params['MIGRATION_TOPOLOGY'], rng)
+                for connection, source in zip(connections, sources):
+                    connection.send(emigrants[source])
+            generation += 1
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+    failed = [island for island, process in enumerate(processes) if process.exitcode != 0]
+    if failed:
+        raise RuntimeError("Islands %s did not finish" % failed)
@@ -1,39 +1,88 @@
+import atexit
 import numpy as np
 from sge.parameters import params
 import json
 import os
+from sge.utilities.snapshots import SnapshotWriter, save_json, save_npz
 
 
+class Logger:
+    """Writes the progress and snapshots of one run, in the directory given by its parameters."""
 
-def evolution_progress(generation, pop):
-    fitness_samples = [i['fitness'] for i in pop]
-    data = '%4d\t%.6e\t%.6e\t%.6e' % (generation, np.min(fitness_samples), np.mean(fitness_samples), np.std(fitness_samples))
-    if params['VERBOSE']:
-        print(data)
-    save_progress_to_file(data)
-    if generation % params['SAVE_STEP'] == 0:
-        save_step(generation, pop)
+    def __init__(self, parameters):
+        self.params = parameters
+        self.snapshot_writer = None
 
+    def run_directory(self):
+        """Where the logs of this run go: <EXPERIMENT_NAME>/run_<RUN>, plus island_<ISLAND> in the island model."""
+        path = '%s/run_%d' % (self.params['EXPERIMENT_NAME'], self.params['RUN'])
+        if self.params['ISLAND'] is not None:
+            path += '/island_%d' % self.params['ISLAND']
+        return path
 
-def save_progress_to_file(data):
-    with open('%s/run_%d/progress_report.csv' % (params['EXPERIMENT_NAME'], params['RUN']), 'a') as f:
-        f.write(data + '\n')
+    def evolution_progress(self, generation, pop, cache_hit_rate=None):
+        fitness_samples = [i['fitness'] for i in pop]
+        data = '%4d\t%.6e\t%.6e\t%.6e' % (generation, np.min(fitness_samples), np.mean(fitness_samples), np.std(fitness_samples))
+        if cache_hit_rate is not None:
+            # fraction of the individuals evaluated in this generation that got their fitness from the cache
+            data += '\t%.4f' % cache_hit_rate
+        if self.params['VERBOSE']:
+            print(data)
+        self.save_progress_to_file(data)
+        if generation % self.params['SAVE_STEP'] == 0:
+            self.save_step(generation, pop)
 
+    def save_progress_to_file(self, data):
+        with open('%s/progress_report.csv' % self.run_directory(), 'a') as f:
+            f.write(data + '\n')
 
-def save_step(generation, population):
-    c = json.dumps(population)
-    open('%s/run_%d/iteration_%d.json' % (params['EXPERIMENT_NAME'], params['RUN'], generation), 'a').write(c)
+    def rewind(self, generation):
+        """Drops the progress of generation and the ones after it (used when a run is resumed)."""
+        path = '%s/progress_report.csv' % self.run_directory()
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            lines = [line for line in f if int(line.split('\t', 1)[0]) < generation]
+        with open(path, 'w') as f:
+            f.writelines(lines)
 
+    def save_step(self, generation, population):
+        """Queues the snapshot of the population, saved as iteration_<generation>.json or .npz (SNAPSHOT_FORMAT)."""
+        if self.params['SNAPSHOT_FORMAT'] == 'npz':
+            path, save = '%s/iteration_%d.npz' % (self.run_directory(), generation), save_npz
+        else:
+            path, save = '%s/iteration_%d.json' % (self.run_directory(), generation), save_json
+        if self.snapshot_writer is None:
+            self.snapshot_writer = SnapshotWriter()
+        self.snapshot_writer.submit(save, path, list(population), self.params['INCLUDE_GENOTYPE'])
 
-def save_parameters():
-    params_lower = dict((k.lower(), v) for k, v in params.items())
-    c = json.dumps(params_lower)
-    open('%s/run_%d/parameters.json' % (params['EXPERIMENT_NAME'], params['RUN']), 'a').write(c)
+    def close(self):
+        """Waits until the queued snapshots are written."""
+        if self.snapshot_writer is not None:
+            writer, self.snapshot_writer = self.snapshot_writer, None
+            writer.close()
 
+    def save_parameters(self):
+        params_lower = dict((k.lower(), v) for k, v in self.params.items())
+        with open('%s/parameters.json' % self.run_directory(), 'w') as f:
+            json.dump(params_lower, f)
 
-def prepare_dumps():
-    try:
-        os.makedirs('%s/run_%d' % (params['EXPERIMENT_NAME'], params['RUN']))
-    except FileExistsError as e:
-        pass
-    save_parameters()
\ No newline at end of file
+    def prepare_dumps(self):
+        try:
+            os.makedirs(self.run_directory())
+        except FileExistsError as e:
+            pass
+        self.save_parameters()
+
+
+# One instance that logs with the global parameters, exported as module-level functions
+# (as in sge.grammar).
+_inst = Logger(params)
+run_directory = _inst.run_directory
+evolution_progress = _inst.evolution_progress
+save_progress_to_file = _inst.save_progress_to_file
+save_step = _inst.save_step
+save_parameters = _inst.save_parameters
+prepare_dumps = _inst.prepare_dumps
+close = _inst.close
+atexit.register(close)
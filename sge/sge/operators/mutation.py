@@ -1,28 +1,46 @@
-import copy
 import random
 import sge.grammar as grammar
 
 
-def mutate(p, pmutation):
-    p = copy.deepcopy(p)
-    p['fitness'] = None
-    size_of_genes = grammar.count_number_of_options_in_production()
-    mutable_genes = [index for index, nt in enumerate(grammar.get_non_terminals()) if size_of_genes[nt] != 1 and len(p['genotype'][index]) > 0]
-    for at_gene in mutable_genes:
-        nt = list(grammar.get_non_terminals())[at_gene]
-        temp = p['mapping_values']
-        mapped = temp[at_gene]
-        for position_to_mutate in range(0, mapped):
-            if random.random() < pmutation:
-                current_value = p['genotype'][at_gene][position_to_mutate]
-                choices = []
-                if p['tree_depth'] >= grammar.get_max_depth():
-                    possibilities = grammar.get_shortest_path()[(nt,'NT')][1:]
-                    rule = random.choice(possibilities)
-                    expansion_possibility = grammar.get_grammar()[nt].index(rule)
-                    p['genotype'][at_gene][position_to_mutate] = expansion_possibility
+def mutate(p, pmutation, grammar=grammar, rng=random):
+    """
+    Mutates the codons in the mapped region of each gene.
+    If no codon ends up with a different value, the child keeps the fitness, phenotype and depth of p,
+    so that it is not evaluated again.
+    By default the module-level grammar and random state are used; a run can pass its own Grammar and Random.
+    """
+    # the genes are shared with the parent until they are changed
+    p = p.shallow_clone()
+    arities = grammar.get_arities()
+    shortest_path_choices = grammar.get_shortest_path_choices()
+    mapping_values = p.mapping_values
+    genotype = p.genotype
+    max_depth = grammar.get_max_depth()
+    changed = False
+    for at_gene, gene in enumerate(genotype):
+        size_of_gene = arities[at_gene]
+        if size_of_gene == 1 or len(gene) == 0:
+            continue
+        copied = False
+        for position_to_mutate in range(0, mapping_values[at_gene]):
+            if rng.random() < pmutation:
+                current_value = gene[position_to_mutate]
+                if p.tree_depth >= max_depth:
+                    new_value = rng.choice(shortest_path_choices[at_gene])
                 else:
-                    choices = list(range(0, size_of_genes[nt]))
-                    choices.remove(current_value)
-                    p['genotype'][at_gene][position_to_mutate] = random.choice(choices)
+                    # uniform choice among the other options, without building the list of choices
+                    new_value = rng.randrange(size_of_gene - 1)
+                    if new_value >= current_value:
+                        new_value += 1
+                if new_value == current_value:
+                    continue
+                if not copied:
+                    gene = genotype[at_gene] = gene[:]
+                    copied = True
+                gene[position_to_mutate] = new_value
+                changed = True
+    if changed:
+        # the stored phenotype and fitness no longer match the genotype
+        p.fitness = None
+        p.phenotype = None
     return p
@@ -1,18 +1,32 @@
 import random
-import sge.grammar as grammar
+from sge.individual import Individual
 
 
-def crossover(p1, p2):
+def crossover(p1, p2, rng=random):
+    """
+    Uniform crossover at the gene level.
+    The genes of the child are shared with the parents, and copied only when they are changed.
+    If the child maps exactly like one of the parents, it inherits that parent's fitness, phenotype and depth.
+    Otherwise the child is not mapped here: mutation needs the codons that the mapping reads and the depth of the
+    tree, so the engine mutates the new children while it maps them, in one batch (see engine.breed).
+    """
     xover_p_value = 0.5
-    gen_size = len(p1['genotype'])
-    mask = [random.random() for i in range(gen_size)]
-    genotype = []
-    for index, prob in enumerate(mask):
-        if prob < xover_p_value:
-            genotype.append(p1['genotype'][index][:])
-        else:
-            genotype.append(p2['genotype'][index][:])
-    mapping_values = [0] * gen_size
-    # compute nem individual
-    _, tree_depth = grammar.mapping(genotype, mapping_values)
-    return {'genotype': genotype, 'fitness': None, 'mapping_values': mapping_values, 'tree_depth': tree_depth}
+    gen_size = len(p1.genotype)
+    mask = [rng.random() for i in range(gen_size)]
+    sources = [p1 if prob < xover_p_value else p2 for prob in mask]
+    genotype = [parent.genotype[index] for index, parent in enumerate(sources)]
+    for parent in (p1, p2):
+        if maps_like(genotype, parent):
+            return Individual(genotype, parent.fitness, parent.phenotype, parent.mapping_values, parent.tree_depth,
+                              parent.other_info)
+    return Individual(genotype)
+
+
+def maps_like(genotype, parent):
+    """True if every codon read when parent was mapped has the same value in genotype."""
+    if parent.mapping_values is None:
+        return False
+    for gene, parent_gene, used in zip(genotype, parent.genotype, parent.mapping_values):
+        if used and gene is not parent_gene and gene[:used] != parent_gene[:used]:
+            return False
+    return True
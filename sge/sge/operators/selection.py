@@ -1,8 +1,57 @@
 import random
-import copy
+import numpy as np
 
 
-def tournament(population, tsize=3):
-    pool = random.sample(population, tsize)
-    pool.sort(key=lambda i: i['fitness'])
-    return copy.deepcopy(pool[0])
+def tournament(population, tsize=3, rng=random):
+    """
+    Returns the best of tsize random individuals. The winner is not copied: variation operators
+    never modify their parents (see Individual.shallow_clone).
+    """
+    pool = rng.sample(population, tsize)
+    pool.sort(key=lambda i: i.fitness)
+    return pool[0]
+
+
+# The functions below draw all the parents of a generation in one call. They take the fitness of
+# the population as a numpy array (lower is better, as everywhere in the engine) and return the
+# indices of the selected individuals.
+
+
+def tournament_indices(fitness, count, tsize, rng):
+    """Winners of count tournaments of tsize individuals, drawn with replacement."""
+    candidates = rng.integers(len(fitness), size=(count, tsize))
+    winners = np.argmin(fitness[candidates], axis=1)
+    return candidates[np.arange(count), winners]
+
+
+def truncation_indices(fitness, count, proportion, rng):
+    """Uniform choices among the best proportion of the population."""
+    best = max(1, int(round(len(fitness) * proportion)))
+    ranked = np.argsort(fitness, kind='stable')[:best]
+    return ranked[rng.integers(best, size=count)]
+
+
+def lexicase_indices(case_errors, count, rng):
+    """
+    Lexicase selection over the (population x cases) matrix of errors: the candidates are filtered
+    by the cases, in a random order for each selection, keeping the ones with the lowest error.
+    """
+    cases = case_errors.shape[1]
+    # individuals with the same errors on every case are the same candidate
+    distinct, inverse = np.unique(case_errors, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    members = np.argsort(inverse, kind='stable')
+    boundaries = np.r_[0, np.cumsum(np.bincount(inverse, minlength=len(distinct)))]
+    selected = np.empty(count, dtype=np.int64)
+    everyone = np.arange(len(distinct))
+    for index in range(count):
+        candidates = everyone
+        for case in rng.permutation(cases):
+            errors = distinct[candidates, case]
+            candidates = candidates[errors == errors.min()]
+            if len(candidates) == 1:
+                break
+        group = candidates[rng.integers(len(candidates))]
+        start, end = boundaries[group], boundaries[group + 1]
+        selected[index] = members[start + rng.integers(end - start)]
+    return selected
@@ -0,0 +1,91 @@
+"""
+NumPy versions of the variation operators, applied to all the offspring of a generation at once.
+The crossover masks and the mutation masks are drawn in bulk from a numpy Generator, and for each
+non-terminal the codons of the offspring are packed into a padded matrix, so that the replacement
+values are sampled with array operations. The distributions are the same as in mutate and crossover,
+and so is the copy-on-write handling of genes (only the genes that change are copied).
+"""
+import numpy as np
+import sge.grammar as grammar
+from sge.individual import Individual
+from sge.operators.recombination import maps_like
+
+
+def pack_genes(genes, width, dtype):
+    """Padded (len(genes) x width) matrix with the first width codons of each gene."""
+    matrix = np.zeros((len(genes), width), dtype=dtype)
+    for row, gene in enumerate(genes):
+        count = min(len(gene), width)
+        if count:
+            matrix[row, :count] = np.frombuffer(gene, dtype=dtype, count=count)
+    return matrix
+
+
+def crossover_population(parents1, parents2, rng):
+    """Uniform crossover of parents1[i] with parents2[i], for every i (see recombination.crossover)."""
+    size = len(parents1)
+    if size == 0:
+        return []
+    mask = rng.random((size, len(parents1[0].genotype))) < 0.5
+    children = []
+    for p1, p2, from_p1 in zip(parents1, parents2, mask.tolist()):
+        genotype = [gene1 if first else gene2 for gene1, gene2, first in zip(p1.genotype, p2.genotype, from_p1)]
+        for parent in (p1, p2):
+            if maps_like(genotype, parent):
+                child = Individual(genotype, parent.fitness, parent.phenotype, parent.mapping_values,
+                                   parent.tree_depth, parent.other_info)
+                break
+        else:
+            child = Individual(genotype)
+        children.append(child)
+    return children
+
+
+def mutate_population(individuals, pmutation, rng, grammar=grammar):
+    """Returns the mutants of individuals (see mutation.mutate). The individuals themselves are not changed."""
+    offspring = [ind.shallow_clone() for ind in individuals]
+    size = len(offspring)
+    if size == 0:
+        return offspring
+    arities = grammar.get_arities()
+    shortest_path_choices = grammar.get_shortest_path_choices()
+    dtype = np.dtype(grammar.get_codon_typecode())
+    mapping_values = np.array([ind.mapping_values for ind in individuals], dtype=np.int64)
+    limited = np.array([ind.tree_depth >= grammar.get_max_depth() for ind in individuals])
+    changed = np.zeros(size, dtype=bool)
+    for nt, arity in enumerate(arities):
+        used = mapping_values[:, nt]
+        width = int(used.max())
+        if arity == 1 or width == 0:
+            continue
+        mask = rng.random((size, width)) < pmutation
+        mask &= np.arange(width) < used[:, None]
+        rows, columns = np.nonzero(mask)
+        if rows.size == 0:
+            continue
+        mutated, inverse = np.unique(rows, return_inverse=True)
+        genes = [individuals[row].genotype[nt] for row in mutated.tolist()]
+        current = pack_genes(genes, width, dtype)[inverse, columns].astype(np.int64)
+        # uniform choice among the other options
+        values = (current + rng.integers(1, arity, size=rows.size)) % arity
+        at_limit = limited[rows]
+        if at_limit.any():
+            choices = np.asarray(shortest_path_choices[nt])
+            values[at_limit] = choices[rng.integers(len(choices), size=int(at_limit.sum()))]
+        different = values != current
+        rows, columns, values = rows[different], columns[different], values[different]
+        if rows.size == 0:
+            continue
+        changed[rows] = True
+        # rows come out of np.nonzero sorted, so each mutated gene is one contiguous run
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        ends = np.r_[starts[1:], rows.size]
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            child = offspring[rows[start]]
+            gene = child.genotype[nt][:]
+            np.frombuffer(gene, dtype=dtype)[columns[start:end]] = values[start:end]
+            child.genotype[nt] = gene
+    for row in np.flatnonzero(changed).tolist():
+        offspring[row].fitness = None
+        offspring[row].phenotype = None
+    return offspring
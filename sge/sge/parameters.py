@@ -19,10 +19,28 @@ params = {'PARAMETERS': None,
           'RUN': 1,
           'INCLUDE_GENOTYPE': True,
           'SAVE_STEP': 1,
+          'SNAPSHOT_FORMAT': 'json',        # 'json', or 'npz' for compressed numpy columns (see utilities.snapshots)
           'VERBOSE': True,
           'MIN_TREE_DEPTH': 6,
           'MAX_TREE_DEPTH': 17,
+          'MAPPING_WORKERS': 0,             # processes used to map the population (0 maps in the main process)
+          'GRAMMAR_CACHE_DIR': None,        # directory for the preprocessed grammar cache (None disables it)
+          'FITNESS_CACHE_SIZE': 0,          # phenotypes whose fitness is remembered (0 disables the cache)
+          'WORKERS': 1,                     # processes used to evaluate the population
+          'SELECTION': 'tournament',        # 'tournament', 'truncation' or 'lexicase'
+          'TRUNCATION': 0.5,                # fraction of the population that truncation selection picks from
+          'OPERATORS': 'scalar',            # 'scalar' or 'vectorized' (numpy) variation operators
+          'ISLANDS': 4,                     # populations evolved in parallel by sge.islands.island_model
+          'MIGRATION_INTERVAL': 10,         # generations between migrations
+          'MIGRATION_SIZE': 5,              # best individuals that each island sends in a migration
+          'MIGRATION_TOPOLOGY': 'ring',     # 'ring' or 'random'
+          'CHECKPOINT_STEP': 0,             # generations between checkpoints (0 disables them)
+          'RESUME': False,                  # continue from the last checkpoint of the run, if there is one
+          'ISLAND': None,                   # index of the island run by this process (set by island_model)
           }
+# params is the module-level configuration filled by engine.configure (file and command line),
+# DEFAULTS the untouched values that each engine.Evolution starts from
+DEFAULTS = dict(params)
 
 
 def load_parameters(file_name=None):
@@ -95,6 +113,67 @@ def set_parameters(arguments):
                         dest='VERBOSE',
                         type=strtobool,
                         help='Turns on the verbose output of the program')
+    parser.add_argument('--mapping_workers',
+                        dest='MAPPING_WORKERS',
+                        type=int,
+                        help='Specifies the number of processes used to map the population.')
+    parser.add_argument('--grammar_cache_dir',
+                        dest='GRAMMAR_CACHE_DIR',
+                        type=str,
+                        help='Specifies the directory where the preprocessed grammar is cached.')
+    parser.add_argument('--fitness_cache_size',
+                        dest='FITNESS_CACHE_SIZE',
+                        type=int,
+                        help='Specifies how many phenotypes have their fitness cached (0 disables the cache).')
+    parser.add_argument('--workers',
+                        dest='WORKERS',
+                        type=int,
+                        help='Specifies the number of processes used to evaluate the population.')
+    parser.add_argument('--selection',
+                        dest='SELECTION',
+                        type=str,
+                        choices=['tournament', 'truncation', 'lexicase'],
+                        help='Specifies the parent selection method.')
+    parser.add_argument('--truncation',
+                        dest='TRUNCATION',
+                        type=float,
+                        help='Specifies the fraction of the best individuals used by truncation selection.')
+    parser.add_argument('--operators',
+                        dest='OPERATORS',
+                        type=str,
+                        choices=['scalar', 'vectorized'],
+                        help='Specifies the implementation of the variation operators (scalar or vectorized).')
+    parser.add_argument('--islands',
+                        dest='ISLANDS',
+                        type=int,
+                        help='Specifies the number of islands of the island model.')
+    parser.add_argument('--migration_interval',
+                        dest='MIGRATION_INTERVAL',
+                        type=int,
+                        help='Specifies the number of generations between migrations.')
+    parser.add_argument('--migration_size',
+                        dest='MIGRATION_SIZE',
+                        type=int,
+                        help='Specifies the number of individuals that each island sends in a migration.')
+    parser.add_argument('--migration_topology',
+                        dest='MIGRATION_TOPOLOGY',
+                        type=str,
+                        choices=['ring', 'random'],
+                        help='Specifies where the migrants go (ring or random).')
+    parser.add_argument('--checkpoint_step',
+                        dest='CHECKPOINT_STEP',
+                        type=int,
+                        help='Specifies how often (in generations) the state of the run is checkpointed.')
+    parser.add_argument('--resume',
+                        dest='RESUME',
+                        action='store_const',
+                        const=True,
+                        help='Continues the run from its last checkpoint, if there is one.')
+    parser.add_argument('--snapshot_format',
+                        dest='SNAPSHOT_FORMAT',
+                        type=str,
+                        choices=['json', 'npz'],
+                        help='Specifies the format of the population snapshots (json or npz).')
 
     # Parse command line arguments using all above information.
     args, _ = parser.parse_known_args(arguments)
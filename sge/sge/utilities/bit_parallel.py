@@ -0,0 +1,111 @@
+"""
+Bit-parallel evaluation of Boolean phenotypes.
+Each input is packed in one python int, with bit i holding its value in fitness case i, so a phenotype is
+evaluated over the whole truth table at once: its and/or/not/if-else become &, |, ^ and masks over those ints,
+and the number of wrong cases is the popcount of output ^ target.
+"""
+import re
+
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # python < 3.10
+    def popcount(value):
+        return bin(value).count('1')
+
+
+def truth_table(variables):
+    """
+    The columns of the truth table of variables inputs, as bitmasks over its 2 ** variables rows: in row i,
+    variable j is bit variables - 1 - j of i (the first variable is the most significant).
+    """
+    rows = 1 << variables
+    columns = []
+    for j in range(variables):
+        half = 1 << (variables - 1 - j)
+        # the column repeats half zeros followed by half ones
+        block = ((1 << half) - 1) << half
+        columns.append(block * (((1 << rows) - 1) // ((1 << 2 * half) - 1)))
+    return columns
+
+
+def pack(values):
+    """Bitmask with bit i set if values[i] is true."""
+    mask = 0
+    for i, value in enumerate(values):
+        if value:
+            mask |= 1 << i
+    return mask
+
+
+class BitParallelEvaluator:
+    """
+    Evaluates Boolean phenotypes (python expressions made of and, or, not, if-else, parentheses, the inputs
+    and the constants 0, 1, True and False) over all the rows of a truth table at once.
+    inputs maps each variable to its bitmask, target is the bitmask of the expected outputs and cases the number
+    of rows. The phenotypes are evaluated while they are parsed, with the precedences of python (if-else binds
+    less than or, which binds less than and, which binds less than not), so neither the python compiler nor
+    the per-row eval of the legacy evaluators is needed. Phenotypes that are not such expressions raise ValueError.
+    """
+
+    TOKENS = re.compile(r"\w+|\S")
+    CONSTANTS = {'0': False, '1': True, 'False': False, 'True': True}
+
+    def __init__(self, inputs, target, cases):
+        self.cases = cases
+        self.mask = (1 << cases) - 1
+        self.target = target & self.mask
+        self.values = {name: value & self.mask for name, value in inputs.items()}
+        self.values.update((name, self.mask if true else 0) for name, true in self.CONSTANTS.items())
+
+    def outputs(self, phenotype):
+        """Bitmask of the cases where phenotype is true."""
+        tokens = self.TOKENS.findall(phenotype)
+        tokens.append(None)
+        value, position = self._test(tokens, 0)
+        if tokens[position] is not None:
+            raise ValueError("Unexpected %r in %r" % (tokens[position], phenotype))
+        return value
+
+    def errors(self, phenotype):
+        """Number of cases where the output of phenotype differs from the target."""
+        return popcount(self.outputs(phenotype) ^ self.target)
+
+    def _test(self, tokens, position):
+        value, position = self._or(tokens, position)
+        if tokens[position] == 'if':
+            condition, position = self._or(tokens, position + 1)
+            if tokens[position] != 'else':
+                raise ValueError("Expected else, found %r" % tokens[position])
+            otherwise, position = self._test(tokens, position + 1)
+            value = (condition & value) | ((self.mask ^ condition) & otherwise)
+        return value, position
+
+    def _or(self, tokens, position):
+        value, position = self._and(tokens, position)
+        while tokens[position] == 'or':
+            other, position = self._and(tokens, position + 1)
+            value |= other
+        return value, position
+
+    def _and(self, tokens, position):
+        value, position = self._not(tokens, position)
+        while tokens[position] == 'and':
+            other, position = self._not(tokens, position + 1)
+            value &= other
+        return value, position
+
+    def _not(self, tokens, position):
+        token = tokens[position]
+        if token == 'not':
+            value, position = self._not(tokens, position + 1)
+            return self.mask ^ value, position
+        if token == '(':
+            value, position = self._test(tokens, position + 1)
+            if tokens[position] != ')':
+                raise ValueError("Expected ), found %r" % tokens[position])
+            return value, position + 1
+        try:
+            return self.values[token], position + 1
+        except KeyError:
+            raise ValueError("Unexpected %r" % token) from None
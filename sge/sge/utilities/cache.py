@@ -0,0 +1,79 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Bounded mapping that evicts the least recently used entry once it holds maxsize entries.
+    It keeps hit/miss counters, so that callers can report how effective the cache is.
+    """
+
+    def __init__(self, maxsize=10000):
+        if maxsize <= 0:
+            raise ValueError("The size of the cache must be positive!")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.entries.clear()
+        self.reset_stats()
+
+
+class CodeCache(LRUCache):
+    """
+    Cache of compiled phenotypes, so that the python compiler runs once per distinct program.
+    Callables built by function() have namespace as their globals (e.g., the globals() of the evaluator's module).
+    """
+
+    def __init__(self, maxsize=10000, namespace=None):
+        super().__init__(maxsize)
+        self.namespace = namespace if namespace is not None else {}
+
+    def compile(self, phenotype, mode='eval'):
+        """The code object of phenotype compiled in the given mode ('eval' or 'exec')."""
+        key = (mode, phenotype)
+        code = self.get(key)
+        if code is None:
+            code = compile(phenotype, '<phenotype>', mode)
+            self.put(key, code)
+        return code
+
+    def function(self, phenotype, args='x'):
+        """The phenotype compiled once as the body of lambda args: phenotype."""
+        key = ('lambda', args, phenotype)
+        function = self.get(key)
+        if function is None:
+            function = eval(compile('lambda %s: %s' % (args, phenotype), '<phenotype>', 'eval'), self.namespace)
+            self.put(key, function)
+        return function
@@ -0,0 +1,35 @@
+import os
+import pickle
+import tempfile
+import zlib
+
+
+# bump whenever the contents of the checkpoints change
+CHECKPOINT_VERSION = 1
+
+
+def save_checkpoint(path, state):
+    """
+    Writes state (a dict) to path as a zlib-compressed pickle.
+    The data goes to a temporary file that then replaces path, so a run killed while writing
+    leaves the previous checkpoint intact.
+    """
+    data = zlib.compress(pickle.dumps(dict(state, version=CHECKPOINT_VERSION), protocol=pickle.HIGHEST_PROTOCOL))
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_checkpoint(path):
+    with open(path, "rb") as f:
+        state = pickle.loads(zlib.decompress(f.read()))
+    if state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError("%s was written by an incompatible version of sge" % path)
+    return state
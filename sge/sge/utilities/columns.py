@@ -0,0 +1,53 @@
+"""
+Helpers for the evaluators that run a phenotype over whole columns of fitness cases at once, as
+examples/symreg.py and examples/bostonhousing.py do.
+"""
+import numpy as np
+from sge.utilities.cache import CodeCache
+from sge.utilities.stack_vm import StackVM
+
+
+def as_columns(dataset):
+    """(x, y) for a dataset with one fitness case per row and the target last: x has one row per variable."""
+    data = np.asarray(dataset, dtype=np.float64)
+    return np.ascontiguousarray(data[:, :-1].T), np.ascontiguousarray(data[:, -1])
+
+
+class ColumnFunctions:
+    """
+    Turns phenotypes into functions of x, the variables as columns. With backend="stack_vm" a phenotype runs
+    on a StackVM, and the ones the VM cannot run are compiled by a CodeCache with namespace as globals;
+    with backend="python" they are all compiled.
+    """
+
+    def __init__(self, namespace, backend="python", maxsize=10000):
+        self.code_cache = CodeCache(maxsize, namespace)
+        self.stack_vm = StackVM(maxsize) if backend == "stack_vm" else None
+
+    def function(self, phenotype):
+        """The phenotype as a function of x: a postfix program of the stack VM if it can run it, else python code."""
+        if self.stack_vm is not None:
+            try:
+                return self.stack_vm.function(phenotype)
+            except ValueError:
+                pass
+        return self.code_cache.function(phenotype)
+
+
+def squared_errors(function, dataset):
+    """
+    The squared error of function in each case of dataset, as (x, y) columns, or None if a value that function
+    goes through overflows or is not finite. The scalar evaluators fail on the overflows of _exp_ and of the
+    squares, and end with an error that is not finite after most of the others, so those are invalid here too;
+    the difference is that a phenotype that overflows and then brings the value back (as _inv_ of an infinite
+    product) is invalid here, and valid in the scalar evaluators.
+    """
+    inputs, outputs = dataset
+    with np.errstate(over='raise', invalid='raise', divide='ignore', under='ignore'):
+        try:
+            errors = np.square(outputs - function(inputs))
+            if not np.isfinite(np.sum(errors)):
+                return None
+        except (FloatingPointError, OverflowError, ValueError, ZeroDivisionError, MemoryError):
+            return None
+    return np.broadcast_to(errors, outputs.shape)
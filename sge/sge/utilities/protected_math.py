@@ -1,7 +1,68 @@
 from math import log, exp, sqrt
+import numpy as np
+
+
+# Elementwise versions of the protected operators, for evaluators that run a phenotype over whole columns
+# of fitness cases. They take scalars or ndarrays, apply the same rules as the scalar versions with masked
+# operations, and do not emit floating point warnings. The protected operators below dispatch to them when
+# they get an ndarray, so the phenotypes of the existing grammars work on arrays as they are.
+def quiet(*errors):
+    """np.errstate that ignores the given floating point errors, except the ones the caller set to raise."""
+    current = np.geterr()
+    return np.errstate(**{error: 'raise' if current[error] == 'raise' else 'ignore' for error in errors})
+
+
+def protected_div(x, y):
+    """x / y, or 1 where y is 0. Under np.errstate(over='raise') or (invalid='raise'), as inf / inf, it raises."""
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    out = np.ones(np.broadcast(x, y).shape)
+    with quiet('over', 'invalid'):
+        np.divide(x, y, out=out, where=y != 0)
+    return out[()]
+
+
+def protected_log(x):
+    """log(x), or 0 where x <= 0."""
+    x = np.asarray(x, dtype=np.float64)
+    out = np.zeros(x.shape)
+    np.log(x, out=out, where=~(x <= 0))
+    return out[()]
+
+
+def protected_exp(x):
+    """
+    exp(x), or nan where it overflows (where the scalar _exp_ raises OverflowError), so that the overflow
+    reaches the output of the phenotype. Under np.errstate(over='raise') an overflow raises FloatingPointError.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    with np.errstate(over='ignore'):
+        out = np.exp(x)
+    overflow = np.isinf(out) & np.isfinite(x)
+    if overflow.any():
+        if np.geterr()['over'] == 'raise':
+            raise FloatingPointError("overflow encountered in exp")
+        out[overflow] = np.nan
+    return out[()]
+
+
+def protected_inv(x):
+    """1 / x, or 1 where x is 0."""
+    return protected_div(1.0, x)
+
+
+def protected_sqrt(x):
+    """sqrt(|x|)."""
+    return np.sqrt(np.abs(np.asarray(x, dtype=np.float64)))[()]
+
+
+def protected_sig(x):
+    """1 / (1 + exp(-x))."""
+    return 1.0 / (1.0 + protected_exp(np.negative(x)))
 
 
 def _log_(x):
+    if isinstance(x, np.ndarray):
+        return protected_log(x)
     if x <= 0: return 0
     return log(x)
 
@@ -11,12 +72,16 @@ def _sig_(x):
 
 
 def protdiv(x, y):
+    if isinstance(x, np.ndarray) or isinstance(y, np.ndarray):
+        return protected_div(x, y)
     if y == 0:
         return 1
     return x / y
 
 
 def _exp_(x):
+    if isinstance(x, np.ndarray):
+        return protected_exp(x)
     try:
         return exp(x)
     except ValueError:
@@ -24,15 +89,23 @@ def _exp_(x):
 
 
 def _inv_(x):
+    if isinstance(x, np.ndarray):
+        return protected_inv(x)
     if x == 0: return 1
     return 1.0 / x
 
 
 def _sqrt_(x):
+    if isinstance(x, np.ndarray):
+        return protected_sqrt(x)
     return sqrt(abs(x))
 
 
 class Infix:
+    # keeps numpy from handling ndarray | _div_ itself (by broadcasting the Infix as an object), so that
+    # the operation falls back to __ror__
+    __array_ufunc__ = None
+
     def __init__(self, function):
         self.function = function
 
@@ -58,4 +131,5 @@ if __name__ == '__main__':
     print(8 | _div_ | 2)
     print(9.0 | _div_ | 2)
     print(8 | _div_ | 0)
+    print(np.arange(4.0) | _div_ | np.array([1.0, 0.0, 2.0, 0.0]))
     print(8 / 0)
@@ -0,0 +1,68 @@
+import random
+import struct
+import numpy as np
+
+
+# Streams are identified by names, turned into these fixed numbers so that the derived seeds are stable
+# across python versions and runs (unlike hash() of a string).
+STREAMS = {'run': 0, 'initialization': 1, 'mapping': 2, 'breed': 3, 'island': 4, 'migration': 5, 'evaluation': 6}
+
+
+def entropy(seed):
+    """The seed as the non-negative int that SeedSequence expects (the SEED parameter may come as a float)."""
+    if isinstance(seed, float):
+        seed = int(seed) if seed.is_integer() else struct.unpack('<Q', struct.pack('<d', seed))[0]
+    return seed % 2 ** 128
+
+
+class SeedStreams:
+    """
+    Independent random streams derived from one seed with numpy's SeedSequence.
+    A stream is identified by a key made of stream names (see STREAMS) and non-negative ints, e.g.
+    (generation, 'breed'), so that it always gives the same numbers, no matter which other streams were
+    used before or how many processes the work is split across.
+    """
+
+    def __init__(self, seed, spawn_key=()):
+        self.seed = seed
+        self.spawn_key = tuple(spawn_key)
+
+    def key(self, key):
+        return self.spawn_key + tuple(STREAMS[part] if isinstance(part, str) else int(part) for part in key)
+
+    def sequence(self, *key):
+        return np.random.SeedSequence(entropy(self.seed), spawn_key=self.key(key))
+
+    def spawn(self, *key):
+        """The streams of a part of the run (e.g., spawn('island', 3)), independent from the ones of this object."""
+        return SeedStreams(self.seed, self.key(key))
+
+    def seeds(self, count, *key):
+        """count 64-bit seeds (python ints), e.g. one for each individual of a batch."""
+        return self.sequence(*key).generate_state(count, np.uint64).tolist()
+
+    def random(self, *key):
+        """A random.Random for the stream."""
+        return random.Random(self.seeds(1, *key)[0])
+
+    def generator(self, *key):
+        """A numpy Generator for the stream."""
+        return np.random.default_rng(self.sequence(*key))
+
+
+class LazyRandom:
+    """
+    Stands for random.Random(seed), which is only created the first time it is used. Mapping gives one to
+    each genotype, and most genotypes never need a random codon.
+    """
+
+    def __init__(self, seed):
+        self.seed = seed
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        rng = self.__dict__.get('rng')
+        if rng is None:
+            rng = self.rng = random.Random(self.seed)
+        return getattr(rng, name)
@@ -0,0 +1,109 @@
+"""
+Population snapshots, written on a background thread.
+The individuals of an evaluated population are not changed afterwards (variation works on copies and
+genes are copy-on-write), so the writer can read them while the engine goes on with the next generation.
+"""
+import json
+import queue
+import threading
+import numpy as np
+
+
+def population_columns(population, include_genotype=True):
+    """
+    The population as a dict of numpy arrays: fitness, tree_depth (-1 if unknown), the utf-8 phenotypes
+    concatenated in phenotype with phenotype_offsets (n + 1 entries) and, if include_genotype, all the codons
+    concatenated in genotype with gene_offsets (one entry per gene, plus one) and genes_per_individual.
+    """
+    size = len(population)
+    phenotypes = [(ind.phenotype or '').encode('utf-8') for ind in population]
+    phenotype_offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum([len(phenotype) for phenotype in phenotypes], out=phenotype_offsets[1:])
+    columns = {'fitness': np.array([np.nan if ind.fitness is None else ind.fitness for ind in population],
+                                   dtype=np.float64),
+               'tree_depth': np.array([-1 if ind.tree_depth is None else ind.tree_depth for ind in population],
+                                      dtype=np.int32),
+               'phenotype': np.frombuffer(b''.join(phenotypes), dtype=np.uint8),
+               'phenotype_offsets': phenotype_offsets}
+    if include_genotype:
+        genes = [gene for ind in population for gene in ind.genotype]
+        gene_offsets = np.zeros(len(genes) + 1, dtype=np.int64)
+        np.cumsum([len(gene) for gene in genes], out=gene_offsets[1:])
+        codons = [np.asarray(gene) for gene in genes if len(gene)]
+        columns['genotype'] = np.concatenate(codons) if codons else np.zeros(0, dtype=np.uint8)
+        columns['gene_offsets'] = gene_offsets
+        columns['genes_per_individual'] = np.array(len(population[0].genotype) if size else 0)
+    return columns
+
+
+def save_npz(path, population, include_genotype=True):
+    np.savez_compressed(path, **population_columns(population, include_genotype))
+
+
+def load_npz(path):
+    """Reads a snapshot written by save_npz back as a list of dicts (as in Individual.to_dict)."""
+    with np.load(path) as data:
+        phenotypes, offsets = data['phenotype'].tobytes(), data['phenotype_offsets']
+        individuals = [{'fitness': None if np.isnan(fitness) else fitness,
+                        'tree_depth': None if depth < 0 else depth,
+                        'phenotype': phenotypes[start:end].decode('utf-8')}
+                       for fitness, depth, start, end in zip(data['fitness'].tolist(), data['tree_depth'].tolist(),
+                                                             offsets[:-1].tolist(), offsets[1:].tolist())]
+        if 'genotype' in data:
+            codons, gene_offsets = data['genotype'].tolist(), data['gene_offsets'].tolist()
+            genes = int(data['genes_per_individual'])
+            for index, individual in enumerate(individuals):
+                bounds = gene_offsets[index * genes:(index + 1) * genes + 1]
+                individual['genotype'] = [codons[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+    return individuals
+
+
+def save_json(path, population, include_genotype=True):
+    data = [ind.to_dict() for ind in population]
+    if not include_genotype:
+        for individual in data:
+            del individual['genotype']
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+
+class SnapshotWriter:
+    """
+    Runs the writes submitted to it, in order, on a background thread.
+    The queue holds at most maxsize pending writes: when the thread falls behind, submit blocks instead of
+    letting the snapshots pile up in memory. An exception raised by a write is raised again by the next call
+    to submit or close.
+    """
+
+    def __init__(self, maxsize=4):
+        self.queue = queue.Queue(maxsize)
+        self.error = None
+        self.thread = threading.Thread(target=self._work, name='sge-snapshots', daemon=True)
+        self.thread.start()
+
+    def _work(self):
+        while True:
+            task = self.queue.get()
+            if task is None:
+                return
+            function, args = task
+            try:
+                if self.error is None:
+                    function(*args)
+            except BaseException as e:
+                self.error = e
+
+    def check(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def submit(self, function, *args):
+        self.check()
+        self.queue.put((function, args))
+
+    def close(self):
+        """Waits for the pending writes and stops the thread."""
+        self.queue.put(None)
+        self.thread.join()
+        self.check()
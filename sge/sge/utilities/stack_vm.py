@@ -0,0 +1,162 @@
+"""
+A small stack machine for arithmetic phenotypes, e.g. the ones of grammars/regression.pybnf.
+A phenotype is turned into a postfix program (a tuple of (opcode, argument) instructions) by a tokenizer and
+the shunting-yard algorithm, with the precedences of python (|_div_| binds less than + and -, which bind
+less than *), so the program computes exactly what the python expression would. The program runs over all
+the fitness cases at once: variable loads push whole columns of x, and each instruction is a numpy operation.
+This skips the python parser and compiler, which dominate the cost of evaluating a new phenotype on a small
+dataset.
+"""
+import re
+import numpy as np
+from sge.utilities.cache import LRUCache
+from sge.utilities.protected_math import (protected_div, protected_exp, protected_inv, protected_log,
+                                          protected_sig, protected_sqrt)
+
+
+LOAD, CONST, ADD, SUB, MUL, DIV, NEG, POS, SIN, COS, EXP, LOG, INV, SQRT, SIG = range(15)
+
+# opcode -> (number of operands, implementation); LOAD and CONST push their argument
+INSTRUCTIONS = {ADD: (2, np.add), SUB: (2, np.subtract), MUL: (2, np.multiply), DIV: (2, protected_div),
+                NEG: (1, np.negative), POS: (1, np.positive), SIN: (1, np.sin), COS: (1, np.cos),
+                EXP: (1, protected_exp), LOG: (1, protected_log), INV: (1, protected_inv),
+                SQRT: (1, protected_sqrt), SIG: (1, protected_sig)}
+
+# terminals of the grammars -> (precedence, opcode); infix operators are written |name|, as |_div_|
+BINARY_OPERATORS = {'_div_': (0, DIV), '+': (1, ADD), '-': (1, SUB), '*': (2, MUL)}
+UNARY_OPERATORS = {'-': (3, NEG), '+': (3, POS)}
+FUNCTIONS = {'sin': SIN, 'cos': COS, '_exp_': EXP, '_log_': LOG, '_inv_': INV, '_sqrt_': SQRT, '_sig_': SIG}
+
+_OPEN = object()
+
+
+def tokenizer(variable):
+    """Regular expression that splits a phenotype in variable loads, numbers, |infix| operators, names and symbols."""
+    load = r"%s\s*\[\s*\d+\s*\]" % re.escape(variable)
+    number = r"(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+    return re.compile(r"\s*(%s|%s|\|\s*[A-Za-z_]\w*\s*\||[A-Za-z_]\w*|\S)" % (load, number))
+
+
+def classify(token, variable):
+    """
+    (kind, value) of a token: ('load', index), ('number', value), ('infix', name), ('name', name)
+    or ('symbol', text).
+    """
+    if token.startswith(variable) and token.endswith(']'):
+        return 'load', int(token[token.index('[') + 1:-1])
+    if token[0].isdigit() or token[0] == '.' and len(token) > 1:
+        return 'number', float(token)
+    if token[0] == '|' and len(token) > 1:
+        return 'infix', token[1:-1].strip()
+    if token[0].isalpha() or token[0] == '_':
+        return 'name', token
+    return 'symbol', token
+
+
+def run(program, x):
+    """Runs program with the variables in x (x[i] may be a column with the values of variable i in every case)."""
+    stack = []
+    for opcode, argument in program:
+        if opcode == LOAD:
+            stack.append(x[argument])
+        elif opcode == CONST:
+            stack.append(argument)
+        else:
+            operands, function = INSTRUCTIONS[opcode]
+            if operands == 1:
+                stack[-1] = function(stack[-1])
+            else:
+                right = stack.pop()
+                stack[-1] = function(stack[-1], right)
+    return stack[0]
+
+
+class StackVM(LRUCache):
+    """
+    Cache of the postfix programs of phenotypes. function() builds callables like CodeCache.function, so an
+    evaluator can use either one; phenotypes with terminals that are not in the tables (or that are not valid
+    expressions) raise ValueError, and can be handed to a CodeCache instead.
+    """
+
+    def __init__(self, maxsize=10000, variable='x', binary_operators=BINARY_OPERATORS,
+                 unary_operators=UNARY_OPERATORS, functions=FUNCTIONS):
+        super().__init__(maxsize)
+        self.variable = variable
+        self.tokens = tokenizer(variable)
+        # the few distinct tokens of a grammar are classified once
+        self.kinds = {}
+        self.binary_operators = binary_operators
+        self.unary_operators = unary_operators
+        self.functions = functions
+
+    def compile(self, phenotype):
+        """The postfix program of phenotype."""
+        program = self.get(phenotype)
+        if program is None:
+            program = self._compile(phenotype)
+            self.put(phenotype, program)
+        return program
+
+    def function(self, phenotype):
+        """The phenotype as a function of x, as CodeCache.function(phenotype)."""
+        program = self.compile(phenotype)
+        return lambda x: run(program, x)
+
+    def _compile(self, phenotype):
+        program, pending = [], []
+        expect_operand, after_function = True, False
+        kinds = self.kinds
+        for text in self.tokens.findall(phenotype):
+            kind = kinds.get(text)
+            if kind is None:
+                if len(kinds) >= self.maxsize:
+                    kinds.clear()
+                kind = kinds[text] = classify(text, self.variable)
+            kind, value = kind
+            if after_function and text != '(':
+                raise ValueError("Expected '(' after a function in %r" % phenotype)
+            after_function = False
+            if expect_operand:
+                if kind == 'load':
+                    program.append((LOAD, value))
+                    expect_operand = False
+                elif kind == 'number':
+                    program.append((CONST, value))
+                    expect_operand = False
+                elif text == '(':
+                    pending.append(_OPEN)
+                elif kind == 'name' and text in self.functions:
+                    # functions are kept in pending, below their '(', with no precedence
+                    pending.append((None, self.functions[text]))
+                    after_function = True
+                elif kind == 'symbol' and text in self.unary_operators:
+                    pending.append(self.unary_operators[text])
+                else:
+                    raise ValueError("Unexpected %r in %r" % (text, phenotype))
+            elif text == ')':
+                while pending and pending[-1] is not _OPEN:
+                    program.append((pending.pop()[1], None))
+                if not pending:
+                    raise ValueError("Unbalanced parentheses in %r" % phenotype)
+                pending.pop()
+                if pending and pending[-1] is not _OPEN and pending[-1][0] is None:
+                    program.append((pending.pop()[1], None))
+            else:
+                operator = value if kind in ('infix', 'symbol') else None
+                if operator not in self.binary_operators:
+                    raise ValueError("Unexpected %r in %r" % (text, phenotype))
+                precedence, opcode = self.binary_operators[operator]
+                # all the binary operators are left associative
+                while pending and pending[-1] is not _OPEN and pending[-1][0] is not None \
+                        and pending[-1][0] >= precedence:
+                    program.append((pending.pop()[1], None))
+                pending.append((precedence, opcode))
+                expect_operand = True
+        if expect_operand or after_function:
+            raise ValueError("Incomplete expression %r" % phenotype)
+        while pending:
+            entry = pending.pop()
+            if entry is _OPEN:
+                raise ValueError("Unbalanced parentheses in %r" % phenotype)
+            program.append((entry[1], None))
+        return tuple(program)
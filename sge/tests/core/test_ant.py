@@ -0,0 +1,36 @@
+import random
+import unittest
+import warnings
+
+
+class TestFastAnt(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def test_compile_controller(self):
+        from examples.gp_ant import compile_controller, MOVE_FORWARD, TURN_LEFT, TURN_RIGHT, IF_FOOD_AHEAD, JUMP
+        routine = "if ant.sense_food():\n  ant.move_forward()\nelse:\n  ant.turn_left()\n  ant.turn_left()\n" \
+                  "ant.turn_right()"
+        self.assertEqual(compile_controller(routine),
+                         ((IF_FOOD_AHEAD, 3), (MOVE_FORWARD, None), (JUMP, 5), (TURN_LEFT, None), (TURN_LEFT, None),
+                          (TURN_RIGHT, None)))
+        with self.assertRaises(ValueError):
+            compile_controller("ant.moves = 0")
+
+    def test_same_results_as_runstring(self):
+        from sge.grammar import Grammar
+        from sge.engine import generate_random_individual
+        from examples.gp_ant import AntSimulator
+        grammar = Grammar('grammars/antgrammar.pybnf', 12, 3)
+        rng = random.Random(4)
+        routines = [grammar.mapping(generate_random_individual(grammar=grammar, rng=rng).genotype, rng=rng)[0]
+                    for _ in range(40)]
+        for trail in ["sft", "losaltos"]:
+            legacy, fast = AntSimulator(650, trail), AntSimulator(650, trail, backend="fast")
+            for routine in routines:
+                self.assertEqual(fast.evaluate(routine), legacy.evaluate(routine), routine)
+                self.assertEqual(fast.position, legacy.position, routine)
+
+
+if __name__ == '__main__':
+    unittest.main()
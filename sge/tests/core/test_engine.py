@@ -0,0 +1,168 @@
+import unittest
+import warnings
+
+
+class CountingEvaluator:
+    def __init__(self):
+        self.evaluated = []
+
+    def evaluate(self, individual):
+        self.evaluated.append(individual)
+        return len(individual), {'length': len(individual)}
+
+
+class TestFitnessCache(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def test_each_phenotype_is_evaluated_once(self):
+        from sge.engine import evaluate_with_cache
+        from sge.evaluation import SerialEvaluation
+        from sge.utilities.cache import LRUCache
+        from sge.individual import Individual
+        evaluator = CountingEvaluator()
+        evaluation = SerialEvaluation(evaluator)
+        cache = LRUCache(10)
+        population = [Individual([], phenotype=p) for p in ['x', 'x+1', 'x', 'x*x']]
+        self.assertEqual(evaluate_with_cache(population, evaluation, cache), 0.25)
+        self.assertEqual(evaluator.evaluated, ['x', 'x+1', 'x*x'])
+        self.assertEqual([ind.fitness for ind in population], [1, 3, 1, 3])
+        offspring = [Individual([], phenotype=p) for p in ['x*x', 'x-1']]
+        self.assertEqual(evaluate_with_cache(offspring, evaluation, cache), 0.5)
+        self.assertEqual(evaluator.evaluated, ['x', 'x+1', 'x*x', 'x-1'])
+        self.assertEqual(offspring[0].other_info, {'length': 3})
+
+
+class TestBreed(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def test_offspring_are_mapped_after_variation(self):
+        import random
+        import sge.grammar as grammar
+        from sge.engine import breed, generate_random_individual, map_individual, map_individuals
+        grammar.set_path("grammars/regression.txt")
+        grammar.read_grammar()
+        grammar.set_max_tree_depth(10)
+        grammar.set_min_init_tree_depth(4)
+        random.seed(7)
+        population = [generate_random_individual() for _ in range(30)]
+        map_individuals(population)
+        for ind in population:
+            ind.fitness = random.random()
+        offspring = breed(population, 40)
+        self.assertEqual(len(offspring), 40)
+        for ind in offspring:
+            mapped = ind.shallow_clone()
+            map_individual(mapped)
+            self.assertEqual((ind.phenotype, ind.tree_depth, ind.mapping_values),
+                             (mapped.phenotype, mapped.tree_depth, mapped.mapping_values))
+            if ind.fitness is not None:
+                self.assertIn(ind.phenotype, [p.phenotype for p in population])
+
+    def test_each_offspring_is_mapped_once(self):
+        # the new children of recombination are mutated while they are mapped, and the operators only mutate
+        # offspring whose codons read by the mapping and depth of the tree are known
+        import random
+        from unittest import mock
+        import sge.engine as engine
+        from sge.grammar import Grammar
+        from sge.parameters import DEFAULTS
+        grammar = Grammar("grammars/regression.txt", 10, 4)
+        rng = random.Random(3)
+        population = [engine.generate_random_individual(grammar, rng) for _ in range(30)]
+        engine.map_individuals(population, None, grammar, [rng.getrandbits(64) for _ in population])
+        for ind in population:
+            ind.fitness = rng.random()
+        for operators, name in [('scalar', 'mutate'), ('vectorized', 'mutate_population')]:
+            parameters = dict(DEFAULTS, OPERATORS=operators, PROB_CROSSOVER=0.9, PROB_MUTATION=0.1)
+            with mock.patch.object(engine, name, wraps=getattr(engine, name)) as mutation, \
+                    mock.patch.object(engine, 'map_individuals', wraps=engine.map_individuals) as batches, \
+                    mock.patch.object(grammar, '_iterative_mapping', wraps=grammar._iterative_mapping) as mapper:
+                offspring = engine.breed(population, 40, None, None, parameters, grammar, random.Random(5))
+            self.assertEqual(batches.call_count, 1)
+            self.assertTrue(0 < mapper.call_count <= len(offspring))
+            self.assertEqual(mapper.call_count, len(batches.call_args.args[0]))
+            if operators == 'scalar':
+                mutated = [call.args[0] for call in mutation.call_args_list]
+            else:
+                mutated = mutation.call_args.args[0]
+            for ind in mutated + offspring:
+                mapped = ind.shallow_clone()
+                engine.map_individuals([mapped], None, grammar, [0])
+                self.assertEqual((ind.phenotype, ind.tree_depth, list(ind.mapping_values)),
+                                 (mapped.phenotype, mapped.tree_depth, list(mapped.mapping_values)))
+
+
+class LengthEvaluator:
+    def evaluate(self, individual):
+        return len(individual), {}
+
+
+class TestEvolution(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def run_evolution(self, directory, seed, results, key):
+        from sge.engine import Evolution
+        parameters = {'GRAMMAR': 'grammars/regression.txt', 'EXPERIMENT_NAME': directory, 'RUN': key,
+                      'SEED': seed, 'POPSIZE': 20, 'ELITISM': 2, 'GENERATIONS': 5, 'VERBOSE': False}
+        population = Evolution(LengthEvaluator(), parameters).run()
+        results[key] = [(ind.phenotype, ind.fitness) for ind in population]
+
+    def test_concurrent_runs_do_not_share_state(self):
+        import random
+        import tempfile
+        import threading
+        state = random.getstate()
+        with tempfile.TemporaryDirectory() as directory:
+            expected = {}
+            self.run_evolution(directory, 1, expected, 0)
+            results = {}
+            threads = [threading.Thread(target=self.run_evolution, args=(directory, seed, results, key))
+                       for key, seed in enumerate([1, 2, 1, 2], start=1)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(results[1], expected[0])
+        self.assertEqual(results[3], expected[0])
+        self.assertEqual(results[2], results[4])
+        self.assertNotEqual(results[1], results[2])
+        self.assertEqual(random.getstate(), state)
+
+    def test_results_do_not_depend_on_the_number_of_workers(self):
+        import tempfile
+        from sge.engine import Evolution
+        populations = []
+        with tempfile.TemporaryDirectory() as directory:
+            for workers in [0, 3]:
+                parameters = {'GRAMMAR': 'grammars/regression.txt', 'EXPERIMENT_NAME': directory, 'SEED': 5,
+                              'POPSIZE': 30, 'ELITISM': 2, 'GENERATIONS': 4, 'VERBOSE': False, 'MAX_TREE_DEPTH': 8,
+                              'MAPPING_WORKERS': workers, 'WORKERS': max(workers, 1)}
+                population = Evolution(LengthEvaluator(), parameters).run()
+                populations.append([ind.to_dict() for ind in population])
+        self.assertEqual(populations[0], populations[1])
+
+    def test_resumed_run_continues_where_it_stopped(self):
+        import os
+        import tempfile
+        from sge.engine import Evolution
+        parameters = {'GRAMMAR': 'grammars/regression.txt', 'SEED': 9, 'POPSIZE': 20, 'ELITISM': 2,
+                      'GENERATIONS': 6, 'VERBOSE': False, 'CHECKPOINT_STEP': 2, 'FITNESS_CACHE_SIZE': 50}
+        with tempfile.TemporaryDirectory() as directory:
+            full = Evolution(LengthEvaluator(), dict(parameters, EXPERIMENT_NAME=directory, RUN=1)).run()
+            # a run that stops after generation 3, with its last checkpoint at generation 2
+            Evolution(LengthEvaluator(), dict(parameters, EXPERIMENT_NAME=directory, RUN=2, GENERATIONS=3)).run()
+            resumed = Evolution(LengthEvaluator(), dict(parameters, EXPERIMENT_NAME=directory, RUN=2,
+                                                        RESUME=True)).run()
+            progress = []
+            for run in [1, 2]:
+                with open(os.path.join(directory, 'run_%d' % run, 'progress_report.csv')) as f:
+                    progress.append(f.read())
+        self.assertEqual([ind.to_dict() for ind in resumed], [ind.to_dict() for ind in full])
+        self.assertEqual(progress[0], progress[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import warnings
+
+
+class LengthEvaluator:
+    def evaluate(self, individual):
+        return len(individual), {'phenotype': individual}
+
+
+class BatchLengthEvaluator(LengthEvaluator):
+    def __init__(self):
+        self.batches = []
+
+    def evaluate_batch(self, individuals):
+        self.batches.append(individuals)
+        return [self.evaluate(individual) for individual in individuals]
+
+
+class TestMakeEvaluation(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def test_strategy_follows_the_evaluator(self):
+        from sge.evaluation import make_evaluation, SerialEvaluation, BatchEvaluation
+        self.assertIsInstance(make_evaluation(LengthEvaluator()), SerialEvaluation)
+        self.assertIsInstance(make_evaluation(BatchLengthEvaluator(), workers=4), BatchEvaluation)
+
+    def test_batch_evaluator_gets_the_full_list(self):
+        from sge.evaluation import make_evaluation
+        evaluator = BatchLengthEvaluator()
+        phenotypes = ['x', 'x+x', 'x*x*x']
+        self.assertEqual(make_evaluation(evaluator).evaluate(phenotypes), [(1, {'phenotype': 'x'}),
+                                                                          (3, {'phenotype': 'x+x'}),
+                                                                          (5, {'phenotype': 'x*x*x'})])
+        self.assertEqual(evaluator.batches, [phenotypes])
+
+    def test_errors_are_not_swallowed(self):
+        from sge.evaluation import make_evaluation
+        self.assertRaises(TypeError, make_evaluation(LengthEvaluator()).evaluate, ['x', None])
+
+
+class TestEvaluationPool(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def test_results_match_serial_evaluation(self):
+        from sge.evaluation import EvaluationPool
+        evaluator = LengthEvaluator()
+        phenotypes = ['x' * (i % 7) + '+1' * (i % 3) for i in range(101)]
+        pool = EvaluationPool(evaluator, 3)
+        try:
+            results = pool.evaluate(phenotypes)
+        finally:
+            pool.close()
+        self.assertEqual(results, [evaluator.evaluate(phenotype) for phenotype in phenotypes])
+
+
+if __name__ == '__main__':
+    unittest.main()
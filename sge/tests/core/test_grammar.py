@@ -1,7 +1,16 @@
+import copy
+import os
+import random
+import sys
+import tempfile
 import unittest
 import warnings
 
 
+SIMPLE_GENOME = [[0], [0, 3, 3], [0], [], [1, 1]]
+LONG_GENOME = [[0], [0, 2, 1, 0, 2, 3, 0, 1, 0, 0, 2, 0, 2, 0, 2, 0, 3, 1, 0, 3, 0, 3, 3, 1, 2, 3, 2, 3, 0, 0, 1, 2, 1, 3, 3, 2, 1, 3, 3, 0, 0, 1, 3, 3, 1, 3, 3, 2, 1, 3, 3, 2, 1, 0, 1, 3, 3, 2, 3, 1, 1, 3, 3, 3, 2, 3, 2, 1, 0, 3, 1, 0, 3, 1, 0, 3, 1, 2, 3, 2, 3, 2, 2, 0, 3, 3, 0, 3, 0, 2, 0, 3, 3, 0, 1, 1, 3, 3, 1, 3, 3, 0, 3, 2, 3, 3, 1, 0, 1, 0, 1, 3, 1, 1, 3, 2, 1, 3, 2, 3, 0, 3, 2, 0, 0, 3, 3, 2, 3, 1, 2, 1, 3, 3, 0, 1, 3, 1, 0, 3, 3, 3, 3, 0, 2, 2, 0, 2, 1, 3, 1, 3, 3, 2, 0, 0, 3, 3, 0, 3, 3, 0, 0, 3, 2, 3, 3, 2, 3, 3, 0, 3, 3, 3, 0, 1, 3, 2, 3, 0, 3, 1, 0, 1, 2, 2, 1, 2, 2, 3, 2, 1, 0, 2, 1, 3, 1, 3, 3, 2, 2, 2, 3, 2, 1, 0, 1, 3, 3, 1, 3, 3, 0, 1, 3, 3, 1, 3, 3, 1, 0, 3, 0, 3, 2, 2, 3, 2, 2, 2, 1, 0, 2, 2, 1, 3, 3, 0, 2, 0, 3, 3, 2, 3, 0, 1, 3, 1, 2, 3, 1, 3, 3, 0, 2, 1, 3, 3, 1, 0, 3, 3, 0, 3, 3, 2, 3, 0, 0, 2, 0, 2, 0, 2, 0, 3, 0, 1, 2, 3, 2, 3, 2, 3, 1, 1, 2, 3, 3, 2, 2, 1, 3, 1, 3, 3, 0, 1, 2, 0, 3, 3, 2, 0, 3, 1, 3, 1, 3, 2, 3, 1, 2, 2, 1, 0, 0, 3, 3, 2, 3, 0, 0, 3, 3, 2, 3, 2, 1, 0, 0, 3, 1, 3, 3, 3, 2, 0, 2, 3, 1, 3, 3, 2, 0, 0, 0, 1, 2, 0, 2, 1, 3, 3, 1, 2, 3, 0, 3, 3, 2, 2, 0, 0, 3, 3, 2, 3, 0, 3, 3, 2, 0, 1, 1, 2, 1, 3, 3, 1, 1, 3, 3, 1, 3, 3, 2, 1, 2, 3, 0, 3, 3, 0, 3, 2, 3, 2, 3, 3, 1, 3, 1, 1, 2, 1, 0, 2, 2, 1, 1, 0, 2, 0, 3, 2, 1, 2, 3, 2, 3, 2, 2, 2, 1, 3, 2, 3, 1, 2, 3, 2, 3, 0, 2, 1, 2, 0, 3, 0, 2, 3, 3, 3, 1, 1, 0, 3, 0, 1, 1, 3, 3, 1, 3, 3, 3, 2, 2, 2, 3, 2, 2, 2, 2, 2, 3, 2, 0, 1, 2, 0, 2, 2, 3, 1, 3, 0, 3, 3, 3, 3, 1, 2, 2, 3, 0, 3, 0, 0, 3, 1, 0, 3, 0, 3, 2, 3, 0, 1, 0, 1, 1, 3, 1, 3, 3, 1, 1, 3, 3, 2, 3, 2, 3, 3, 3, 0, 0, 1, 0, 2, 0, 3, 0, 0, 3, 3, 0, 3, 3, 1, 3, 1, 2, 3, 2, 1, 3, 3, 2, 2, 2, 2, 1, 3, 3, 2, 0, 3, 0, 0, 2, 2, 3, 1, 2, 3, 2, 3, 0, 0, 3, 2, 3, 2, 0, 3, 3, 1, 0, 3, 0, 2, 2, 1, 1, 3, 3, 0, 3, 3, 1, 3, 1, 2, 2, 3, 1, 0, 3, 3, 1, 3, 3, 0, 0, 3, 2, 1, 0, 0, 3, 3, 3, 2, 1, 3, 3, 3, 3, 0, 0, 2, 2, 3, 3, 2, 2, 2, 0, 1, 1, 1, 0, 2, 1, 0, 3, 3, 1, 2, 3, 2, 1, 3, 3, 2, 0, 1, 1, 2, 3, 1, 3, 3, 1, 2, 3, 2, 3, 1, 2, 1, 3, 3, 2, 2, 3, 0, 3, 0, 0, 3, 3, 1, 3, 0, 3, 0, 1, 3, 3, 1, 3, 3, 3, 1, 1, 2, 3, 1, 2, 2, 3, 3, 0, 1, 3, 1, 0, 0, 2, 3, 3, 3, 3, 2, 0, 0, 1, 3, 2, 1, 3, 3, 3, 2, 0, 1, 2, 3, 3, 2, 2, 3, 1, 0, 3, 2, 2, 0, 2, 0, 3, 2, 0, 3, 3, 3, 2, 3], [0, 2, 0, 3, 3, 2, 0, 3, 0, 2, 3, 3, 2, 1, 1, 2, 0, 3, 2, 0, 1, 3, 2, 3, 3, 0, 0, 0, 3, 0, 2, 0, 1, 0, 2, 1, 0, 1, 3, 3, 0, 3, 2, 2, 3, 0, 2, 2, 0, 1, 0, 3, 2, 0, 2, 0, 0, 3, 2, 2, 0, 3, 0, 1, 3, 0, 3, 3, 0, 1, 0, 1, 3, 3, 2, 1, 1, 3, 2, 0, 2, 2, 0, 1, 2, 0, 0, 0, 3, 2, 1, 0, 1, 3, 1, 3, 0, 2, 1, 2, 0, 1, 1, 3, 3, 0, 0, 0, 3, 1, 0, 3, 1, 3, 3, 0, 3, 2, 2, 0, 2, 3, 1, 0, 2, 2, 3, 3, 0, 1, 3, 3, 2, 0, 3, 3, 0, 2, 2, 1, 3, 1, 2, 2, 3, 1, 2, 2, 3, 0, 0, 0, 1, 2, 0, 3, 3, 3, 2, 0, 1, 2, 1, 0, 1, 1, 0, 0, 1, 2, 1, 0, 2, 1, 1, 3, 1, 3, 1, 3, 3, 1, 2, 0, 3, 1, 1, 1, 2, 1, 0, 3, 3, 2, 0, 0, 0, 3, 1, 2, 2, 0, 2, 1, 0, 1, 1, 1, 1, 3, 0, 3, 2, 3, 3, 1, 1, 1, 3, 0, 1, 1, 1, 0, 1, 0, 3, 3, 2, 2, 0, 2, 0, 2, 2, 0, 3, 3, 3, 2, 3, 0, 2, 1, 2, 2, 1, 2, 3, 2, 0, 0, 3, 0, 1, 3, 0, 2, 3, 1, 1, 0, 1, 3, 1, 0, 2, 1, 0, 2, 1, 0, 0, 0, 2, 3, 2, 2, 1, 0, 3], [0, 2, 0, 2, 3, 3, 0, 1, 0, 3, 3, 2, 0, 0, 1, 2, 1, 0, 0, 0, 0, 0, 2, 3, 1, 1, 2, 1, 1, 0, 1, 1, 1, 2, 1, 0, 2, 1, 3, 1, 0, 1, 3, 3, 3, 3, 1, 3, 2, 2, 2, 2, 0, 3, 2, 3, 2, 3, 2, 0, 1, 1, 3, 1, 1, 1, 1, 1, 3, 0, 1, 3, 1, 0, 1, 2, 2, 3, 1, 3, 1, 3, 3, 0, 1, 1, 3, 1, 2, 2, 3, 3, 2, 1, 1, 0, 3, 3, 3, 3, 3, 2, 2, 0, 1, 1, 2, 2, 3, 3, 2, 0, 3, 3, 2, 3, 2, 0, 0, 0, 1, 0, 0, 3, 3, 0, 1, 3, 2, 3, 1, 3, 2, 0, 0, 1, 0, 2, 1, 3, 0, 2, 3, 0, 1, 3, 1, 0, 0, 2, 0, 3, 2, 1, 3, 3, 0, 0, 1, 0, 0, 0, 3, 1, 3, 1, 3, 3, 1], [1, 1, 0, 1, 1, 1, 0, 0, 1, 1, 1, 0, 0, 0, 1, 1, 0, 1, 0, 1, 1, 0, 0, 1, 1, 1, 1, 0, 0, 1, 0, 1, 1, 1, 1, 0, 0, 0, 0, 1, 1, 0, 1, 1, 1, 0, 0, 0, 1, 0, 1, 1, 1, 1, 0, 0, 1, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 0, 0, 1, 1, 0, 1, 1, 0, 0, 0, 1, 1, 1, 0, 0, 0, 1, 1, 1, 0, 1, 0, 1, 1, 0, 1, 1, 0, 0, 0, 0, 0, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 1, 0, 0, 1, 0, 0, 0, 1, 0, 0, 1, 1, 0, 1, 1, 0, 1, 1, 1, 1, 0, 0, 1, 1, 0, 0, 0, 1, 0, 1, 0, 1, 1, 1, 1, 0, 1, 1, 0, 1, 0, 0, 1, 0, 1, 0, 1, 0, 0, 1, 0, 1, 1, 1, 0, 1, 1, 0, 0, 0, 1, 0, 1, 1, 0, 0, 1, 1, 0, 0, 0, 0, 1, 1, 0, 1, 0, 0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 1, 1, 0, 0, 0, 0, 1, 0, 0, 1, 1, 1, 1, 1, 0, 1, 0, 0, 1, 0, 1, 1, 0, 1, 1, 1, 0, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 1, 1, 1, 1, 0, 0, 0, 1, 0, 1, 1, 0, 0, 1, 1, 1, 1, 0, 0, 0, 1, 0, 1, 1, 0, 0, 1, 1, 0, 1, 0, 0, 0, 0, 1, 0]]
+
+
 class Test(unittest.TestCase):
     def setUp(self):
         warnings.simplefilter('ignore', category=DeprecationWarning)
@@ -26,11 +35,263 @@ class Test(unittest.TestCase):
 
     def test_longer_genomes(self):
         import sge.grammar
-        genome = [[0], [0, 2, 1, 0, 2, 3, 0, 1, 0, 0, 2, 0, 2, 0, 2, 0, 3, 1, 0, 3, 0, 3, 3, 1, 2, 3, 2, 3, 0, 0, 1, 2, 1, 3, 3, 2, 1, 3, 3, 0, 0, 1, 3, 3, 1, 3, 3, 2, 1, 3, 3, 2, 1, 0, 1, 3, 3, 2, 3, 1, 1, 3, 3, 3, 2, 3, 2, 1, 0, 3, 1, 0, 3, 1, 0, 3, 1, 2, 3, 2, 3, 2, 2, 0, 3, 3, 0, 3, 0, 2, 0, 3, 3, 0, 1, 1, 3, 3, 1, 3, 3, 0, 3, 2, 3, 3, 1, 0, 1, 0, 1, 3, 1, 1, 3, 2, 1, 3, 2, 3, 0, 3, 2, 0, 0, 3, 3, 2, 3, 1, 2, 1, 3, 3, 0, 1, 3, 1, 0, 3, 3, 3, 3, 0, 2, 2, 0, 2, 1, 3, 1, 3, 3, 2, 0, 0, 3, 3, 0, 3, 3, 0, 0, 3, 2, 3, 3, 2, 3, 3, 0, 3, 3, 3, 0, 1, 3, 2, 3, 0, 3, 1, 0, 1, 2, 2, 1, 2, 2, 3, 2, 1, 0, 2, 1, 3, 1, 3, 3, 2, 2, 2, 3, 2, 1, 0, 1, 3, 3, 1, 3, 3, 0, 1, 3, 3, 1, 3, 3, 1, 0, 3, 0, 3, 2, 2, 3, 2, 2, 2, 1, 0, 2, 2, 1, 3, 3, 0, 2, 0, 3, 3, 2, 3, 0, 1, 3, 1, 2, 3, 1, 3, 3, 0, 2, 1, 3, 3, 1, 0, 3, 3, 0, 3, 3, 2, 3, 0, 0, 2, 0, 2, 0, 2, 0, 3, 0, 1, 2, 3, 2, 3, 2, 3, 1, 1, 2, 3, 3, 2, 2, 1, 3, 1, 3, 3, 0, 1, 2, 0, 3, 3, 2, 0, 3, 1, 3, 1, 3, 2, 3, 1, 2, 2, 1, 0, 0, 3, 3, 2, 3, 0, 0, 3, 3, 2, 3, 2, 1, 0, 0, 3, 1, 3, 3, 3, 2, 0, 2, 3, 1, 3, 3, 2, 0, 0, 0, 1, 2, 0, 2, 1, 3, 3, 1, 2, 3, 0, 3, 3, 2, 2, 0, 0, 3, 3, 2, 3, 0, 3, 3, 2, 0, 1, 1, 2, 1, 3, 3, 1, 1, 3, 3, 1, 3, 3, 2, 1, 2, 3, 0, 3, 3, 0, 3, 2, 3, 2, 3, 3, 1, 3, 1, 1, 2, 1, 0, 2, 2, 1, 1, 0, 2, 0, 3, 2, 1, 2, 3, 2, 3, 2, 2, 2, 1, 3, 2, 3, 1, 2, 3, 2, 3, 0, 2, 1, 2, 0, 3, 0, 2, 3, 3, 3, 1, 1, 0, 3, 0, 1, 1, 3, 3, 1, 3, 3, 3, 2, 2, 2, 3, 2, 2, 2, 2, 2, 3, 2, 0, 1, 2, 0, 2, 2, 3, 1, 3, 0, 3, 3, 3, 3, 1, 2, 2, 3, 0, 3, 0, 0, 3, 1, 0, 3, 0, 3, 2, 3, 0, 1, 0, 1, 1, 3, 1, 3, 3, 1, 1, 3, 3, 2, 3, 2, 3, 3, 3, 0, 0, 1, 0, 2, 0, 3, 0, 0, 3, 3, 0, 3, 3, 1, 3, 1, 2, 3, 2, 1, 3, 3, 2, 2, 2, 2, 1, 3, 3, 2, 0, 3, 0, 0, 2, 2, 3, 1, 2, 3, 2, 3, 0, 0, 3, 2, 3, 2, 0, 3, 3, 1, 0, 3, 0, 2, 2, 1, 1, 3, 3, 0, 3, 3, 1, 3, 1, 2, 2, 3, 1, 0, 3, 3, 1, 3, 3, 0, 0, 3, 2, 1, 0, 0, 3, 3, 3, 2, 1, 3, 3, 3, 3, 0, 0, 2, 2, 3, 3, 2, 2, 2, 0, 1, 1, 1, 0, 2, 1, 0, 3, 3, 1, 2, 3, 2, 1, 3, 3, 2, 0, 1, 1, 2, 3, 1, 3, 3, 1, 2, 3, 2, 3, 1, 2, 1, 3, 3, 2, 2, 3, 0, 3, 0, 0, 3, 3, 1, 3, 0, 3, 0, 1, 3, 3, 1, 3, 3, 3, 1, 1, 2, 3, 1, 2, 2, 3, 3, 0, 1, 3, 1, 0, 0, 2, 3, 3, 3, 3, 2, 0, 0, 1, 3, 2, 1, 3, 3, 3, 2, 0, 1, 2, 3, 3, 2, 2, 3, 1, 0, 3, 2, 2, 0, 2, 0, 3, 2, 0, 3, 3, 3, 2, 3], [0, 2, 0, 3, 3, 2, 0, 3, 0, 2, 3, 3, 2, 1, 1, 2, 0, 3, 2, 0, 1, 3, 2, 3, 3, 0, 0, 0, 3, 0, 2, 0, 1, 0, 2, 1, 0, 1, 3, 3, 0, 3, 2, 2, 3, 0, 2, 2, 0, 1, 0, 3, 2, 0, 2, 0, 0, 3, 2, 2, 0, 3, 0, 1, 3, 0, 3, 3, 0, 1, 0, 1, 3, 3, 2, 1, 1, 3, 2, 0, 2, 2, 0, 1, 2, 0, 0, 0, 3, 2, 1, 0, 1, 3, 1, 3, 0, 2, 1, 2, 0, 1, 1, 3, 3, 0, 0, 0, 3, 1, 0, 3, 1, 3, 3, 0, 3, 2, 2, 0, 2, 3, 1, 0, 2, 2, 3, 3, 0, 1, 3, 3, 2, 0, 3, 3, 0, 2, 2, 1, 3, 1, 2, 2, 3, 1, 2, 2, 3, 0, 0, 0, 1, 2, 0, 3, 3, 3, 2, 0, 1, 2, 1, 0, 1, 1, 0, 0, 1, 2, 1, 0, 2, 1, 1, 3, 1, 3, 1, 3, 3, 1, 2, 0, 3, 1, 1, 1, 2, 1, 0, 3, 3, 2, 0, 0, 0, 3, 1, 2, 2, 0, 2, 1, 0, 1, 1, 1, 1, 3, 0, 3, 2, 3, 3, 1, 1, 1, 3, 0, 1, 1, 1, 0, 1, 0, 3, 3, 2, 2, 0, 2, 0, 2, 2, 0, 3, 3, 3, 2, 3, 0, 2, 1, 2, 2, 1, 2, 3, 2, 0, 0, 3, 0, 1, 3, 0, 2, 3, 1, 1, 0, 1, 3, 1, 0, 2, 1, 0, 2, 1, 0, 0, 0, 2, 3, 2, 2, 1, 0, 3], [0, 2, 0, 2, 3, 3, 0, 1, 0, 3, 3, 2, 0, 0, 1, 2, 1, 0, 0, 0, 0, 0, 2, 3, 1, 1, 2, 1, 1, 0, 1, 1, 1, 2, 1, 0, 2, 1, 3, 1, 0, 1, 3, 3, 3, 3, 1, 3, 2, 2, 2, 2, 0, 3, 2, 3, 2, 3, 2, 0, 1, 1, 3, 1, 1, 1, 1, 1, 3, 0, 1, 3, 1, 0, 1, 2, 2, 3, 1, 3, 1, 3, 3, 0, 1, 1, 3, 1, 2, 2, 3, 3, 2, 1, 1, 0, 3, 3, 3, 3, 3, 2, 2, 0, 1, 1, 2, 2, 3, 3, 2, 0, 3, 3, 2, 3, 2, 0, 0, 0, 1, 0, 0, 3, 3, 0, 1, 3, 2, 3, 1, 3, 2, 0, 0, 1, 0, 2, 1, 3, 0, 2, 3, 0, 1, 3, 1, 0, 0, 2, 0, 3, 2, 1, 3, 3, 0, 0, 1, 0, 0, 0, 3, 1, 3, 1, 3, 3, 1], [1, 1, 0, 1, 1, 1, 0, 0, 1, 1, 1, 0, 0, 0, 1, 1, 0, 1, 0, 1, 1, 0, 0, 1, 1, 1, 1, 0, 0, 1, 0, 1, 1, 1, 1, 0, 0, 0, 0, 1, 1, 0, 1, 1, 1, 0, 0, 0, 1, 0, 1, 1, 1, 1, 0, 0, 1, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 0, 0, 1, 1, 0, 1, 1, 0, 0, 0, 1, 1, 1, 0, 0, 0, 1, 1, 1, 0, 1, 0, 1, 1, 0, 1, 1, 0, 0, 0, 0, 0, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 1, 0, 0, 1, 0, 0, 0, 1, 0, 0, 1, 1, 0, 1, 1, 0, 1, 1, 1, 1, 0, 0, 1, 1, 0, 0, 0, 1, 0, 1, 0, 1, 1, 1, 1, 0, 1, 1, 0, 1, 0, 0, 1, 0, 1, 0, 1, 0, 0, 1, 0, 1, 1, 1, 0, 1, 1, 0, 0, 0, 1, 0, 1, 1, 0, 0, 1, 1, 0, 0, 0, 0, 1, 1, 0, 1, 0, 0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 1, 1, 0, 0, 0, 0, 1, 0, 0, 1, 1, 1, 1, 1, 0, 1, 0, 0, 1, 0, 1, 1, 0, 1, 1, 1, 0, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 1, 1, 1, 1, 0, 0, 0, 1, 0, 1, 1, 0, 0, 1, 1, 1, 1, 0, 0, 0, 1, 0, 1, 1, 0, 0, 1, 1, 0, 1, 0, 0, 0, 0, 1, 0]]
+        genome = LONG_GENOME
         g = sge.grammar.Grammar("grammars/regression.txt")
         mapping_numbers = [0] * len(genome)
         self.assertEqual(g.mapping(genome, mapping_numbers, needs_python_filter=True), ('sin((_exp_(1.0)+(sin(_exp_(_log_(1.0*(x[0]+1.0|_div_|1.0|_div_|(_log_(1.0)*sin(x[0]))))+(cos((x[0]|_div_|1.0))+sin((1.0*1.0)))|_div_|(x[0]|_div_|x[0])*(x[0]-1.0)-_log_((1.0*x[0]))+_log_(((1.0|_div_|x[0])*_exp_(1.0)+((1.0-x[0])|_div_|x[0]))))*sin(1.0))|_div_|sin((1.0|_div_|(1.0+(1.0+(cos(x[0])+_exp_(x[0]))|_div_|cos(sin(1.0+x[0])))*1.0+sin(1.0-1.0)+((1.0*x[0])-(x[0]+x[0]))-x[0]|_div_|sin(1.0))|_div_|1.0))+(((x[0]|_div_|((1.0*sin((1.0*sin(1.0))))|_div_|x[0]+_exp_(x[0]*x[0]*_log_(1.0))))+(cos((x[0]-1.0))+(1.0|_div_|(1.0*1.0+x[0]))*x[0])+cos(_exp_(cos((1.0+(x[0]|_div_|x[0])))*cos(1.0*1.0+1.0|_div_|1.0)))+1.0-sin(1.0)|_div_|1.0)+cos(1.0)|_div_|x[0])|_div_|1.0+x[0])-x[0]+(1.0-cos(1.0))|_div_|x[0]|_div_|((cos(_exp_((cos(sin(1.0))*_exp_((cos((1.0-(x[0]-x[0])))|_div_|_log_(cos(sin(x[0])))*cos(((1.0+1.0)*(1.0*x[0])+(x[0]-x[0])*(1.0+1.0))))))))+(1.0+x[0]|_div_|_log_(_log_(1.0))*_log_(_log_(cos((_log_(_exp_((x[0]-1.0)))+_exp_(1.0-x[0])|_div_|_exp_(1.0)-(1.0|_div_|(_exp_(x[0])+(x[0]*x[0])))-sin((x[0]*x[0]))+(1.0-1.0-1.0|_div_|1.0)))))))|_div_|_log_(x[0])+_exp_(_log_(_exp_(1.0+(_log_(1.0)+_exp_(1.0))|_div_|sin(1.0))-((cos(1.0)+1.0)|_div_|cos(_log_((1.0-(x[0]|_div_|x[0]))))))|_div_|(cos(x[0]+x[0])|_div_|cos(x[0]*(1.0*(x[0]+cos(x[0])))))*(cos(cos((1.0|_div_|x[0]-_log_(x[0])+x[0]*1.0*sin(x[0]))))|_div_|cos((x[0]|_div_|(1.0+1.0)-x[0]|_div_|_log_(cos(1.0)|_div_|(1.0*x[0]))))))+sin((cos(_exp_((1.0|_div_|1.0))|_div_|(_exp_(1.0)+1.0*x[0]))*_log_(cos(x[0]-1.0|_div_|_log_(1.0))))-x[0]*x[0]*cos(((_log_((x[0]|_div_|1.0))-((x[0]*1.0)*(x[0]|_div_|1.0)))+_log_((sin(1.0)+1.0+1.0)))-x[0]*cos(1.0))+cos(1.0))|_div_|x[0])))|_div_|(1.0|_div_|((_log_((cos(_exp_(((_exp_(x[0]*_log_((_log_(x[0])+_exp_(1.0))))-cos(cos(sin((x[0]*_log_(1.0)))))-(_log_(x[0])+_log_(1.0)))-_log_((_log_(x[0]-_exp_(x[0])+1.0)+x[0]))-((1.0*((1.0-1.0)+(x[0]*1.0))-1.0-_exp_(sin(cos(x[0]))))|_div_|cos(_exp_(_exp_(_log_(_log_(x[0])))))))))-_exp_((sin(_log_(_log_(x[0]))|_div_|(1.0-x[0]|_div_|1.0))|_div_|1.0)-x[0])*(_exp_(_log_(x[0]))+1.0|_div_|1.0-(x[0]-x[0]-_exp_(x[0])*(((x[0]-(1.0+1.0))|_div_|((x[0]|_div_|1.0)*sin(x[0])))+sin(x[0])+x[0])+x[0])|_div_|(sin(x[0]-1.0*1.0*1.0+1.0)*(x[0]-(cos(x[0])+sin((1.0-1.0))))-sin(_log_(_log_(sin((x[0]-x[0]))))))-cos(x[0]|_div_|_log_(_exp_(x[0]))+(_log_(1.0)|_div_|cos(x[0]))*x[0]|_div_|_log_(1.0)|_div_|_exp_(1.0-1.0))-(1.0-sin(sin(((1.0|_div_|x[0])+1.0-x[0])))-(x[0]-(cos(sin(1.0))+(x[0]-1.0+(1.0|_div_|x[0]))))|_div_|1.0*_exp_((1.0*1.0+x[0]*cos((x[0]+x[0]))))*x[0]))))*1.0)+_log_(sin(x[0]))|_div_|x[0]|_div_|_exp_(_log_(sin((((cos((x[0]|_div_|1.0*(_log_(x[0])|_div_|cos((x[0]+x[0])))))*sin(((sin(x[0])-(1.0*x[0]))*(_exp_(1.0)-sin(1.0)))*(_log_((1.0|_div_|1.0))*_exp_(cos(x[0]))))+x[0]+x[0]|_div_|1.0+(x[0]-1.0|_div_|(1.0+x[0])*(x[0]|_div_|1.0)))-1.0)-((_log_(1.0)+(_log_(sin(1.0))-x[0]))|_div_|(x[0]-(sin(x[0])+1.0*x[0]-1.0))+cos((1.0*sin((x[0]-x[0])))+1.0+sin((sin(1.0)+x[0])*_log_(cos(1.0))))))|_div_|(x[0]*_log_(cos(_log_(x[0]*_log_(x[0]-x[0]))+1.0))|_div_|cos(x[0])))))))', 20), "Error")
 
 
+class TestIterativeMapping(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def assert_same_mapping(self, g, genome):
+        iterative_values, recursive_values = [0] * len(genome), [0] * len(genome)
+        iterative = g.mapping(copy.deepcopy(genome), iterative_values, needs_python_filter=True)
+        recursive = g.mapping(copy.deepcopy(genome), recursive_values, needs_python_filter=True, recursive=True)
+        self.assertEqual(iterative, recursive)
+        self.assertEqual(iterative_values, recursive_values)
+
+    def test_parity_with_recursive_mapping(self):
+        import sge.grammar
+        g = sge.grammar.Grammar("grammars/regression.txt")
+        self.assert_same_mapping(g, SIMPLE_GENOME)
+        self.assert_same_mapping(g, LONG_GENOME)
+
+    def test_parity_on_random_individuals(self):
+        import sge.grammar
+        for grammar_file in ["grammars/regression.pybnf", "grammars/antgrammar.pybnf"]:
+            g = sge.grammar.Grammar(grammar_file, max_depth=10, min_init_depth=4)
+            for seed in range(20):
+                random.seed(seed)
+                iterative_genome = [[] for _ in g.get_non_terminals()]
+                iterative_depth = g.recursive_individual_creation(iterative_genome, g.get_start_rule()[0], 0)
+                random.seed(seed)
+                recursive_genome = [[] for _ in g.get_non_terminals()]
+                recursive_depth = g.recursive_individual_creation(recursive_genome, g.get_start_rule()[0], 0,
+                                                                  recursive=True)
+                self.assertEqual((iterative_genome, iterative_depth), (recursive_genome, recursive_depth))
+                # mutate a few codons so that the mapping has to draw new ones
+                for gene in iterative_genome:
+                    del gene[len(gene) // 2:]
+                random.seed(seed)
+                iterative_values = [0] * len(iterative_genome)
+                iterative = g.mapping(copy.deepcopy(iterative_genome), iterative_values)
+                random.seed(seed)
+                recursive_values = [0] * len(iterative_genome)
+                recursive = g.mapping(copy.deepcopy(iterative_genome), recursive_values, recursive=True)
+                self.assertEqual((iterative, iterative_values), (recursive, recursive_values))
+
+    def test_deep_trees_do_not_hit_recursion_limit(self):
+        import sge.grammar
+        g = sge.grammar.Grammar("grammars/regression.txt", max_depth=5000)
+        # <expr> ::= <expr><op><expr> chained far beyond the interpreter's recursion limit
+        n = sys.getrecursionlimit() * 2
+        genome = [[0], [0] * n + [3] * (n + 1), [0] * n, [], [0] * (n + 1)]
+        phenotype, depth = g.mapping(genome)
+        self.assertEqual(phenotype, "+".join(["x[0]"] * (n + 1)))
+        self.assertEqual(depth, n + 3)
+
+class TestPythonEmitter(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def test_ant_program(self):
+        import sge.grammar
+        g = sge.grammar.Grammar("grammars/antgrammar.pybnf", max_depth=17)
+        # <code>\n<line> where the first line is an if/else with a nested if/else in the else branch
+        genome = [[0], [1, 0], [0, 1, 0, 1, 1, 1], [2, 0, 1, 2]]
+        expected = ("if ant.sense_food():\n"
+                    "  ant.move_forward()\n"
+                    "else:\n"
+                    "  if ant.sense_food():\n"
+                    "    ant.turn_left()\n"
+                    "  else:\n"
+                    "    ant.turn_right()\n"
+                    "ant.move_forward()")
+        self.assertEqual(g.mapping(genome), (expected, 7))
+
+    def test_escapes_and_blank_lines(self):
+        import sge.grammar
+        self.assertEqual(sge.grammar.Grammar.python_filter(r"if a \le b and c \g d:{:x = a \eb b\n\n:}y"),
+                         "if a <= b and c > d:\n  x = a | b\ny")
+
+
+class TestMapPopulation(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def test_matches_individual_mapping(self):
+        import sge.grammar
+        g = sge.grammar.Grammar("grammars/regression.txt")
+        genotypes = [SIMPLE_GENOME, LONG_GENOME]
+        phenotypes, depths, mapping_values = g.map_population(copy.deepcopy(genotypes), needs_python_filter=True)
+        for index, genome in enumerate(genotypes):
+            values = [0] * len(genome)
+            self.assertEqual(g.mapping(copy.deepcopy(genome), values, needs_python_filter=True),
+                             (phenotypes[index], depths[index]))
+            self.assertEqual(values, mapping_values[index].tolist())
+
+    def test_pool_replaces_extended_genes(self):
+        import sge.grammar
+        g = sge.grammar.Grammar("grammars/regression.pybnf", max_depth=10, min_init_depth=4)
+        random.seed(3)
+        genotypes = []
+        for _ in range(20):
+            genome = [[] for _ in g.get_non_terminals()]
+            g.recursive_individual_creation(genome, g.get_start_rule()[0], 0)
+            genome[1] = genome[1][:len(genome[1]) // 2]
+            genotypes.append(genome)
+        originals = [list(genome) for genome in genotypes]
+        before = [[list(gene) for gene in genome] for genome in genotypes]
+        pool = g.make_mapping_pool(2)
+        try:
+            phenotypes, depths, mapping_values = g.map_population(genotypes, pool)
+        finally:
+            pool.close()
+            pool.join()
+        for index, genome in enumerate(genotypes):
+            # genes may be shared with other individuals: the extended ones are new lists, the old ones are unchanged
+            for gene, original, codons in zip(genome, originals[index], before[index]):
+                self.assertEqual(original, codons)
+                self.assertEqual(gene is original, len(gene) == len(codons))
+            values = [0] * len(genome)
+            # the codons drawn by the workers were written back, so mapping again reproduces the result
+            self.assertEqual(g.mapping(genome, values), (phenotypes[index], depths[index]))
+            self.assertEqual(values, mapping_values[index].tolist())
+
+    def test_mutation_while_mapping(self):
+        import sge.grammar
+        g = sge.grammar.Grammar("grammars/regression.pybnf", max_depth=10, min_init_depth=4)
+        random.seed(5)
+        genotypes = []
+        for _ in range(20):
+            genome = [[] for _ in g.get_non_terminals()]
+            g.recursive_individual_creation(genome, g.get_start_rule()[0], 0)
+            genotypes.append(genome)
+        before = copy.deepcopy(genotypes)
+        seeds = list(range(len(genotypes)))
+        plain = g.map_population(copy.deepcopy(genotypes), seeds=seeds)
+        unchanged = g.map_population(copy.deepcopy(genotypes), seeds=seeds, mutation=[0.0] * len(genotypes))
+        self.assertEqual(plain[0], unchanged[0])
+        mutated = [list(genome) for genome in genotypes]
+        phenotypes, depths, mapping_values = g.map_population(mutated, seeds=seeds, mutation=[0.3] * len(genotypes))
+        self.assertNotEqual(phenotypes, plain[0])
+        pooled = [list(genome) for genome in genotypes]
+        pool = g.make_mapping_pool(2)
+        try:
+            self.assertEqual(g.map_population(pooled, pool, seeds=seeds, mutation=[0.3] * len(genotypes))[0],
+                             phenotypes)
+        finally:
+            pool.close()
+            pool.join()
+        for index, genome in enumerate(mutated):
+            self.assertEqual(genome, pooled[index])
+            # the mutated genes are new lists, the genes shared with other individuals are unchanged
+            for gene, original, codons in zip(genome, genotypes[index], before[index]):
+                self.assertEqual(original, codons)
+                self.assertEqual(gene is original, gene == codons)
+            values = [0] * len(genome)
+            self.assertEqual(g.mapping(genome, values), (phenotypes[index], depths[index]))
+            self.assertEqual(values, mapping_values[index].tolist())
+            # the recursive mapping mutates the same codons
+            recursive, iterative = list(genotypes[index]), list(genotypes[index])
+            self.assertEqual(g.mapping(recursive, recursive=True, rng=random.Random(index), pmutation=0.3),
+                             g.mapping(iterative, rng=random.Random(index), pmutation=0.3))
+            self.assertEqual(recursive, iterative)
+
+    def test_chunks_follow_the_workers_of_the_pool(self):
+        import sge.grammar
+
+        class InlinePool:
+            """Runs the chunks in this process, and records how many there were."""
+            def __init__(self, workers, grammar):
+                self.workers = workers
+                self.chunks = None
+                sge.grammar._init_mapping_worker(grammar)
+
+            def map(self, function, chunks):
+                self.chunks = len(chunks)
+                return [function(chunk) for chunk in chunks]
+
+        g = sge.grammar.Grammar("grammars/regression.txt")
+        genotypes = [copy.deepcopy(SIMPLE_GENOME) for _ in range(100)]
+        for workers in [1, 3]:
+            pool = InlinePool(workers, g)
+            g.map_population(copy.deepcopy(genotypes), pool, seeds=list(range(100)))
+            self.assertEqual(pool.chunks, 4 * workers)
+        pool = g.make_mapping_pool(2)
+        try:
+            self.assertEqual(pool.workers, 2)
+        finally:
+            pool.close()
+            pool.join()
+
+
+class TestGrammarPreprocessing(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def test_shortest_path(self):
+        import sge.grammar
+        g = sge.grammar.Grammar("grammars/regression.txt")
+        shortest_path = g.get_shortest_path()
+        self.assertEqual(shortest_path[('<var>', 'NT')], [1, [('x[0]', 'T')], [('1.0', 'T')]])
+        self.assertEqual(shortest_path[('<expr>', 'NT')], [2, [('<var>', 'NT')]])
+        self.assertEqual(shortest_path[('<start>', 'NT')], [3, [('<expr>', 'NT')]])
+
+    def test_shortest_path_mutual_recursion(self):
+        import sge.grammar
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # a long cycle of mutually recursive non-terminals with a single way out at the end
+            n = 200
+            rules = ["<a%d> ::= <a%d>(<a0>)|<a%d>" % (i, (i + 1) % n, (i + 1) % n) for i in range(n - 1)]
+            rules.append("<a%d> ::= <a0>|x" % (n - 1))
+            grammar_file = os.path.join(cache_dir, "cycle.bnf")
+            with open(grammar_file, "w") as f:
+                f.write("\n".join(rules))
+            g = sge.grammar.Grammar(grammar_file)
+            for i in range(n):
+                self.assertEqual(g.get_shortest_path()[('<a%d>' % i, 'NT')][0], n - i)
+
+    def test_cache_round_trip(self):
+        import sge.grammar
+        reference = sge.grammar.Grammar("grammars/antgrammar.pybnf")
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for _ in range(2):
+                g = sge.grammar.Grammar()
+                g.set_cache_dir(cache_dir)
+                g.set_path("grammars/antgrammar.pybnf")
+                g.read_grammar()
+                self.assertEqual(len(os.listdir(cache_dir)), 1)
+                self.assertEqual(str(g), str(reference))
+                self.assertEqual(g.get_shortest_path(), reference.get_shortest_path())
+                self.assertEqual(g.count_number_of_options_in_production(),
+                                 reference.count_number_of_options_in_production())
+                self.assertEqual(g.get_compiled_productions(), reference.get_compiled_productions())
+
+    def test_stale_cache_is_rebuilt(self):
+        import pickle
+        import sge.grammar
+        reference = sge.grammar.Grammar("grammars/antgrammar.pybnf")
+        # entries written by older layouts: missing keys, a class that no longer exists, values of the wrong type
+        stale_entries = [{'grammar': {}}, b"csge.grammar\nNoSuchClass\n.",
+                         dict.fromkeys(['grammar', 'non_terminals', 'terminals', 'ordered_non_terminals',
+                                        'start_rule', 'number_of_options_by_non_terminal', 'shortest_path'], 1)]
+        for stale in stale_entries:
+            with tempfile.TemporaryDirectory() as cache_dir:
+                g = sge.grammar.Grammar()
+                g.set_cache_dir(cache_dir)
+                g.set_path("grammars/antgrammar.pybnf")
+                with open("grammars/antgrammar.pybnf", "rb") as f:
+                    cache_file = g.cache_file(f.read())
+                with open(cache_file, "wb") as f:
+                    f.write(stale if isinstance(stale, bytes) else pickle.dumps(stale))
+                g.read_grammar()
+                self.assertEqual(str(g), str(reference))
+                self.assertEqual(g.get_compiled_productions(), reference.get_compiled_productions())
+                self.assertTrue(sge.grammar.Grammar().load_cache(cache_file))
+
+
 if __name__ == '__main__':
     unittest.main()
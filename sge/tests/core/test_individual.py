@@ -0,0 +1,60 @@
+import copy
+import json
+import unittest
+import warnings
+from array import array
+
+
+class TestIndividual(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def make_individual(self):
+        from sge.individual import Individual
+        return Individual([array('B', [0, 1]), array('B', [2])], fitness=0.5, phenotype='x+1',
+                          mapping_values=[2, 1], tree_depth=3, other_info={'evals': 1})
+
+    def test_dict_view(self):
+        ind = self.make_individual()
+        self.assertEqual(ind['fitness'], 0.5)
+        ind['fitness'] = None
+        self.assertIsNone(ind.fitness)
+        self.assertEqual(ind.get('phenotype'), 'x+1')
+        self.assertIsNone(ind.get('unknown'))
+        self.assertRaises(KeyError, ind.__getitem__, 'clone')
+        self.assertRaises(AttributeError, setattr, ind, 'unknown', 1)
+
+    def test_clone_does_not_share_state(self):
+        ind = self.make_individual()
+        for other in [ind.clone(), copy.deepcopy(ind)]:
+            other.genotype[0][0] = 1
+            other.mapping_values[0] = 0
+            other.other_info['evals'] = 2
+            self.assertEqual(ind.genotype[0][0], 0)
+            self.assertEqual(ind.mapping_values[0], 2)
+            self.assertEqual(ind.other_info['evals'], 1)
+
+    def test_shallow_clone_shares_genes(self):
+        ind = self.make_individual()
+        other = ind.shallow_clone()
+        self.assertIsNot(other.genotype, ind.genotype)
+        self.assertTrue(all(a is b for a, b in zip(other.genotype, ind.genotype)))
+        other.genotype[0] = array('B', [1, 1])
+        self.assertEqual(list(ind.genotype[0]), [0, 1])
+
+    def test_to_dict_is_json_serializable(self):
+        data = json.loads(json.dumps(self.make_individual().to_dict()))
+        self.assertEqual(data['genotype'], [[0, 1], [2]])
+        self.assertEqual(data['tree_depth'], 3)
+
+    def test_to_dict_leaves_out_case_errors(self):
+        import numpy as np
+        ind = self.make_individual()
+        ind.other_info['case_errors'] = np.zeros(1000)
+        data = json.loads(json.dumps(ind.to_dict()))
+        self.assertEqual(data['other_info'], {'evals': 1})
+        self.assertIn('case_errors', ind.other_info)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+import warnings
+
+
+class LengthEvaluator:
+    def evaluate(self, individual):
+        return len(individual), {}
+
+
+class TestIslands(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def test_migration_sources(self):
+        from sge.islands import migration_sources
+        rng = random.Random(0)
+        self.assertEqual(migration_sources(4, 'ring', rng), [3, 0, 1, 2])
+        for _ in range(20):
+            sources = migration_sources(4, 'random', rng)
+            self.assertTrue(all(source != island for island, source in enumerate(sources)))
+        self.assertRaises(ValueError, migration_sources, 4, 'star', rng)
+
+    def test_islands_log_to_their_own_directories(self):
+        from sge.islands import island_model
+        from sge.parameters import params
+        saved = dict(params)
+        argv = sys.argv
+        with tempfile.TemporaryDirectory() as directory:
+            sys.argv = ['sge', '--grammar', 'grammars/regression.txt', '--experiment_name', directory,
+                        '--popsize', '10', '--elitism', '1', '--generations', '4', '--seed', '1', '--verbose', '0',
+                        '--islands', '2', '--migration_interval', '2', '--migration_size', '2']
+            try:
+                island_model(LengthEvaluator())
+            finally:
+                sys.argv = argv
+                params.clear()
+                params.update(saved)
+            for island in range(2):
+                progress = os.path.join(directory, 'run_1', 'island_%d' % island, 'progress_report.csv')
+                with open(progress) as f:
+                    self.assertEqual(len(f.readlines()), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,210 @@
+import copy
+import random
+import unittest
+import warnings
+
+
+class TestCopyOnWrite(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+        import sge.grammar as grammar
+        grammar.set_path("grammars/regression.txt")
+        grammar.read_grammar()
+        grammar.set_max_tree_depth(10)
+        grammar.set_min_init_tree_depth(4)
+
+    def test_variation_does_not_change_the_parents(self):
+        from sge.engine import generate_random_individual, map_individuals
+        from sge.operators.mutation import mutate
+        from sge.operators.recombination import crossover
+        from sge.operators.selection import tournament
+        random.seed(42)
+        population = [generate_random_individual() for _ in range(20)]
+        map_individuals(population)
+        for ind in population:
+            ind.fitness = random.random()
+        before = [ind.to_dict() for ind in copy.deepcopy(population)]
+        for _ in range(50):
+            child = crossover(tournament(population), tournament(population))
+            map_individuals([child])
+            mutate(child, 0.5)
+            mutate(tournament(population), 0.5)
+        self.assertEqual([ind.to_dict() for ind in population], before)
+
+    def test_mutation_copies_only_changed_genes(self):
+        from sge.engine import generate_random_individual, map_individuals
+        from sge.operators.mutation import mutate
+        import sge.grammar as grammar
+        random.seed(1)
+        parent = generate_random_individual()
+        map_individuals([parent])
+        child = mutate(parent, 0.0)
+        self.assertTrue(all(a is b for a, b in zip(child.genotype, parent.genotype)))
+        child = mutate(parent, 1.0)
+        arities = grammar.get_arities()
+        for index, (a, b) in enumerate(zip(child.genotype, parent.genotype)):
+            mutable = arities[index] > 1 and parent.mapping_values[index] > 0
+            self.assertEqual(a is b, not mutable)
+
+
+class TestFitnessInheritance(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+        import sge.grammar as grammar
+        grammar.set_path("grammars/regression.txt")
+        grammar.read_grammar()
+        grammar.set_max_tree_depth(10)
+        grammar.set_min_init_tree_depth(4)
+
+    def make_parents(self):
+        from sge.engine import generate_random_individual, map_individuals
+        parents = [generate_random_individual() for _ in range(2)]
+        map_individuals(parents)
+        parents[0].fitness, parents[1].fitness = 1.0, 2.0
+        return parents
+
+    def test_unchanged_mutant_keeps_fitness(self):
+        from sge.operators.mutation import mutate
+        random.seed(3)
+        parent, _ = self.make_parents()
+        child = mutate(parent, 0.0)
+        self.assertEqual((child.fitness, child.phenotype, child.tree_depth),
+                         (parent.fitness, parent.phenotype, parent.tree_depth))
+        child = mutate(parent, 1.0)
+        self.assertIsNone(child.fitness)
+        self.assertIsNone(child.phenotype)
+
+    def test_crossover_child_inherits_when_mapped_region_comes_from_one_parent(self):
+        from sge.operators.recombination import crossover, maps_like
+        from sge.engine import map_individuals
+        random.seed(5)
+        p1, p2 = self.make_parents()
+        for _ in range(100):
+            child = crossover(p1, p2)
+            source = [parent for parent in (p1, p2) if maps_like(child.genotype, parent)]
+            if source:
+                self.assertEqual(child.fitness, source[0].fitness)
+                self.assertEqual(child.phenotype, source[0].phenotype)
+                phenotype = child.phenotype
+                child.phenotype = None
+                map_individuals([child])
+                self.assertEqual(child.phenotype, phenotype)
+            else:
+                self.assertIsNone(child.fitness)
+                self.assertIsNone(child.phenotype)
+        self.assertEqual(crossover(p1, p1).fitness, p1.fitness)
+
+
+class TestVectorizedOperators(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+        import sge.grammar as grammar
+        grammar.set_path("grammars/regression.txt")
+        grammar.read_grammar()
+        grammar.set_max_tree_depth(10)
+        grammar.set_min_init_tree_depth(4)
+
+    def make_population(self, size):
+        from sge.engine import generate_random_individual, map_individuals
+        population = [generate_random_individual() for _ in range(size)]
+        map_individuals(population)
+        for ind in population:
+            ind.fitness = random.random()
+        return population
+
+    def changed_codons(self, parent, children):
+        """Number of times each mapped codon of parent was changed in children, and the new values drawn."""
+        counts, values = {}, {}
+        for child in children:
+            for nt, (gene, parent_gene) in enumerate(zip(child.genotype, parent.genotype)):
+                for position, (new, old) in enumerate(zip(gene, parent_gene)):
+                    if new != old:
+                        counts[nt, position] = counts.get((nt, position), 0) + 1
+                        values.setdefault(nt, []).append(new)
+        return counts, values
+
+    def test_mutation_statistics_match_the_scalar_operator(self):
+        import numpy as np
+        import sge.grammar as grammar
+        from sge.operators.mutation import mutate
+        from sge.operators.vectorized import mutate_population
+        random.seed(11)
+        parent = self.make_population(1)[0]
+        before = parent.to_dict()
+        trials = 4000
+        scalar = [mutate(parent, 0.1) for _ in range(trials)]
+        vectorized = mutate_population([parent] * trials, 0.1, np.random.default_rng(11))
+        self.assertEqual(parent.to_dict(), before)
+        scalar_counts, scalar_values = self.changed_codons(parent, scalar)
+        vector_counts, vector_values = self.changed_codons(parent, vectorized)
+        self.assertEqual(set(scalar_counts), set(vector_counts))
+        for key, count in scalar_counts.items():
+            # both are binomial(trials, 0.1) proportions: 0.04 is about 6 standard deviations of their difference
+            self.assertAlmostEqual(count / trials, vector_counts[key] / trials, delta=0.04)
+        for nt, values in scalar_values.items():
+            for value in range(grammar.get_arities()[nt]):
+                self.assertAlmostEqual(values.count(value) / len(values),
+                                       vector_values[nt].count(value) / len(vector_values[nt]), delta=0.05)
+        unchanged_scalar = sum(child.fitness is not None for child in scalar) / trials
+        unchanged_vector = sum(child.fitness is not None for child in vectorized) / trials
+        self.assertAlmostEqual(unchanged_scalar, unchanged_vector, delta=0.04)
+        for child in vectorized:
+            self.assertEqual(child.fitness is None, child.phenotype is None)
+
+    def test_crossover_statistics_match_the_scalar_operator(self):
+        import numpy as np
+        from sge.operators.recombination import crossover
+        from sge.operators.vectorized import crossover_population
+        random.seed(13)
+        p1, p2 = self.make_population(2)
+        trials = 4000
+        scalar = [crossover(p1, p2) for _ in range(trials)]
+        vectorized = crossover_population([p1] * trials, [p2] * trials, np.random.default_rng(13))
+        for children in (scalar, vectorized):
+            from_p1 = sum(a is b for child in children for a, b in zip(child.genotype, p1.genotype))
+            self.assertAlmostEqual(from_p1 / (trials * len(p1.genotype)), 0.5, delta=0.02)
+        inherited_scalar = sum(child.fitness is not None for child in scalar) / trials
+        inherited_vector = sum(child.fitness is not None for child in vectorized) / trials
+        self.assertAlmostEqual(inherited_scalar, inherited_vector, delta=0.04)
+        for child in scalar + vectorized:
+            if child.fitness is None:
+                self.assertIsNone(child.mapping_values)
+
+
+class TestSelection(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def test_tournament_indices(self):
+        import numpy as np
+        from sge.operators.selection import tournament_indices
+        rng = np.random.default_rng(0)
+        fitness = np.array([3.0, 0.0, 2.0, 1.0])
+        counts = np.bincount(tournament_indices(fitness, 20000, 2, rng), minlength=4) / 20000
+        # with 2 candidates drawn with replacement, rank r (from the worst) wins with probability (2r + 1) / 16
+        self.assertTrue(np.allclose(counts, [1 / 16, 7 / 16, 3 / 16, 5 / 16], atol=0.015))
+        self.assertTrue(np.all(tournament_indices(fitness, 50, 100, rng) == 1))
+
+    def test_truncation_indices(self):
+        import numpy as np
+        from sge.operators.selection import truncation_indices
+        rng = np.random.default_rng(0)
+        fitness = np.array([5.0, 1.0, 4.0, 0.0, 3.0, 2.0])
+        selected = truncation_indices(fitness, 1000, 0.5, rng)
+        self.assertEqual(set(selected.tolist()), {1, 3, 5})
+
+    def test_lexicase_indices(self):
+        import numpy as np
+        from sge.operators.selection import lexicase_indices
+        rng = np.random.default_rng(0)
+        case_errors = np.array([[0, 5, 5], [5, 0, 5], [5, 5, 0], [1, 1, 1], [0, 5, 5]], dtype=float)
+        counts = np.bincount(lexicase_indices(case_errors, 3000, rng), minlength=5)
+        # the generalist is never the best on any case, and the two copies of the first specialist share its share
+        self.assertEqual(counts[3], 0)
+        self.assertAlmostEqual(counts[1] / 3000, 1 / 3, delta=0.03)
+        self.assertAlmostEqual((counts[0] + counts[4]) / 3000, 1 / 3, delta=0.03)
+        self.assertAlmostEqual(counts[0] / 3000, 1 / 6, delta=0.03)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import math
+import random
+import unittest
+import warnings
+import numpy as np
+
+
+def per_row_fitness(namespace, phenotype, dataset, denominator, invalid_fitness):
+    """The RRSE of phenotype evaluated one case at a time over python floats, as the scalar evaluators did."""
+    x, y = dataset
+    function = eval(compile('lambda x: %s' % phenotype, '<phenotype>', 'eval'), namespace)
+    error = 0.0
+    with np.errstate(all='ignore'):
+        for inputs, output in zip(x.T.tolist(), y.tolist()):
+            try:
+                error += (output - function(inputs)) ** 2
+            except (ValueError, OverflowError):
+                return invalid_fitness
+    if not math.isfinite(error):
+        return invalid_fitness
+    return math.sqrt(error / denominator)
+
+
+class TestColumnEvaluators(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+
+    def assert_same_as_per_row(self, evaluator, namespace, phenotypes, dataset, denominator):
+        for phenotype in phenotypes:
+            expected = per_row_fitness(namespace, phenotype, dataset, denominator, 9999999)
+            self.assertAlmostEqual(evaluator.evaluate(phenotype)[0], expected, delta=1e-9 * expected, msg=phenotype)
+
+    def test_symbolic_regression(self):
+        import examples.symreg
+        from examples.symreg import SymbolicRegression
+        from sge.grammar import Grammar
+        from sge.engine import generate_random_individual
+        grammar = Grammar('grammars/regression.pybnf', 10, 3)
+        rng = random.Random(1)
+        phenotypes = [grammar.mapping(generate_random_individual(grammar=grammar, rng=rng).genotype, rng=rng)[0]
+                      for _ in range(100)]
+        phenotypes += ["1.0", "x[0]*x[0]+x[0]", "x[0] |_div_| (x[0]-x[0])", "_sqrt_(x[0]) * _log_(x[0])",
+                       "_exp_(x[0]*1000.0)", "_inv_(_exp_(x[0]*1000.0))", "_exp_(x[0]*1000.0) |_div_| (x[0]-x[0])",
+                       "_inv_(1.0 + _exp_(x[0]*-1000.0))", "_exp_(1000.0)"]
+        for backend in ["python", "stack_vm"]:
+            evaluator = SymbolicRegression(backend=backend)
+            self.assert_same_as_per_row(evaluator, vars(examples.symreg), phenotypes,
+                                        evaluator._SymbolicRegression__train_set,
+                                        evaluator._SymbolicRegression__RRSE_train_denominator)
+
+    def test_boston_housing(self):
+        import examples.bostonhousing
+        from examples.bostonhousing import BostonHousing
+        # x[9] goes up to 711, where exp overflows, and x[11] up to 396.9, where the square of exp overflows
+        phenotypes = ["x[5] |_div_| _exp_(x[0])", "_inv_(_exp_(_exp_(x[9])))+x[10]", "_exp_(x[9])",
+                      "_exp_(x[9]) |_div_| (x[0]-x[0])", "_inv_(_exp_(x[9]) * x[1])", "_inv_(1.0 + _exp_(x[9]))",
+                      "_exp_(x[11])", "_inv_(_exp_(x[11]))", "_log_(x[4]-x[5]) * x[12] + sin(x[2])",
+                      "_inv_(x[3]) - cos(x[7] |_div_| x[3])", "x[0]*x[1]+x[2] |_div_| x[3]-x[4]", "1.0",
+                      "_log_(_exp_(x[10]))", "_inv_(x[3]) |_div_| _exp_(x[9] - 700.0)"]
+        for backend in ["python", "stack_vm"]:
+            evaluator = BostonHousing(1, backend=backend)
+            self.assert_same_as_per_row(evaluator, vars(examples.bostonhousing), phenotypes,
+                                        evaluator._BostonHousing__train_set,
+                                        evaluator._BostonHousing__RRSE_train_denominator)
+
+
+class TestCaseErrors(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def run_evolution(self, evaluator, directory, key, selection):
+        import glob
+        import json
+        from sge.engine import Evolution
+        parameters = {'GRAMMAR': 'grammars/regression.pybnf', 'EXPERIMENT_NAME': directory, 'RUN': key, 'SEED': 3,
+                      'POPSIZE': 20, 'ELITISM': 2, 'GENERATIONS': 3, 'VERBOSE': False, 'MAX_TREE_DEPTH': 8,
+                      'SELECTION': selection}
+        population = Evolution(evaluator, parameters).run()
+        snapshots = []
+        for path in glob.glob('%s/run_%d/iteration_*.json' % (directory, key)):
+            with open(path) as f:
+                snapshots += json.load(f)
+        return population, snapshots
+
+    def test_lexicase_selection_with_the_regression_evaluators(self):
+        import tempfile
+        from examples.symreg import SymbolicRegression
+        from examples.bostonhousing import BostonHousing
+        symreg, boston = SymbolicRegression(), BostonHousing(1)
+        with tempfile.TemporaryDirectory() as directory:
+            for key, (evaluator, train_set) in enumerate([(symreg, symreg._SymbolicRegression__train_set),
+                                                          (boston, boston._BostonHousing__train_set)]):
+                population, snapshots = self.run_evolution(evaluator, directory, key, 'lexicase')
+                self.assertEqual(len(population), 20)
+                for ind in population:
+                    self.assertIsInstance(ind.other_info['case_errors'], np.ndarray)
+                    self.assertEqual(ind.other_info['case_errors'].shape, train_set[1].shape)
+                    self.assertTrue(np.isfinite(ind.other_info['case_errors']).all())
+                # the errors on each case are left out of the snapshots
+                self.assertEqual(len(snapshots), 4 * 20)
+                self.assertFalse(any('case_errors' in ind['other_info'] for ind in snapshots))
+
+    def test_no_case_errors_without_lexicase(self):
+        import tempfile
+        from examples.symreg import SymbolicRegression
+        evaluator = SymbolicRegression(case_errors=True)
+        with tempfile.TemporaryDirectory() as directory:
+            population, snapshots = self.run_evolution(evaluator, directory, 0, 'tournament')
+        self.assertEqual(len(snapshots), 4 * 20)
+        for ind in population + snapshots:
+            self.assertNotIn('case_errors', ind['other_info'])
+            self.assertIn('test_error', ind['other_info'])
+
+
+if __name__ == '__main__':
+    unittest.main()
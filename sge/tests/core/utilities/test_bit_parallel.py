@@ -0,0 +1,53 @@
+import itertools
+import unittest
+import warnings
+
+
+class TestBitParallel(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def test_truth_table(self):
+        from sge.utilities.bit_parallel import truth_table, pack
+        for variables in range(1, 6):
+            rows = list(itertools.product([0, 1], repeat=variables))
+            self.assertEqual(truth_table(variables), [pack([row[j] for row in rows]) for j in range(variables)])
+
+    def test_popcount(self):
+        from sge.utilities.bit_parallel import popcount
+        self.assertEqual(popcount(0), 0)
+        self.assertEqual(popcount(0b1011), 3)
+        self.assertEqual(popcount((1 << 1000) - 1), 1000)
+
+    def test_same_as_python(self):
+        from sge.utilities.bit_parallel import BitParallelEvaluator, truth_table, pack
+        names = ['a', 'b', 'c', 'd']
+        rows = list(itertools.product([0, 1], repeat=len(names)))
+        evaluator = BitParallelEvaluator(dict(zip(names, truth_table(len(names)))), 0, len(rows))
+        for phenotype in ["a", "not a and b", "a or b and c", "not (a or b) and not c", "a and b or c and d",
+                          "a if b else c or d", "(a if b else c) if (not d if a else b) else (c)",
+                          "a if b else c if d else not a", "not(a and b)", "(a) or (1)", "True and not d",
+                          "not not a or False", "0 if a else 1"]:
+            expected = pack([eval(phenotype, dict(zip(names, row))) for row in rows])
+            self.assertEqual(evaluator.outputs(phenotype), expected, phenotype)
+            self.assertEqual(evaluator.errors(phenotype), bin(expected).count('1'), phenotype)
+
+    def test_errors(self):
+        from sge.utilities.bit_parallel import BitParallelEvaluator, truth_table
+        a, b = truth_table(2)
+        evaluator = BitParallelEvaluator({'a': a, 'b': b}, a ^ b, 4)
+        self.assertEqual(evaluator.errors("(a or b) and not (a and b)"), 0)
+        self.assertEqual(evaluator.errors("not ((a or b) and not (a and b))"), 4)
+        self.assertEqual(evaluator.errors("a"), 2)
+
+    def test_invalid_phenotypes(self):
+        from sge.utilities.bit_parallel import BitParallelEvaluator, truth_table
+        a, b = truth_table(2)
+        evaluator = BitParallelEvaluator({'a': a, 'b': b}, 0, 4)
+        for phenotype in ["", "a and", "a b", "(a", "a)", "c", "a if b", "a + b", "a if b else", "not"]:
+            with self.assertRaises(ValueError, msg=phenotype):
+                evaluator.outputs(phenotype)
+
+
+if __name__ == '__main__':
+    unittest.main()
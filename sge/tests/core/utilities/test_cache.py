@@ -0,0 +1,51 @@
+import unittest
+import warnings
+from sge.utilities.cache import LRUCache, CodeCache
+
+
+class TestLRUCache(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def test_eviction_order(self):
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_counters(self):
+        cache = LRUCache(maxsize=2)
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', 1)
+        cache.get('a')
+        cache.get('a')
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        self.assertAlmostEqual(cache.hit_rate(), 2 / 3)
+
+
+class TestCodeCache(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def test_function_is_compiled_once(self):
+        cache = CodeCache(namespace={'double': lambda v: 2 * v})
+        function = cache.function('double(x[0]) + 1.0')
+        self.assertEqual(function([2.0]), 5.0)
+        self.assertIs(cache.function('double(x[0]) + 1.0'), function)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_compile_modes(self):
+        cache = CodeCache()
+        self.assertEqual(eval(cache.compile('a and b'), {'a': 1, 'b': 0}), 0)
+        variables = {}
+        exec(cache.compile('c = 3', 'exec'), variables)
+        self.assertEqual(variables['c'], 3)
+        self.assertRaises(SyntaxError, cache.compile, 'c = ')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+import warnings
+import numpy as np
+
+
+class TestColumns(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def test_as_columns(self):
+        from sge.utilities.columns import as_columns
+        x, y = as_columns([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
+        self.assertEqual(x.tolist(), [[1.0, 4.0], [2.0, 5.0]])
+        self.assertEqual(y.tolist(), [3.0, 6.0])
+        self.assertTrue(x[0].flags['C_CONTIGUOUS'])
+
+    def test_backends(self):
+        from sge.utilities.columns import ColumnFunctions
+        x = np.array([[1.0, 2.0], [0.0, 4.0]])
+        namespace = {'np': np}
+        for backend in ["python", "stack_vm"]:
+            functions = ColumnFunctions(namespace, backend)
+            self.assertEqual(functions.function("x[0] * x[1] + 1.0")(x).tolist(), [1.0, 9.0])
+            # the stack VM cannot run np.maximum, so it is compiled instead
+            self.assertEqual(functions.function("np.maximum(x[0], x[1])")(x).tolist(), [1.0, 4.0])
+        self.assertIsNone(ColumnFunctions(namespace).stack_vm)
+        self.assertIsNotNone(ColumnFunctions(namespace, "stack_vm").stack_vm)
+
+    def test_squared_errors(self):
+        from sge.utilities.columns import squared_errors
+        from sge.utilities.protected_math import _exp_, _inv_
+        dataset = (np.array([[1.0, 2.0, 800.0]]), np.array([1.0, 1.0, 1.0]))
+        self.assertEqual(squared_errors(lambda x: x[0], dataset).tolist(), [0.0, 1.0, 799.0 ** 2])
+        self.assertEqual(squared_errors(lambda x: 1.0, dataset).tolist(), [0.0, 0.0, 0.0])
+        # overflows make the whole phenotype invalid, even when a later operation brings the value back
+        for function in [lambda x: _exp_(x[0]), lambda x: _inv_(_exp_(x[0])), lambda x: _inv_(x[0] * 1e307),
+                         lambda x: x[0] * 1e155, lambda x: x[0] - np.inf]:
+            self.assertIsNone(squared_errors(function, dataset))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import random
+import unittest
+import warnings
+
+
+class TestSeedStreams(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def test_streams_are_stable_and_independent(self):
+        from sge.utilities.seeds import SeedStreams
+        streams = SeedStreams(7)
+        first = streams.random(3, 'breed').random()
+        streams.seeds(100, 3, 'mapping')
+        self.assertEqual(SeedStreams(7).random(3, 'breed').random(), first)
+        self.assertNotEqual(streams.random(4, 'breed').random(), first)
+        self.assertNotEqual(streams.random(3, 'mapping').random(), first)
+        self.assertNotEqual(SeedStreams(8).random(3, 'breed').random(), first)
+        island = streams.spawn('island', 1)
+        self.assertNotEqual(island.random(3, 'breed').random(), first)
+        self.assertEqual(island.seeds(5, 'initialization'),
+                         SeedStreams(7).spawn('island', 1).seeds(5, 'initialization'))
+        self.assertEqual(streams.seeds(10, 0, 'mapping')[:4], streams.seeds(4, 0, 'mapping'))
+
+    def test_float_seeds(self):
+        from sge.utilities.seeds import SeedStreams
+        self.assertEqual(SeedStreams(3.0).seeds(2, 'run'), SeedStreams(3).seeds(2, 'run'))
+        self.assertNotEqual(SeedStreams(3.5).seeds(2, 'run'), SeedStreams(3).seeds(2, 'run'))
+
+    def test_lazy_random(self):
+        from sge.utilities.seeds import LazyRandom
+        lazy = LazyRandom(11)
+        self.assertNotIn('rng', vars(lazy))
+        expected = random.Random(11)
+        self.assertEqual([lazy.randint(0, 9) for _ in range(5)], [expected.randint(0, 9) for _ in range(5)])
+        self.assertEqual(lazy.choice([1, 2, 3]), expected.choice([1, 2, 3]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+import unittest
+import warnings
+from array import array
+
+
+class TestSnapshots(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def make_population(self):
+        from sge.individual import Individual
+        return [Individual([array('B', [0, 1]), array('B', [])], fitness=0.5, phenotype='x+1', tree_depth=3),
+                Individual([array('B', [2]), array('B', [1, 1, 0])], fitness=None, phenotype='sin(x) →'),
+                Individual([array('B', []), array('B', [])], fitness=2.0, phenotype='')]
+
+    def test_npz_round_trip(self):
+        from sge.utilities.snapshots import save_npz, load_npz
+        population = self.make_population()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'iteration_0.npz')
+            save_npz(path, population)
+            loaded = load_npz(path)
+            save_npz(path, population, include_genotype=False)
+            without_genotype = load_npz(path)
+        for individual, data in zip(population, loaded):
+            self.assertEqual(data['genotype'], [list(gene) for gene in individual.genotype])
+            self.assertEqual((data['fitness'], data['tree_depth'], data['phenotype']),
+                             (individual.fitness, individual.tree_depth, individual.phenotype))
+        self.assertTrue(all('genotype' not in data for data in without_genotype))
+
+    def test_json_honors_include_genotype(self):
+        from sge.utilities.snapshots import save_json
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'iteration_0.json')
+            save_json(path, self.make_population(), include_genotype=False)
+            with open(path) as f:
+                data = json.load(f)
+        self.assertEqual([individual['phenotype'] for individual in data], ['x+1', 'sin(x) →', ''])
+        self.assertTrue(all('genotype' not in individual for individual in data))
+
+    def test_writer_runs_in_order_and_reports_errors(self):
+        from sge.utilities.snapshots import SnapshotWriter
+        written = []
+        writer = SnapshotWriter(maxsize=1)
+        for index in range(10):
+            writer.submit(written.append, index)
+        writer.close()
+        self.assertEqual(written, list(range(10)))
+
+        def fail():
+            raise OSError('disk full')
+        writer = SnapshotWriter()
+        writer.submit(fail)
+        self.assertRaises(OSError, writer.close)
+
+
+if __name__ == '__main__':
+    unittest.main()
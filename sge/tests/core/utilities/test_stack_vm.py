@@ -0,0 +1,62 @@
+import unittest
+import warnings
+import numpy as np
+
+
+class TestStackVM(unittest.TestCase):
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    def assert_same_as_python(self, phenotypes, x):
+        from numpy import sin, cos
+        from sge.utilities.protected_math import _div_, _exp_, _log_, _inv_, _sqrt_, _sig_
+        from sge.utilities.stack_vm import StackVM
+        namespace = dict(locals())
+        vm = StackVM()
+        with np.errstate(all='ignore'):
+            for phenotype in phenotypes:
+                expected = eval(compile('lambda x: %s' % phenotype, '<phenotype>', 'eval'), namespace)(x)
+                output = vm.function(phenotype)(x)
+                self.assertTrue(np.array_equal(np.broadcast_to(output, x[0].shape),
+                                               np.broadcast_to(expected, x[0].shape), equal_nan=True), phenotype)
+
+    def test_precedence(self):
+        x = np.random.default_rng(0).uniform(-3, 3, (4, 20))
+        self.assert_same_as_python(["-x[0]*x[1]", "x[0]-x[1]-x[2]", "x[0] |_div_| x[1] |_div_| x[2]",
+                                    "x[0]+x[1] |_div_| x[2]*x[3]", "x[0]*x[1]+x[2] |_div_| x[3]-x[0]",
+                                    "-(x[0]+1.0)", "2.5e-1 - - x[3]", "sin(x[0]|_div_|x[1])*-cos(x[2])",
+                                    "_log_(-x[0]) + _sqrt_(x[1]) - _sig_(x[2]) * _inv_(x[3]-x[3])",
+                                    "_exp_(x[0] * 1000.0)", "1.0", "1.0|_div_|0.0", " ( x[ 1 ] ) "], x)
+
+    def test_grammar_phenotypes(self):
+        import random
+        from sge.grammar import Grammar
+        from sge.engine import generate_random_individual
+        # a Grammar of its own: read_grammar on the module-level one would merge these rules into the ones
+        # other tests loaded
+        grammar = Grammar('grammars/regression.pybnf', 10, 3)
+        rng = random.Random(1)
+        phenotypes = [grammar.mapping(generate_random_individual(grammar=grammar, rng=rng).genotype, rng=rng)[0]
+                      for _ in range(200)]
+        self.assert_same_as_python(phenotypes, np.linspace(-1, 1, 21)[None, :])
+
+    def test_programs(self):
+        from sge.utilities.stack_vm import StackVM, LOAD, CONST, ADD, MUL, DIV, SIN
+        vm = StackVM()
+        self.assertEqual(vm.compile("x[0] |_div_| sin(x[1]) + 2.0 * x[0]"),
+                         ((LOAD, 0), (LOAD, 1), (SIN, None), (CONST, 2.0), (LOAD, 0), (MUL, None), (ADD, None),
+                          (DIV, None)))
+        self.assertIs(vm.compile("x[0] |_div_| sin(x[1]) + 2.0 * x[0]"),
+                      vm.compile("x[0] |_div_| sin(x[1]) + 2.0 * x[0]"))
+
+    def test_unsupported_phenotypes(self):
+        from sge.utilities.stack_vm import StackVM
+        vm = StackVM()
+        for phenotype in ["x[0] x[1]", "sin x[0]", "(x[0]", "x[0])", "x[0]**2", "x[0]/x[1]", "y[0]",
+                          "x[0] |_foo_| x[1]", "", "sin()", "tanh(x[0])", "x[0] +"]:
+            with self.assertRaises(ValueError, msg=phenotype):
+                vm.compile(phenotype)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 import warnings
 import math
+import numpy as np
 import sge.utilities.protected_math as protected_math
 
 
@@ -32,6 +33,66 @@ class TestUtilities(unittest.TestCase):
     def test_division_zero(self):
         self.assertEqual(protected_math._div_(-1, 0), 1, "Error: ValueError")
 
+    def test_division_arrays(self):
+        x, y = np.array([1.0, -1.0, 3.0]), np.array([2.0, 0.0, 0.0])
+        self.assertEqual((x | protected_math._div_ | y).tolist(), [0.5, 1.0, 1.0])
+        self.assertEqual((1.0 | protected_math._div_ | y).tolist(), [0.5, 1.0, 1.0])
+        self.assertEqual((x | protected_math._div_ | 2.0).tolist(), [0.5, -0.5, 1.5])
+
+    def test_array_versions_match_scalars(self):
+        values = [-2.0, -0.5, 0.0, 0.5, 3.0]
+        for array_version, scalar_version in [(protected_math.protected_log, protected_math._log_),
+                                              (protected_math.protected_exp, protected_math._exp_),
+                                              (protected_math.protected_inv, protected_math._inv_),
+                                              (protected_math.protected_sqrt, protected_math._sqrt_),
+                                              (protected_math.protected_sig, protected_math._sig_)]:
+            self.assertEqual(array_version(np.array(values)).tolist(), [scalar_version(v) for v in values])
+            self.assertEqual([array_version(v) for v in values], [scalar_version(v) for v in values])
+
+    def test_dispatch_to_array_versions(self):
+        x = np.array([-1.0, 0.0, 4.0])
+        self.assertEqual(protected_math._log_(x).tolist(), [0.0, 0.0, math.log(4.0)])
+        self.assertEqual(protected_math._inv_(x).tolist(), [-1.0, 1.0, 0.25])
+        self.assertEqual(protected_math._sqrt_(x).tolist(), [1.0, 0.0, 2.0])
+        self.assertEqual(protected_math.protdiv(x, x).tolist(), [1.0, 1.0, 1.0])
+
+    def test_array_versions_without_warnings(self):
+        x = np.array([-1e300, -1.0, 0.0, 1e-300, 1e300, np.nan])
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            for function in [protected_math.protected_log, protected_math.protected_exp,
+                             protected_math.protected_inv, protected_math.protected_sqrt,
+                             protected_math.protected_sig]:
+                function(x)
+            protected_math.protected_div(x, x[::-1])
+            protected_math.protected_div(np.array([np.inf, -np.inf, 0.0]), np.array([np.inf, np.inf, 0.0]))
+        with np.errstate(all='raise'):
+            with self.assertRaises(FloatingPointError):
+                protected_math.protected_div(np.array([np.inf]), np.array([np.inf]))
+            with self.assertRaises(FloatingPointError):
+                protected_math.protected_div(np.array([1e300]), np.array([1e-300]))
+            self.assertEqual(protected_math.protected_div(np.array([1.0, 1.0]), np.array([0.0, 2.0])).tolist(),
+                             [1.0, 0.5])
+        self.assertTrue(np.isnan(protected_math.protected_exp(np.array([1e300]))).all())
+
+    def test_overflow_matches_scalars(self):
+        # the scalar versions raise OverflowError where the array versions give nan
+        values = [-1000.0, -1.0, 709.0, 710.0, 1e300, math.inf, -math.inf]
+        for array_version, scalar_version in [(protected_math.protected_exp, protected_math._exp_),
+                                              (protected_math.protected_sig, protected_math._sig_)]:
+            outputs = array_version(np.array(values))
+            for value, output in zip(values, outputs.tolist()):
+                try:
+                    expected = scalar_version(value)
+                except OverflowError:
+                    self.assertTrue(math.isnan(output), value)
+                else:
+                    self.assertEqual(output, expected, value)
+                    self.assertEqual(array_version(value), expected, value)
+        with np.errstate(over='raise'):
+            with self.assertRaises(FloatingPointError):
+                protected_math._exp_(np.array([1.0, 1000.0]))
+
 
 if __name__ == '__main__':
     unittest.main()